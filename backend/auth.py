@@ -1,61 +1,127 @@
+import hashlib
 import logging
+import os
+import time
+from typing import Any, Dict, Optional
 
-from fastapi import Depends, HTTPException, Request
+from fastapi import Depends, Query, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from firebase_admin import auth as firebase_auth, exceptions as firebase_exceptions
 
-from .errors import ErrorResponse
+from .errors import http_error
 from .models import User, UserRole
+from .services.cache import get_cache
 from .services.db import db
+from .services.events import event_bus
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 logger = logging.getLogger(__name__)
 
 
-async def get_current_user(
-    request: Request,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-) -> User:
-    """Verify Firebase token, store and return the current user."""
-    try:
-        decoded_token = firebase_auth.verify_id_token(credentials.credentials)
-        firebase_uid = decoded_token["uid"]
+def auth_cache_ttl() -> float:
+    """Seconds verified tokens and user records are served from the cache."""
+    return float(os.getenv("AUTH_CACHE_TTL", "60"))
+
+
+async def _verified_uid(token: str) -> str:
+    """Return the Firebase UID of ``token``, verifying it at most once per TTL.
+
+    Only the token's digest is used as cache key, and entries never outlive
+    the token's own expiry.
+    """
+    from firebase_admin import auth as firebase_auth
 
+    cache = get_cache()
+    key = "token:" + hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached.decode("utf-8")
+    decoded_token = firebase_auth.verify_id_token(token)
+    firebase_uid = decoded_token["uid"]
+    ttl = auth_cache_ttl()
+    if "exp" in decoded_token:
+        ttl = min(ttl, decoded_token["exp"] - time.time())
+    if ttl > 0:
+        cache.set(key, firebase_uid.encode("utf-8"), ttl)
+    return firebase_uid
+
+
+async def _stored_user(firebase_uid: str) -> Optional[Dict[str, Any]]:
+    cache = get_cache()
+    key = f"user:{firebase_uid}"
+    user_doc = cache.get_json(key)
+    if user_doc is None:
         user_doc = await db.users.find_one({"firebase_uid": firebase_uid})
+        if user_doc:
+            user_doc.pop("_id", None)
+            cache.set_json(key, user_doc, auth_cache_ttl())
+    return user_doc
+
+
+def evict_cached_user(event: Dict[str, Any]) -> None:
+    """Drop a changed or deleted user so the next request sees its new state."""
+    if event.get("collection") == "users" and event.get("firebase_uid"):
+        get_cache().delete(f"user:{event['firebase_uid']}")
+
+
+event_bus.add_listener(evict_cached_user)
+
+
+async def authenticate_token(token: str) -> User:
+    """Verify a Firebase ID token and return the matching stored user."""
+    # Imported lazily: the Firebase SDK pulls in the Google client stack.
+    from firebase_admin import exceptions as firebase_exceptions
+
+    try:
+        firebase_uid = await _verified_uid(token)
+
+        user_doc = await _stored_user(firebase_uid)
         if not user_doc:
-            raise HTTPException(
-                status_code=404,
-                detail=ErrorResponse(
-                    message="User not found", code="user_not_found"
-                ).dict(),
-            )
-
-        user = User(**user_doc)
-        request.state.user = user
-        return user
+            raise http_error(404, "User not found", "user_not_found")
+
+        return User(**user_doc)
     except (
         firebase_exceptions.FirebaseError,
         ValueError,
     ) as exc:  # pragma: no cover - network / firebase failures
         logger.warning("Authentication failed: %s", exc)
-        raise HTTPException(
-            status_code=401,
-            detail=ErrorResponse(
-                message="Authentication failed", code="auth_failed"
-            ).dict(),
-        )
+        raise http_error(401, "Authentication failed", "auth_failed")
+
+
+async def get_current_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> User:
+    """Verify Firebase token, store and return the current user."""
+    user = await authenticate_token(credentials.credentials)
+    request.state.user = user
+    return user
+
+
+async def get_stream_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    access_token: Optional[str] = Query(
+        None, description="ID token for clients that cannot send headers"
+    ),
+) -> User:
+    """Like ``get_current_user``, also accepting the token as a query parameter.
+
+    Browsers' ``EventSource`` cannot set an ``Authorization`` header.
+    """
+    token = credentials.credentials if credentials else access_token
+    if not token:
+        raise http_error(401, "User not authenticated", "not_authenticated")
+    user = await authenticate_token(token)
+    request.state.user = user
+    return user
 
 
 def current_user(request: Request) -> User:
     """Retrieve the authenticated user from the request state."""
     user = getattr(request.state, "user", None)
     if user is None:
-        raise HTTPException(
-            status_code=401,
-            detail=ErrorResponse(
-                message="User not authenticated", code="not_authenticated"
-            ).dict(),
-        )
+        raise http_error(401, "User not authenticated", "not_authenticated")
     return user
 
 
@@ -65,11 +131,6 @@ def require_roles(*roles: UserRole):
     async def _role_checker(request: Request) -> None:
         user = current_user(request)
         if user.role not in roles:
-            raise HTTPException(
-                status_code=403,
-                detail=ErrorResponse(
-                    message="Insufficient permissions", code="insufficient_role"
-                ).dict(),
-            )
+            raise http_error(403, "Insufficient permissions", "insufficient_role")
 
     return Depends(_role_checker)
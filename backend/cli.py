@@ -0,0 +1,311 @@
+"""Maintenance commands, run with ``python -m backend.cli --help``."""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List
+
+import typer
+from dotenv import load_dotenv
+
+from .services.db import close_client, get_database
+from .services.duplicates import (
+    FINGERPRINT_COLLECTION,
+    ensure_fingerprint_indexes,
+    fingerprint_operations,
+)
+from .services.facets import (
+    FACETED_COLLECTIONS,
+    check_facets,
+    ensure_facet_indexes,
+    rebuild_facets,
+)
+from .services.render import RENDERED_COLLECTIONS, RENDERER_VERSION, render_many
+from .services.static_export import StaticExporter, static_export_dir
+from .services.statutes import expand_sources, import_file
+from .services.vectors import ContextIndexer, vector_index_dir
+
+app = typer.Typer(help="Amtlich maintenance commands")
+
+
+@app.callback()
+def main() -> None:
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+
+async def _render_batch(pool, workers: int, collection, batch) -> int:
+    from pymongo import UpdateOne
+
+    loop = asyncio.get_running_loop()
+    # Split the batch so every worker process gets a share
+    size = max(1, len(batch) // workers)
+    slices = [batch[i : i + size] for i in range(0, len(batch), size)]
+    rendered = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                pool, render_many, [doc.get("content", "") for doc in part]
+            )
+            for part in slices
+        )
+    )
+    operations = [
+        # Skip documents edited in the meantime; the edit rendered them already
+        UpdateOne({"id": doc["id"], "version": doc.get("version")}, {"$set": fields})
+        for part, results in zip(slices, rendered)
+        for doc, fields in zip(part, results)
+    ]
+    result = await collection.bulk_write(operations, ordered=False)
+    return result.modified_count
+
+
+async def _rerender(
+    collections: List[str], workers: int, batch_size: int, force: bool
+) -> int:
+    database = get_database()
+    query = (
+        {}
+        if force
+        else {
+            "$or": [
+                {"render_version": {"$ne": RENDERER_VERSION}},
+                {"content_html": {"$exists": False}},
+            ]
+        }
+    )
+    projection = {"_id": 0, "id": 1, "content": 1, "version": 1}
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for name in collections:
+            collection = database[name]
+            updated = 0
+            batch = []
+            async for doc in collection.find(query, projection).batch_size(batch_size):
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    updated += await _render_batch(pool, workers, collection, batch)
+                    batch = []
+            if batch:
+                updated += await _render_batch(pool, workers, collection, batch)
+            typer.echo(f"{name}: {updated} documents re-rendered")
+            total += updated
+    return total
+
+
+@app.command()
+def rerender(
+    collection: List[str] = typer.Option(
+        list(RENDERED_COLLECTIONS), help="Collection to process (repeatable)"
+    ),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Worker processes"),
+    batch_size: int = typer.Option(500, help="Documents per bulk write"),
+    force: bool = typer.Option(False, help="Re-render documents that are current"),
+) -> None:
+    """Render content bodies whose stored HTML or sections are outdated."""
+    unknown = set(collection) - set(RENDERED_COLLECTIONS)
+    if unknown:
+        raise typer.BadParameter(f"Unsupported collection: {', '.join(unknown)}")
+    try:
+        updated = asyncio.run(_rerender(collection, workers, batch_size, force))
+    finally:
+        close_client()
+    typer.echo(f"Re-rendered {updated} documents in total")
+
+
+async def _import(files: List[Path], **options) -> None:
+    database = get_database()
+    documents = 0
+    seconds = 0.0
+    for path in files:
+        stats = await import_file(database, path, **options)
+        if stats.already_imported:
+            typer.echo(f"{path.name}: already imported, skipped")
+            continue
+        typer.echo(
+            f"{path.name}: {stats.written} written, {stats.unchanged} unchanged"
+            f" ({stats.skipped} norms resumed past) in {stats.seconds:.1f}s,"
+            f" {stats.rate:.0f} docs/s"
+        )
+        documents += stats.documents
+        seconds += stats.seconds
+    rate = documents / seconds if seconds else 0.0
+    typer.echo(f"Imported {documents} documents in total, {rate:.0f} docs/s")
+    if options["collection"] in FACETED_COLLECTIONS:
+        # Bulk upserts bypass the incremental counters
+        corrected = await rebuild_facets(database, options["collection"])
+        typer.echo(f"Corrected {corrected} facet counters")
+
+
+@app.command("import")
+def import_statutes(
+    paths: List[Path] = typer.Argument(
+        ..., exists=True, help="XML, XML zip or JSON Lines files or directories"
+    ),
+    collection: str = typer.Option("pages", help="Target collection"),
+    status: str = typer.Option("draft", help="Status of newly created documents"),
+    author_id: str = typer.Option("import", help="Author id of new documents"),
+    batch_size: int = typer.Option(1000, help="Documents per bulk write"),
+    resume: bool = typer.Option(True, help="Continue from stored checkpoints"),
+) -> None:
+    """Stream statute files into the content collections."""
+    if collection not in RENDERED_COLLECTIONS:
+        raise typer.BadParameter(f"Unsupported collection: {collection}")
+    try:
+        asyncio.run(
+            _import(
+                expand_sources(paths),
+                collection=collection,
+                status=status,
+                author_id=author_id,
+                batch_size=batch_size,
+                resume=resume,
+            )
+        )
+    finally:
+        close_client()
+
+
+async def _fingerprint(collections: List[str], batch_size: int) -> int:
+    database = get_database()
+    await ensure_fingerprint_indexes(database)
+    fingerprints = database[FINGERPRINT_COLLECTION]
+    total = 0
+    for name in collections:
+        projection = {"_id": 0, "id": 1, "content": 1}
+        batch: List[dict] = []
+        async for doc in database[name].find({}, projection).batch_size(batch_size):
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                await fingerprints.bulk_write(
+                    fingerprint_operations(name, batch), ordered=False
+                )
+                total += len(batch)
+                batch = []
+        if batch:
+            await fingerprints.bulk_write(
+                fingerprint_operations(name, batch), ordered=False
+            )
+            total += len(batch)
+    return total
+
+
+@app.command()
+def fingerprint(
+    collection: List[str] = typer.Option(
+        list(RENDERED_COLLECTIONS), help="Collection to process (repeatable)"
+    ),
+    batch_size: int = typer.Option(500, help="Documents per bulk write"),
+) -> None:
+    """Compute the near-duplicate fingerprints of existing documents."""
+    unknown = set(collection) - set(RENDERED_COLLECTIONS)
+    if unknown:
+        raise typer.BadParameter(f"Unsupported collection: {', '.join(unknown)}")
+    try:
+        total = asyncio.run(_fingerprint(collection, batch_size))
+    finally:
+        close_client()
+    typer.echo(f"Fingerprinted {total} documents")
+
+
+@app.command("reindex-vectors")
+def reindex_vectors(
+    batch_size: int = typer.Option(200, help="Documents embedded per batch"),
+) -> None:
+    """Rebuild the vector index used by retrieveContext from all content."""
+    path = vector_index_dir()
+
+    async def rebuild() -> int:
+        return await ContextIndexer().rebuild(get_database(), path, batch_size)
+
+    try:
+        chunks = asyncio.run(rebuild())
+    finally:
+        close_client()
+    typer.echo(f"Indexed {chunks} chunks into {path}")
+
+
+def _facet_collections(collection: List[str]) -> List[str]:
+    unknown = set(collection) - set(FACETED_COLLECTIONS)
+    if unknown:
+        raise typer.BadParameter(f"Unsupported collection: {', '.join(unknown)}")
+    return collection
+
+
+@app.command("rebuild-facets")
+def rebuild_facet_counts(
+    collection: List[str] = typer.Option(
+        list(FACETED_COLLECTIONS), help="Collection to process (repeatable)"
+    ),
+) -> None:
+    """Recount the facet counters from the documents and correct them."""
+    collections = _facet_collections(collection)
+
+    async def rebuild() -> int:
+        database = get_database()
+        await ensure_facet_indexes(database)
+        return sum([await rebuild_facets(database, name) for name in collections])
+
+    try:
+        corrected = asyncio.run(rebuild())
+    finally:
+        close_client()
+    typer.echo(f"Corrected {corrected} facet counters")
+
+
+@app.command("check-facets")
+def check_facet_counts(
+    collection: List[str] = typer.Option(
+        list(FACETED_COLLECTIONS), help="Collection to process (repeatable)"
+    ),
+) -> None:
+    """Compare the facet counters with the documents; exit 1 on drift."""
+    collections = _facet_collections(collection)
+
+    async def check() -> List[dict]:
+        database = get_database()
+        return [
+            {"collection": name, **mismatch}
+            for name in collections
+            for mismatch in await check_facets(database, name)
+        ]
+
+    try:
+        mismatches = asyncio.run(check())
+    finally:
+        close_client()
+    for entry in mismatches:
+        typer.echo(
+            f"{entry['collection']} {entry['facet']}={entry['value']}: "
+            f"stored {entry['stored']}, actual {entry['actual']}"
+        )
+    typer.echo(f"{len(mismatches)} facet counters differ")
+    if mismatches:
+        raise typer.Exit(code=1)
+
+
+@app.command("export-static")
+def export_static(
+    output: Path = typer.Option(None, help="Target directory [STATIC_EXPORT_DIR]"),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Writer threads"),
+    batch_size: int = typer.Option(500, help="Documents rendered per batch"),
+    force: bool = typer.Option(False, help="Rewrite pages that are unchanged"),
+) -> None:
+    """Render published pages and articles to static HTML files."""
+    exporter = StaticExporter(output or static_export_dir(), workers)
+
+    async def export():
+        return await exporter.export_all(get_database(), batch_size, force)
+
+    try:
+        stats = asyncio.run(export())
+    finally:
+        close_client()
+    typer.echo(
+        f"Exported into {exporter.directory}: {stats.written} written, "
+        f"{stats.unchanged} unchanged, {stats.removed} removed, "
+        f"{stats.skipped} skipped"
+    )
+
+
+if __name__ == "__main__":
+    app()
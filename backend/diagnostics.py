@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+class LoopLagMonitor:
+    """Measure event-loop lag and report stretches where the loop is blocked.
+
+    A probe coroutine sleeps for ``interval`` seconds and records how late it
+    wakes up. A watchdog thread notices when the probe has not ticked for
+    longer than ``threshold`` and captures the stack of the loop thread, which
+    points at the synchronous call holding the loop.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.05,
+        threshold: float = 0.1,
+        log_interval: float = 60.0,
+        window: int = 1000,
+        history: int = 20,
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.log_interval = log_interval
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._pending: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = time.monotonic()
+        self.total_samples = 0
+        self.blocking_events = 0
+        self.max_lag = 0.0
+
+    @classmethod
+    def from_env(cls) -> "LoopLagMonitor":
+        return cls(
+            interval=float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "50")) / 1000,
+            threshold=float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100")) / 1000,
+            log_interval=float(os.getenv("LOOP_MONITOR_LOG_INTERVAL_S", "60")),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start probing the running event loop."""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-lag-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        logger.info(
+            "Event loop monitor started (interval=%.0fms, threshold=%.0fms)",
+            self.interval * 1000,
+            self.threshold * 1000,
+        )
+
+    async def stop(self) -> None:
+        """Stop the probe and the watchdog thread."""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _probe(self) -> None:
+        last_log = time.monotonic()
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self._last_tick = time.monotonic()
+            self._record(lag)
+            if self.log_interval and self._last_tick - last_log >= self.log_interval:
+                last_log = self._last_tick
+                logger.info("Event loop lag stats: %s", self._summary())
+
+    def _record(self, lag: float) -> None:
+        with self._lock:
+            self._samples.append(lag)
+            self.total_samples += 1
+            self.max_lag = max(self.max_lag, lag)
+            if lag < self.threshold:
+                return
+            event = self._pending or {
+                "detected_at": datetime.utcnow().isoformat(),
+                "stack": None,
+            }
+            self._pending = None
+            event["duration_ms"] = round(lag * 1000, 1)
+            self._events.append(event)
+            self.blocking_events += 1
+        logger.warning(
+            "Event loop blocked for %.1fms%s",
+            lag * 1000,
+            "\n" + "".join(event["stack"]) if event["stack"] else "",
+        )
+
+    def _watch(self) -> None:
+        period = max(self.threshold / 2, 0.005)
+        while not self._stop.wait(period):
+            stalled = time.monotonic() - self._last_tick
+            if stalled < self.interval + self.threshold:
+                continue
+            with self._lock:
+                if self._pending is not None:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = traceback.format_stack(frame) if frame else None
+                self._pending = {
+                    "detected_at": datetime.utcnow().isoformat(),
+                    "stack": stack,
+                }
+
+    def _summary(self) -> Dict[str, Any]:
+        samples: List[float] = sorted(self._samples)
+        if samples:
+            p50 = samples[int(0.5 * (len(samples) - 1))]
+            p99 = samples[int(0.99 * (len(samples) - 1))]
+            mean = statistics.fmean(samples)
+        else:
+            p50 = p99 = mean = 0.0
+        return {
+            "samples": self.total_samples,
+            "mean_lag_ms": round(mean * 1000, 2),
+            "p50_lag_ms": round(p50 * 1000, 2),
+            "p99_lag_ms": round(p99 * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "blocking_events": self.blocking_events,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Return lag statistics and the most recent blocking events."""
+        with self._lock:
+            summary = self._summary()
+            events = list(self._events)
+        summary.update(
+            {
+                "running": self.running,
+                "interval_ms": self.interval * 1000,
+                "threshold_ms": self.threshold * 1000,
+                "recent_events": events,
+            }
+        )
+        return summary
+
+
+def loop_monitor_enabled() -> bool:
+    return _env_flag("LOOP_MONITOR_ENABLED")
+
+
+loop_monitor = LoopLagMonitor.from_env()
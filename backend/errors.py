@@ -1,8 +1,20 @@
 from typing import Optional
 
+from fastapi import HTTPException
 from pydantic import BaseModel
 
 
 class ErrorResponse(BaseModel):
     message: str
     code: Optional[str] = None
+
+
+def http_error(status_code: int, message: str, code: str, **extra) -> HTTPException:
+    """An ``HTTPException`` whose detail is an ``ErrorResponse``.
+
+    ``extra`` adds fields next to ``message`` and ``code``.
+    """
+    return HTTPException(
+        status_code=status_code,
+        detail={**ErrorResponse(message=message, code=code).dict(), **extra},
+    )
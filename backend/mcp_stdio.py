@@ -0,0 +1,92 @@
+"""MCP server over stdio.
+
+Run with ``python -m backend.mcp_stdio``. Messages are newline-delimited
+JSON-RPC on stdin/stdout; logs go to stderr. Tool calls run as the user
+identified by the Firebase ID token in ``MCP_ID_TOKEN``. Requests are handled
+concurrently and answered as they complete, so clients may pipeline them.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any, Optional, Set, TextIO
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from .auth import authenticate_token
+from .logging_config import setup_logging
+from .models import User
+from .services.audit import audit_enabled, audit_log
+from .services.db import close_client, get_database, init_firebase
+from .services.mcp import handle_jsonrpc_text
+
+logger = logging.getLogger(__name__)
+
+
+class StdioServer:
+    def __init__(
+        self,
+        user: User,
+        reader: Optional[TextIO] = None,
+        writer: Optional[TextIO] = None,
+    ) -> None:
+        self.user = user
+        self.reader = reader or sys.stdin
+        self.writer = writer or sys.stdout
+        self._write_lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def write(self, message: Any) -> None:
+        async with self._write_lock:
+            self.writer.write(json.dumps(message, default=str) + "\n")
+            self.writer.flush()
+
+    async def _handle(self, line: str) -> None:
+        response = await handle_jsonrpc_text(line, self.user)
+        if response is not None:
+            await self.write(response)
+
+    async def serve(self) -> None:
+        while True:
+            line = await asyncio.to_thread(self.reader.readline)
+            if not line:
+                break
+            if not line.strip():
+                continue
+            task = asyncio.create_task(self._handle(line))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+
+async def main() -> int:
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+    setup_logging()
+    token = os.getenv("MCP_ID_TOKEN")
+    if not token:
+        logger.error("MCP_ID_TOKEN must be set to a Firebase ID token")
+        return 1
+    init_firebase()
+    get_database()
+    try:
+        user = await authenticate_token(token)
+    except HTTPException as exc:
+        logger.error("Authentication failed: %s", exc.detail)
+        return 1
+    if audit_enabled():
+        audit_log.start()
+    try:
+        await StdioServer(user).serve()
+    finally:
+        await audit_log.stop()
+        close_client()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -8,7 +8,12 @@ from .content import (
     PageUpdate,
     ArticleCreate,
     ArticleUpdate,
+    ArticleFacet,
+    FacetCount,
+    SectionInfo,
+    SectionUpdate,
 )
+from .revision import RevisionedCollection, RevisionInfo
 from .tool import ToolCall, ToolResponse
 
 __all__ = [
@@ -25,4 +30,10 @@ __all__ = [
     "PageUpdate",
     "ArticleCreate",
     "ArticleUpdate",
+    "ArticleFacet",
+    "FacetCount",
+    "SectionInfo",
+    "SectionUpdate",
+    "RevisionedCollection",
+    "RevisionInfo",
 ]
@@ -1,10 +1,28 @@
 from datetime import datetime
-from typing import List, Optional
+from enum import Enum
+from typing import Any, Dict, List, Optional
 import uuid
 
 from pydantic import BaseModel, Field
 
 
+class SectionInfo(BaseModel):
+    """Addressable part of a content body, see ``services/sections.py``."""
+
+    key: str
+    title: str
+    offset: int
+    length: int
+
+
+class SectionUpdate(BaseModel):
+    """Replacement text for one section, including its heading line."""
+
+    content: str
+    # Version the client last read; the update fails with 409 if it changed
+    version: Optional[int] = None
+
+
 class Page(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
@@ -14,6 +32,12 @@ class Page(BaseModel):
     parent_id: Optional[str] = None
     author_id: str
     status: str = "draft"  # draft, published, archived
+    # Sanitised HTML rendered from ``content`` on write
+    content_html: Optional[str] = None
+    content_hash: Optional[str] = None
+    render_version: Optional[int] = None
+    sections: List[SectionInfo] = []
+    version: int = 1
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     published_at: Optional[datetime] = None
@@ -28,6 +52,8 @@ class PageCreate(BaseModel):
     meta_description: Optional[str] = None
     parent_id: Optional[str] = None
     status: str = "draft"
+    # With status "scheduled": when the scheduler publishes the page
+    published_at: Optional[datetime] = None
 
 
 class PageUpdate(BaseModel):
@@ -39,6 +65,9 @@ class PageUpdate(BaseModel):
     meta_description: Optional[str] = None
     parent_id: Optional[str] = None
     status: Optional[str] = None
+    published_at: Optional[datetime] = None
+    # Version the client last read; the update fails with 409 if it changed
+    version: Optional[int] = None
 
 
 class Article(BaseModel):
@@ -52,6 +81,12 @@ class Article(BaseModel):
     category_id: Optional[str] = None
     tags: List[str] = []
     status: str = "draft"
+    # Sanitised HTML rendered from ``content`` on write
+    content_html: Optional[str] = None
+    content_hash: Optional[str] = None
+    render_version: Optional[int] = None
+    sections: List[SectionInfo] = []
+    version: int = 1
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     published_at: Optional[datetime] = None
@@ -68,6 +103,8 @@ class ArticleCreate(BaseModel):
     category_id: Optional[str] = None
     tags: List[str] = []
     status: str = "draft"
+    # With status "scheduled": when the scheduler publishes the article
+    published_at: Optional[datetime] = None
 
 
 class ArticleUpdate(BaseModel):
@@ -81,6 +118,23 @@ class ArticleUpdate(BaseModel):
     category_id: Optional[str] = None
     tags: Optional[List[str]] = None
     status: Optional[str] = None
+    published_at: Optional[datetime] = None
+    # Version the client last read; the update fails with 409 if it changed
+    version: Optional[int] = None
+
+
+class ArticleFacet(str, Enum):
+    """Article fields with maintained counts, see ``services/facets.py``."""
+
+    TAGS = "tags"
+    CATEGORY = "category"
+    STATUS = "status"
+    AUTHOR = "author"
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
 
 
 class Category(BaseModel):
@@ -101,3 +155,9 @@ class MediaFile(BaseModel):
     url: str
     uploaded_by: str
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+    # Hex SHA-256 of the content; identical uploads share one stored file
+    sha256: Optional[str] = None
+    # GridFS file id of the stored content
+    storage_id: Optional[str] = None
+    # Resized variants by name, see services/derivatives.py
+    derivatives: Dict[str, Dict[str, Any]] = {}
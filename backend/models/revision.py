@@ -0,0 +1,17 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class RevisionedCollection(str, Enum):
+    PAGES = "pages"
+    ARTICLES = "articles"
+
+
+class RevisionInfo(BaseModel):
+    version: int
+    kind: str  # snapshot or delta
+    author_id: Optional[str] = None
+    created_at: datetime
@@ -6,6 +6,8 @@ from pydantic import BaseModel
 class ToolCall(BaseModel):
     tool: str
     args: Dict[str, Any]
+    # Retries with the same key replay the first successful response
+    idempotency_key: Optional[str] = None
 
 
 class ToolResponse(BaseModel):
@@ -1,21 +1,32 @@
 import logging
 import os
 from datetime import datetime
-from typing import List
-
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Annotated, Dict, List, Optional
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Header,
+    Query,
+    Request,
+    WebSocket,
+)
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import ValidationError
 from pymongo.errors import PyMongoError
 
-from ..services.ai import AIServiceError
-
-from ..auth import get_current_user, require_roles
-from ..errors import ErrorResponse
+from ..diagnostics import loop_monitor, loop_monitor_enabled
+from ..auth import get_current_user, get_stream_user, require_roles
+from ..errors import http_error
 from ..models import (
     Article,
     ArticleCreate,
+    ArticleFacet,
     ArticleUpdate,
     Category,
+    FacetCount,
+    MediaFile,
     Page,
     PageCreate,
     PageUpdate,
@@ -24,9 +35,39 @@ from ..models import (
     User,
     UserRole,
     RegisterUserRequest,
+    RevisionedCollection,
+    RevisionInfo,
+    SectionInfo,
+    SectionUpdate,
+)
+from ..services.content import (
+    delete_document,
+    get_document,
+    get_section_index,
+    insert_document,
+    read_sections,
+    restore_revision,
+    update_document,
+    update_section,
 )
-from ..services.db import db
-from ..services.tools import tool_registry
+from ..services.db import db, read_collection
+from ..services.derivatives import SOURCE_TYPES as IMAGE_SOURCE_TYPES
+from ..services.derivatives import generate_all, get_derivative
+from ..services.events import sse_stream
+from ..services.facets import facet_counts
+from ..services.media import (
+    content_disposition,
+    delete_media,
+    etag_for,
+    get_media,
+    iter_content,
+    parse_range,
+    store_upload,
+)
+from ..services.revisions import diff_revisions, get_revision, list_revisions
+from ..services.mcp import ToolCallSession, execute_tool_call, handle_jsonrpc_text
+from ..services.registry import tool_registry
+from ..utils import slugify
 
 # Public routes don't require authentication
 public_router = APIRouter(prefix="/api")
@@ -37,24 +78,40 @@ protected_router = APIRouter(prefix="/api", dependencies=[Depends(get_current_us
 logger = logging.getLogger(__name__)
 
 
+def _flag_duplicates(doc: dict, response: Response) -> dict:
+    """Move near-duplicate matches of a new document into a response header."""
+    duplicates = doc.pop("possible_duplicates", None)
+    if duplicates:
+        response.headers["X-Possible-Duplicates"] = ",".join(
+            match["id"] for match in duplicates
+        )
+    return doc
+
+
 @protected_router.post("/mcp/dispatch", response_model=ToolResponse)
-async def dispatch_tool(tool_call: ToolCall, user: User = Depends(get_current_user)):
-    """Main MCP endpoint for tool dispatching."""
-    try:
-        tool = tool_registry.get_tool(tool_call.tool)
-        if not tool:
-            return ToolResponse(
-                success=False, error=f"Tool '{tool_call.tool}' not found"
-            )
+async def dispatch_tool(
+    tool_call: ToolCall,
+    user: User = Depends(get_current_user),
+    idempotency_key: Annotated[Optional[str], Header()] = None,
+):
+    """Main MCP endpoint for tool dispatching.
+
+    An ``Idempotency-Key`` header (or ``idempotency_key`` in the body) makes
+    retries replay the first successful response instead of running again.
+    """
+    if idempotency_key and not tool_call.idempotency_key:
+        tool_call.idempotency_key = idempotency_key
+    return await execute_tool_call(tool_call, user)
+
 
-        result = await tool.execute(tool_call.args, user)
-        return ToolResponse(success=True, data=result)
-    except HTTPException as e:
-        logger.warning("Tool dispatch error: %s", e.detail)
-        return ToolResponse(success=False, error="Tool execution failed")
-    except (AIServiceError, PyMongoError, ValidationError) as exc:
-        logger.warning("Tool execution failed: %s", exc)
-        return ToolResponse(success=False, error="Tool execution failed")
+@protected_router.post("/mcp")
+async def mcp_jsonrpc(request: Request, user: User = Depends(get_current_user)):
+    """MCP streamable HTTP transport: one JSON-RPC message or batch per POST."""
+    body = (await request.body()).decode("utf-8", errors="replace")
+    response = await handle_jsonrpc_text(body, user)
+    if response is None:
+        return Response(status_code=202)
+    return JSONResponse(response)
 
 
 @protected_router.get("/mcp/tools")
@@ -85,16 +142,11 @@ async def register_user(
         }
 
         user = User(**user_data)
-        await db.users.insert_one(user.dict())
+        await insert_document("users", user.dict())
         return {"message": "User registered successfully", "user_id": user.id}
     except (ValidationError, PyMongoError) as exc:
         logger.warning("User registration failed: %s", exc)
-        raise HTTPException(
-            status_code=400,
-            detail=ErrorResponse(
-                message="Registration failed", code="registration_failed"
-            ).dict(),
-        )
+        raise http_error(400, "Registration failed", "registration_failed")
 
 
 @protected_router.get("/auth/me")
@@ -106,22 +158,28 @@ async def get_current_user_info(user: User = Depends(get_current_user)):
 @protected_router.get("/pages", response_model=List[Page])
 async def get_pages(user: User = Depends(get_current_user)):
     """Get all pages."""
-    pages = await db.pages.find().to_list(1000)
+    pages = await read_collection("pages").find().to_list(1000)
     return [Page(**page) for page in pages]
 
 
+def _section_keys(sections: Optional[str]) -> List[str]:
+    return [key.strip() for key in (sections or "").split(",") if key.strip()]
+
+
 @protected_router.get("/pages/{page_id}", response_model=Page)
-async def get_page(page_id: str, user: User = Depends(get_current_user)):
+async def get_page(
+    page_id: str,
+    sections: Optional[str] = Query(
+        None, description="Comma-separated section keys to return instead of all"
+    ),
+    user: User = Depends(get_current_user),
+):
     """Get a specific page."""
-    page = await db.pages.find_one({"id": page_id})
-    if not page:
-        raise HTTPException(
-            status_code=404,
-            detail=ErrorResponse(
-                message="Page not found", code="page_not_found"
-            ).dict(),
+    if _section_keys(sections):
+        return Page(
+            **await read_sections("pages", page_id, _section_keys(sections), "Page")
         )
-    return Page(**page)
+    return Page(**await get_document("pages", page_id, "Page"))
 
 
 @protected_router.post(
@@ -130,18 +188,17 @@ async def get_page(page_id: str, user: User = Depends(get_current_user)):
 )
 async def create_page(
     page: PageCreate,
+    response: Response,
     user: User = Depends(get_current_user),
     _role_check: None = require_roles(UserRole.ADMIN, UserRole.EDITOR, UserRole.AUTHOR),
 ):
     """Create a new page."""
     page_data = page.dict()
-    page_data["slug"] = page_data.get("slug") or page_data["title"].lower().replace(
-        " ", "-"
-    )
+    page_data["slug"] = page_data.get("slug") or slugify(page_data["title"])
     page_data["author_id"] = user.id
     new_page = Page(**page_data)
-    await db.pages.insert_one(new_page.dict())
-    return new_page
+    doc = await insert_document("pages", new_page.dict())
+    return Page(**_flag_duplicates(doc, response))
 
 
 @protected_router.put(
@@ -155,29 +212,13 @@ async def update_page(
     _role_check: None = require_roles(UserRole.ADMIN, UserRole.EDITOR, UserRole.AUTHOR),
 ):
     """Update a page."""
-    page_doc = await db.pages.find_one({"id": page_id})
-    if not page_doc:
-        raise HTTPException(
-            status_code=404,
-            detail=ErrorResponse(
-                message="Page not found", code="page_not_found"
-            ).dict(),
-        )
-
-    if user.role == UserRole.AUTHOR and page_doc.get("author_id") != user.id:
-        raise HTTPException(
-            status_code=403,
-            detail=ErrorResponse(
-                message="Insufficient permissions", code="insufficient_role"
-            ).dict(),
-        )
-
     update_data = page_update.dict(exclude_unset=True)
+    expected_version = update_data.pop("version", None)
     if "title" in update_data and "slug" not in update_data:
-        update_data["slug"] = update_data["title"].lower().replace(" ", "-")
-    update_data["updated_at"] = datetime.utcnow()
-    await db.pages.update_one({"id": page_id}, {"$set": update_data})
-    page_doc.update(update_data)
+        update_data["slug"] = slugify(update_data["title"])
+    page_doc = await update_document(
+        "pages", page_id, update_data, user, expected_version, label="Page"
+    )
     return Page(**page_doc)
 
 
@@ -190,36 +231,33 @@ async def delete_page(
     _role_check: None = require_roles(UserRole.ADMIN, UserRole.EDITOR),
 ):
     """Delete a page."""
-    result = await db.pages.delete_one({"id": page_id})
-    if not getattr(result, "deleted_count", 0):
-        raise HTTPException(
-            status_code=404,
-            detail=ErrorResponse(
-                message="Page not found", code="page_not_found"
-            ).dict(),
-        )
+    await delete_document("pages", page_id, label="Page")
     return {"message": "Page deleted"}
 
 
 @protected_router.get("/articles", response_model=List[Article])
 async def get_articles(user: User = Depends(get_current_user)):
     """Get all articles."""
-    articles = await db.articles.find().to_list(1000)
+    articles = await read_collection("articles").find().to_list(1000)
     return [Article(**article) for article in articles]
 
 
 @protected_router.get("/articles/{article_id}", response_model=Article)
-async def get_article(article_id: str, user: User = Depends(get_current_user)):
+async def get_article(
+    article_id: str,
+    sections: Optional[str] = Query(
+        None, description="Comma-separated section keys to return instead of all"
+    ),
+    user: User = Depends(get_current_user),
+):
     """Get a specific article."""
-    article = await db.articles.find_one({"id": article_id})
-    if not article:
-        raise HTTPException(
-            status_code=404,
-            detail=ErrorResponse(
-                message="Article not found", code="article_not_found"
-            ).dict(),
+    if _section_keys(sections):
+        return Article(
+            **await read_sections(
+                "articles", article_id, _section_keys(sections), "Article"
+            )
         )
-    return Article(**article)
+    return Article(**await get_document("articles", article_id, "Article"))
 
 
 @protected_router.post(
@@ -228,18 +266,17 @@ async def get_article(article_id: str, user: User = Depends(get_current_user)):
 )
 async def create_article(
     article: ArticleCreate,
+    response: Response,
     user: User = Depends(get_current_user),
     _role_check: None = require_roles(UserRole.ADMIN, UserRole.EDITOR, UserRole.AUTHOR),
 ):
     """Create a new article."""
     article_data = article.dict()
-    article_data["slug"] = article_data.get("slug") or article_data[
-        "title"
-    ].lower().replace(" ", "-")
+    article_data["slug"] = article_data.get("slug") or slugify(article_data["title"])
     article_data["author_id"] = user.id
     new_article = Article(**article_data)
-    await db.articles.insert_one(new_article.dict())
-    return new_article
+    doc = await insert_document("articles", new_article.dict())
+    return Article(**_flag_duplicates(doc, response))
 
 
 @protected_router.put(
@@ -253,29 +290,13 @@ async def update_article(
     _role_check: None = require_roles(UserRole.ADMIN, UserRole.EDITOR, UserRole.AUTHOR),
 ):
     """Update an article."""
-    article_doc = await db.articles.find_one({"id": article_id})
-    if not article_doc:
-        raise HTTPException(
-            status_code=404,
-            detail=ErrorResponse(
-                message="Article not found", code="article_not_found"
-            ).dict(),
-        )
-
-    if user.role == UserRole.AUTHOR and article_doc.get("author_id") != user.id:
-        raise HTTPException(
-            status_code=403,
-            detail=ErrorResponse(
-                message="Insufficient permissions", code="insufficient_role"
-            ).dict(),
-        )
-
     update_data = article_update.dict(exclude_unset=True)
+    expected_version = update_data.pop("version", None)
     if "title" in update_data and "slug" not in update_data:
-        update_data["slug"] = update_data["title"].lower().replace(" ", "-")
-    update_data["updated_at"] = datetime.utcnow()
-    await db.articles.update_one({"id": article_id}, {"$set": update_data})
-    article_doc.update(update_data)
+        update_data["slug"] = slugify(update_data["title"])
+    article_doc = await update_document(
+        "articles", article_id, update_data, user, expected_version, label="Article"
+    )
     return Article(**article_doc)
 
 
@@ -288,44 +309,263 @@ async def delete_article(
     _role_check: None = require_roles(UserRole.ADMIN, UserRole.EDITOR),
 ):
     """Delete an article."""
-    result = await db.articles.delete_one({"id": article_id})
-    if not getattr(result, "deleted_count", 0):
-        raise HTTPException(
-            status_code=404,
-            detail=ErrorResponse(
-                message="Article not found", code="article_not_found"
-            ).dict(),
-        )
+    await delete_document("articles", article_id, label="Article")
     return {"message": "Article deleted"}
 
 
+@protected_router.post("/media", response_model=MediaFile, status_code=201)
+async def upload_media(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    user: User = Depends(get_current_user),
+    _role_check: None = require_roles(UserRole.ADMIN, UserRole.EDITOR, UserRole.AUTHOR),
+):
+    """Stream a multipart upload (field ``file``) into GridFS."""
+    doc, _duplicate = await store_upload(
+        request.stream(), request.headers.get("content-type", ""), user
+    )
+    if doc["file_type"].startswith(IMAGE_SOURCE_TYPES):
+        background_tasks.add_task(generate_all, doc["id"])
+    return MediaFile(**doc)
+
+
+@protected_router.get("/media", response_model=List[MediaFile])
+async def list_media(user: User = Depends(get_current_user)):
+    """Get all media files."""
+    media = await read_collection("media").find().to_list(1000)
+    return [MediaFile(**doc) for doc in media]
+
+
+@protected_router.get("/media/{media_id}", response_model=MediaFile)
+async def get_media_file(media_id: str, user: User = Depends(get_current_user)):
+    """Get the metadata of a media file."""
+    return MediaFile(**await get_media(media_id))
+
+
+@protected_router.delete("/media/{media_id}")
+async def delete_media_file(
+    media_id: str,
+    user: User = Depends(get_current_user),
+    _role_check: None = require_roles(UserRole.ADMIN, UserRole.EDITOR),
+):
+    """Delete a media file and its stored content."""
+    await delete_media(media_id)
+    return {"message": "Media deleted"}
+
+
+@protected_router.get(
+    "/{collection}/{doc_id}/revisions", response_model=List[RevisionInfo]
+)
+async def get_revisions(
+    collection: RevisionedCollection,
+    doc_id: str,
+    user: User = Depends(get_current_user),
+):
+    """List the stored versions of a page or article, newest first."""
+    return await list_revisions(collection.value, doc_id)
+
+
+@protected_router.get("/{collection}/{doc_id}/revisions/diff")
+async def get_revision_diff(
+    collection: RevisionedCollection,
+    doc_id: str,
+    from_version: int,
+    to_version: int,
+    user: User = Depends(get_current_user),
+):
+    """Compare two versions of a page or article."""
+    old = await get_revision(collection.value, doc_id, from_version)
+    new = await get_revision(collection.value, doc_id, to_version)
+    return diff_revisions(old, new)
+
+
+@protected_router.get("/{collection}/{doc_id}/revisions/{version}")
+async def get_revision_content(
+    collection: RevisionedCollection,
+    doc_id: str,
+    version: int,
+    user: User = Depends(get_current_user),
+):
+    """Reconstruct a stored version of a page or article."""
+    return await get_revision(collection.value, doc_id, version)
+
+
+@protected_router.post("/{collection}/{doc_id}/revisions/{version}/restore")
+async def restore_document_revision(
+    collection: RevisionedCollection,
+    doc_id: str,
+    version: int,
+    user: User = Depends(get_current_user),
+    _role_check: None = require_roles(UserRole.ADMIN, UserRole.EDITOR, UserRole.AUTHOR),
+):
+    """Restore an old version as the newest version of the document."""
+    label = "Page" if collection == RevisionedCollection.PAGES else "Article"
+    doc = await restore_revision(collection.value, doc_id, version, user, label)
+    return Page(**doc) if label == "Page" else Article(**doc)
+
+
+@protected_router.get(
+    "/{collection}/{doc_id}/sections", response_model=List[SectionInfo]
+)
+async def get_sections(
+    collection: RevisionedCollection,
+    doc_id: str,
+    user: User = Depends(get_current_user),
+):
+    """List the addressable sections of a page or article."""
+    label = "Page" if collection == RevisionedCollection.PAGES else "Article"
+    return await get_section_index(collection.value, doc_id, label)
+
+
+@protected_router.put("/{collection}/{doc_id}/sections/{key}")
+async def put_section(
+    collection: RevisionedCollection,
+    doc_id: str,
+    key: str,
+    section: SectionUpdate,
+    user: User = Depends(get_current_user),
+    _role_check: None = require_roles(UserRole.ADMIN, UserRole.EDITOR, UserRole.AUTHOR),
+):
+    """Replace one section; the response contains only the changed sections."""
+    label = "Page" if collection == RevisionedCollection.PAGES else "Article"
+    doc = await update_section(
+        collection.value, doc_id, key, section.content, user, section.version, label
+    )
+    return Page(**doc) if label == "Page" else Article(**doc)
+
+
 @protected_router.get("/categories", response_model=List[Category])
 async def get_categories(user: User = Depends(get_current_user)):
     """Get all categories."""
-    categories = await db.categories.find().to_list(1000)
+    categories = await read_collection("categories").find().to_list(1000)
     return [Category(**category) for category in categories]
 
 
+@protected_router.get("/facets/articles", response_model=Dict[str, List[FacetCount]])
+async def get_article_facets(
+    limit: int = Query(20, ge=1, le=500, description="Values per facet"),
+    user: User = Depends(get_current_user),
+):
+    """Count articles per tag, category, status and author."""
+    return {
+        facet.value: await facet_counts("articles", facet.value, limit)
+        for facet in ArticleFacet
+    }
+
+
+@protected_router.get("/facets/articles/{facet}", response_model=List[FacetCount])
+async def get_article_facet(
+    facet: ArticleFacet,
+    limit: int = Query(100, ge=1, le=1000),
+    user: User = Depends(get_current_user),
+):
+    """Values of one article facet, most frequent first."""
+    return await facet_counts("articles", facet.value, limit)
+
+
 @protected_router.get("/dashboard/stats")
 async def get_dashboard_stats(
     user: User = Depends(get_current_user),
     _role_check: None = require_roles(UserRole.ADMIN, UserRole.EDITOR),
 ):
     """Get dashboard statistics."""
+    pages = read_collection("pages")
+    articles = read_collection("articles")
     stats = {
-        "total_pages": await db.pages.count_documents({}),
-        "total_articles": await db.articles.count_documents({}),
-        "total_users": await db.users.count_documents({}),
-        "published_pages": await db.pages.count_documents({"status": "published"}),
-        "published_articles": await db.articles.count_documents(
-            {"status": "published"}
-        ),
-        "draft_pages": await db.pages.count_documents({"status": "draft"}),
-        "draft_articles": await db.articles.count_documents({"status": "draft"}),
+        "total_pages": await pages.count_documents({}),
+        "total_articles": await articles.count_documents({}),
+        "total_users": await read_collection("users").count_documents({}),
+        "published_pages": await pages.count_documents({"status": "published"}),
+        "published_articles": await articles.count_documents({"status": "published"}),
+        "draft_pages": await pages.count_documents({"status": "draft"}),
+        "draft_articles": await articles.count_documents({"status": "draft"}),
     }
     return stats
 
 
+@public_router.get("/events")
+async def stream_events(request: Request, user: User = Depends(get_stream_user)):
+    """Stream content change events as Server-Sent Events.
+
+    Authenticates with the ``Authorization`` header or ``?access_token=``.
+    """
+    return StreamingResponse(
+        sse_stream(user, last_event_id=request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@protected_router.get("/diagnostics/loop")
+async def get_loop_diagnostics(
+    user: User = Depends(get_current_user),
+    _role_check: None = require_roles(UserRole.ADMIN),
+):
+    """Return event loop lag statistics and recent blocking stretches."""
+    return {"enabled": loop_monitor_enabled(), **loop_monitor.stats()}
+
+
+@public_router.websocket("/mcp/ws")
+async def mcp_websocket(websocket: WebSocket):
+    """Persistent MCP transport; authentication happens in the first message."""
+    await ToolCallSession(websocket).serve()
+
+
+def _stored_file_response(request: Request, entry: dict) -> Response:
+    """Stream a stored media file honouring ETags and single byte ranges."""
+    etag = etag_for(entry)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "X-Content-Type-Options": "nosniff",
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Content-Disposition": content_disposition(entry),
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in (
+        tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+    ):
+        return Response(status_code=304, headers=headers)
+
+    size = entry["file_size"]
+    start, end, status_code = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+        if byte_range:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_content(entry, start, end),
+        status_code=status_code,
+        media_type=entry["file_type"],
+        headers=headers,
+    )
+
+
+@public_router.get("/media/{media_id}/content")
+async def download_media(media_id: str, request: Request):
+    """Serve media content.
+
+    Public so that published pages can embed media directly.
+    """
+    return _stored_file_response(request, await get_media(media_id))
+
+
+@public_router.get("/media/{media_id}/derivatives/{name}")
+async def download_media_derivative(media_id: str, name: str, request: Request):
+    """Serve a resized variant, generating it on first request."""
+    return _stored_file_response(request, await get_derivative(media_id, name))
+
+
 @public_router.get("/config/firebase")
 async def get_firebase_config() -> dict:
     """Return Firebase initialization settings."""
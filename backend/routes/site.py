@@ -0,0 +1,72 @@
+"""Public sitemap and feed endpoints at the root of the site."""
+
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
+
+from ..errors import http_error
+from ..services.sitemap import Rendered, site_url, sitemap_cache, sitemap_max_age
+
+site_router = APIRouter()
+
+
+def _base(request: Request) -> str:
+    return site_url() or str(request.base_url).rstrip("/")
+
+
+def _not_modified(request: Request, entry: Rendered, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in (
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        )
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        generated = entry.generated_at.replace(microsecond=0, tzinfo=timezone.utc)
+        return generated <= since
+    return False
+
+
+def _xml_response(request: Request, entry: Rendered, media_type: str) -> Response:
+    base = _base(request)
+    etag = entry.etag_for(base)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(
+            entry.generated_at.replace(tzinfo=timezone.utc), usegmt=True
+        ),
+        "Cache-Control": f"public, max-age={int(sitemap_max_age())}",
+    }
+    if _not_modified(request, entry, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body_for(base), media_type=media_type, headers=headers)
+
+
+@site_router.get("/sitemap.xml")
+async def get_sitemap(request: Request):
+    """Sitemap of published content, or the index of its shards."""
+    name = "index" if await sitemap_cache.shards() > 1 else 0
+    entry = await sitemap_cache.get(name)
+    return _xml_response(request, entry, "application/xml")
+
+
+@site_router.get("/sitemaps/{shard}.xml")
+async def get_sitemap_shard(shard: int, request: Request):
+    """One shard of the sitemap, as listed in the sitemap index."""
+    if not 0 <= shard < await sitemap_cache.shards():
+        raise http_error(404, "Sitemap not found", "sitemap_not_found")
+    entry = await sitemap_cache.get(shard)
+    return _xml_response(request, entry, "application/xml")
+
+
+@site_router.get("/feed.xml")
+async def get_feed(request: Request):
+    """Atom feed of the most recently updated published articles."""
+    entry = await sitemap_cache.get("feed")
+    return _xml_response(request, entry, "application/atom+xml")
@@ -1,5 +1,6 @@
 import logging
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -7,10 +8,26 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.cors import CORSMiddleware
+from .diagnostics import loop_monitor, loop_monitor_enabled
 from .errors import ErrorResponse
 from .logging_config import setup_logging
 from .routes.api import protected_router, public_router
-from .services.db import client, ensure_indexes, init_firebase, check_db_env
+from .routes.site import site_router
+from .services.audit import audit_enabled, audit_log
+from .services.content import ensure_document_versions
+from .services.derivatives import shutdown_executor
+from .services.events import change_streams_enabled, change_watcher
+from .services.registry import tool_registry
+from .services.scheduler import publish_scheduler, scheduler_enabled
+from .services.static_export import static_export_enabled, static_exporter
+from .services.vectors import context_indexer, vector_index_enabled
+from .services.db import (
+    check_db_env,
+    close_client,
+    ensure_indexes,
+    get_database,
+    init_firebase,
+)
 
 
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
@@ -45,9 +62,44 @@ allowed_origins = [
 if not allowed_origins:
     raise RuntimeError("ALLOWED_ORIGINS environment variable must not be empty")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create heavy clients on startup instead of at import time."""
+    check_db_env()
+    if loop_monitor_enabled():
+        loop_monitor.start()
+    init_firebase()
+    get_database()
+    await ensure_indexes()
+    await ensure_document_versions()
+    if change_streams_enabled():
+        change_watcher.start()
+    if vector_index_enabled():
+        context_indexer.start()
+    if scheduler_enabled():
+        publish_scheduler.start()
+    if static_export_enabled():
+        static_exporter.start()
+    if audit_enabled():
+        audit_log.start()
+    await tool_registry.warm_up()
+    yield
+    await publish_scheduler.stop()
+    await static_exporter.stop()
+    await change_watcher.stop()
+    await context_indexer.stop()
+    # Drained last; calls finishing after this are spilled to disk
+    await audit_log.stop()
+    shutdown_executor()
+    await loop_monitor.stop()
+    close_client()
+
+
 app = FastAPI(
     title="MCP-CMS",
     description="Model Context Protocol based Content Management System",
+    lifespan=lifespan,
 )
 
 # Security headers middleware must run before other middleware
@@ -56,6 +108,7 @@ app.add_middleware(SecurityHeadersMiddleware)
 # Register API routes
 app.include_router(public_router)
 app.include_router(protected_router)
+app.include_router(site_router)
 
 # CORS middleware
 app.add_middleware(
@@ -70,20 +123,6 @@ app.add_middleware(
 setup_logging()
 logger = logging.getLogger(__name__)
 
-# Initialize Firebase when the module is imported
-init_firebase()
-
-
-@app.on_event("startup")
-async def startup_db_client():
-    check_db_env()
-    await ensure_indexes()
-
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
-
 
 # FastAPI exception handlers
 @app.exception_handler(HTTPException)
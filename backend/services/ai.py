@@ -3,8 +3,6 @@ import logging
 import os
 from typing import Any, Dict
 
-import httpx
-
 logger = logging.getLogger(__name__)
 
 
@@ -29,6 +27,8 @@ class AIService:
 
     async def post(self, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         """POST to the AI service with retries."""
+        import httpx
+
         url = f"{self.base_url}{endpoint}"
         last_exc: Exception | None = None
         for attempt in range(1, self.retries + 1):
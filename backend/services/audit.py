@@ -0,0 +1,335 @@
+"""Write-behind audit log of MCP tool calls.
+
+Every tool call, whatever its transport, is recorded in ``audit_log`` with
+the user, the tool, a SHA-256 of its arguments, the outcome and the
+duration. Calls never wait for the database: ``record`` appends to an
+in-memory buffer, and a background task writes it with ``insert_many``
+once ``AUDIT_BATCH_SIZE`` entries are waiting or ``AUDIT_FLUSH_SECONDS``
+have passed.
+
+When the database is slow or unreachable no entry is dropped. A write that
+fails or exceeds ``AUDIT_WRITE_TIMEOUT`` is appended to the spill file
+``AUDIT_SPILL_PATH`` (JSON lines), and so is the buffer whenever it grows
+past ``AUDIT_MAX_BUFFER`` while a write is still in flight. After the next
+successful write the spill file is replayed into the database. Entries
+carry their own ``_id``, so replaying an entry that did reach the database
+is harmless. On shutdown the buffer is drained, into the spill file if the
+database does not accept it; entries recorded after that go straight to the
+spill file. Calls that raise or are cancelled are recorded too, with the
+outcome ``exception`` or ``cancelled``.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Set
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from ..models import ToolCall, ToolResponse, User
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+AUDIT_COLLECTION = "audit_log"
+DEFAULT_SPILL_PATH = Path(__file__).resolve().parents[2] / "data" / "audit-spill.jsonl"
+DUPLICATE_KEY = 11000
+
+
+def audit_enabled() -> bool:
+    return os.getenv("AUDIT_LOG", "on").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def audit_batch_size() -> int:
+    return max(1, int(os.getenv("AUDIT_BATCH_SIZE", "200")))
+
+
+def audit_flush_seconds() -> float:
+    return float(os.getenv("AUDIT_FLUSH_SECONDS", "1"))
+
+
+def audit_max_buffer() -> int:
+    return max(1, int(os.getenv("AUDIT_MAX_BUFFER", "10000")))
+
+
+def audit_write_timeout() -> float:
+    return float(os.getenv("AUDIT_WRITE_TIMEOUT", "5"))
+
+
+def audit_spill_path() -> Path:
+    return Path(os.getenv("AUDIT_SPILL_PATH") or DEFAULT_SPILL_PATH)
+
+
+def args_digest(args: Dict[str, Any]) -> str:
+    payload = json.dumps(args, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def audit_entry(
+    tool_call: ToolCall,
+    user: User,
+    response: Optional[ToolResponse],
+    duration: float,
+    outcome: Optional[str] = None,
+) -> Dict[str, Any]:
+    """The audit record of one call.
+
+    ``outcome`` is ``success`` or ``error`` from ``response``; calls that
+    raised or were cancelled have no response and pass ``exception`` or
+    ``cancelled`` instead.
+    """
+    if response is not None:
+        outcome = "success" if response.success else "error"
+    return {
+        "_id": uuid.uuid4().hex,
+        "timestamp": datetime.utcnow(),
+        "user_id": user.id,
+        "role": getattr(user.role, "value", user.role),
+        "tool": tool_call.tool,
+        "args_sha256": args_digest(tool_call.args),
+        "idempotency_key": tool_call.idempotency_key,
+        "outcome": outcome,
+        "success": outcome == "success",
+        "error": response.error if response is not None else outcome,
+        "duration_ms": round(duration * 1000, 3),
+    }
+
+
+@contextmanager
+def _locked_spill(path: Path, mode: str) -> Iterator[Optional[IO[str]]]:
+    """Open ``path`` locked; None if it vanished.
+
+    ``replay`` renames the file while holding the lock, so a writer that
+    opened it before the rename finds another file at ``path`` once it has
+    the lock, and must not write into the claimed one.
+    """
+    import fcntl
+
+    while True:
+        try:
+            handle = open(path, mode, encoding="utf-8")
+        except FileNotFoundError:
+            yield None
+            return
+        with handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                current = None
+            opened = os.fstat(handle.fileno())
+            if current is None or (current.st_dev, current.st_ino) != (
+                opened.st_dev,
+                opened.st_ino,
+            ):
+                if mode == "r":
+                    yield None
+                    return
+                continue
+            yield handle
+            return
+
+
+def _append_lines(path: Path, entries: List[Dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = "".join(
+        json.dumps({**entry, "timestamp": entry["timestamp"].isoformat()}) + "\n"
+        for entry in entries
+    )
+    # Several workers may spill into the same file
+    with _locked_spill(path, "a") as handle:
+        handle.write(lines)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def _spill_lines(entries: List[Dict[str, Any]]) -> int:
+    """Append ``entries`` to the spill file; return how many were written."""
+    path = audit_spill_path()
+    try:
+        _append_lines(path, entries)
+    except OSError:
+        logger.exception("Lost %d audit entries: cannot write %s", len(entries), path)
+        return 0
+    logger.warning("Spilled %d audit entries to %s", len(entries), path)
+    return len(entries)
+
+
+def _claim(path: Path, claimed: Path) -> bool:
+    """Rename the spill file to ``claimed`` unless nobody is appending."""
+    with _locked_spill(path, "r") as handle:
+        if handle is None:
+            return False
+        os.replace(path, claimed)
+        return True
+
+
+def _read_lines(path: Path) -> List[Dict[str, Any]]:
+    entries = []
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+                entry["timestamp"] = datetime.fromisoformat(entry["timestamp"])
+            except (ValueError, KeyError, TypeError):
+                # A torn last line from a crash while spilling
+                logger.warning("Skipping unreadable audit spill line")
+                continue
+            entries.append(entry)
+    return entries
+
+
+class AuditLog:
+    """Buffer audit entries and write them to MongoDB in the background."""
+
+    def __init__(self) -> None:
+        self._buffer: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._spills: Set[asyncio.Task] = set()
+        self._writing = False
+        self._started = False
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def recording(self) -> bool:
+        """Whether ``record`` keeps entries; stays true after ``stop``."""
+        return self._started
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """Queue ``entry``; never waits for the database."""
+        if not self._started:
+            return
+        if not self.running:
+            # Stopped: nothing would write the buffer any more. Blocking is
+            # acceptable here, the process is shutting down.
+            self.spilled += _spill_lines([entry])
+            return
+        self._buffer.append(entry)
+        if len(self._buffer) >= audit_max_buffer() and self._writing:
+            # The database is not keeping up; park the backlog on disk
+            entries, self._buffer = self._buffer, []
+            task = asyncio.get_running_loop().create_task(self._spill(entries))
+            self._spills.add(task)
+            task.add_done_callback(self._spills.discard)
+        elif len(self._buffer) >= audit_batch_size():
+            self._wakeup.set()
+
+    async def _spill(self, entries: List[Dict[str, Any]]) -> None:
+        self.spilled += await asyncio.to_thread(_spill_lines, entries)
+
+    async def _insert(self, entries: List[Dict[str, Any]]) -> None:
+        """Insert ``entries``, ignoring those already stored."""
+        try:
+            await asyncio.wait_for(
+                getattr(db, AUDIT_COLLECTION).insert_many(entries, ordered=False),
+                audit_write_timeout(),
+            )
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY for error in errors):
+                raise
+
+    async def flush(self) -> int:
+        """Write the buffer in batches; spill what the database rejects."""
+        written = 0
+        failed = False
+        self._writing = True
+        try:
+            while self._buffer:
+                size = audit_batch_size()
+                batch, self._buffer = self._buffer[:size], self._buffer[size:]
+                try:
+                    await self._insert(batch)
+                except asyncio.CancelledError:
+                    # Written again on shutdown; duplicates are ignored
+                    self._buffer = batch + self._buffer
+                    raise
+                except (PyMongoError, asyncio.TimeoutError) as exc:
+                    logger.warning("Audit log write failed: %s", exc)
+                    entries, self._buffer = batch + self._buffer, []
+                    await self._spill(entries)
+                    failed = True
+                    break
+                written += len(batch)
+        finally:
+            self._writing = False
+            self.written += written
+        if written and not failed:
+            await self.replay()
+        return written
+
+    async def replay(self) -> int:
+        """Move spilled entries into the database; return how many moved."""
+        path = audit_spill_path()
+        if not path.exists():
+            return 0
+        # Claim the file so only one worker replays it
+        claimed = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}")
+        if not await asyncio.to_thread(_claim, path, claimed):
+            return 0
+        entries = await asyncio.to_thread(_read_lines, claimed)
+        size = audit_batch_size()
+        replayed = 0
+        for start in range(0, len(entries), size):
+            try:
+                await self._insert(entries[start : start + size])
+            except (PyMongoError, asyncio.TimeoutError) as exc:
+                logger.warning("Audit spill replay failed: %s", exc)
+                await asyncio.to_thread(_append_lines, path, entries[start:])
+                break
+            replayed += len(entries[start : start + size])
+        claimed.unlink()
+        self.replayed += replayed
+        return replayed
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), audit_flush_seconds())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:  # pragma: no cover - retried with the next flush
+                logger.exception("Audit log flush failed")
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._started = True
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self.run())
+        logger.info("Audit log started")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._spills:
+            await asyncio.gather(*self._spills)
+        await self.flush()
+        logger.info(
+            "Audit log stopped: %d written, %d spilled", self.written, self.spilled
+        )
+
+
+audit_log = AuditLog()
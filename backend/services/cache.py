@@ -0,0 +1,386 @@
+"""Key/value caches for the auth and content layers.
+
+``CACHE_BACKEND`` selects the backend:
+
+- ``none`` (default): nothing is cached.
+- ``local``: an LRU dict per worker process.
+- ``shared``: one memory-mapped file (under ``/dev/shm`` where available)
+  shared by all workers on a host, so each entry is fetched and stored once
+  per host instead of once per worker.
+
+The shared cache is a set-associative table of fixed-size slots. A key
+hashes to a set of ``WAYS`` slots; a full set evicts its least recently
+read entry. Reads take no lock: every slot carries a sequence counter that
+writers make odd while they write (a seqlock) plus a CRC of the value, so a
+reader that raced a writer sees a mismatch and retries. Writers serialise
+per stripe of sets with an ``fcntl`` byte-range lock, which works across
+processes.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKENDS = ("none", "local", "shared")
+MAGIC = b"AMTC"
+LAYOUT_VERSION = 1
+# magic, layout version, slots, slot size, ways
+HEADER = struct.Struct("<4sIIII")
+HEADER_SIZE = 64
+# sequence, key hash, expires at, last read, value length, value crc32,
+# key length
+SLOT = struct.Struct("<QQddIIH")
+SLOT_HEADER = 48
+SEQUENCE = struct.Struct("<Q")
+KEY_HASH_OFFSET = 8
+LAST_READ = struct.Struct("<d")
+LAST_READ_OFFSET = 24
+WAYS = 8
+STRIPES = 64
+READ_RETRIES = 4
+
+
+def cache_backend() -> str:
+    backend = os.getenv("CACHE_BACKEND", "none").strip().lower()
+    return backend if backend in CACHE_BACKENDS else "none"
+
+
+def cache_slots() -> int:
+    """Number of entries the cache can hold."""
+    return int(os.getenv("CACHE_SLOTS", "4096"))
+
+
+def cache_slot_bytes() -> int:
+    """Size of one slot; larger entries are not cached."""
+    return int(os.getenv("CACHE_SLOT_BYTES", "4096"))
+
+
+def cache_path() -> Path:
+    configured = os.getenv("CACHE_PATH")
+    if configured:
+        return Path(configured)
+    directory = Path("/dev/shm") if Path("/dev/shm").is_dir() else None
+    # A directory only this user can enter: /dev/shm and /tmp are world
+    # writable, and the cache holds authentication results
+    directory = (directory or Path(tempfile.gettempdir())) / f"amtlich-{os.getuid()}"
+    # The layout is part of the name so differently configured deployments
+    # never map the same file
+    name = f"amtlich-{os.getenv('DB_NAME', 'cms')}-{cache_slots()}x{cache_slot_bytes()}"
+    return directory / f"{name}.cache"
+
+
+def _check_private(fd: int, path: Path, kind: int) -> None:
+    """Refuse files that another user created or can write."""
+    info = os.fstat(fd)
+    if stat.S_IFMT(info.st_mode) != kind:
+        raise OSError(f"{path} has an unexpected file type")
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise OSError(f"{path} must be owned by this user and private (0700/0600)")
+
+
+class CacheBackend:
+    """Interface of all backends; on its own it caches nothing."""
+
+    # Largest key plus value a backend stores; 0 stores nothing
+    max_value = 0
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def fits(self, size: int) -> bool:
+        """Whether a value of about ``size`` bytes could be stored at all."""
+        return size <= self.max_value
+
+    def get(self, key: str) -> Optional[bytes]:
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: bytes, ttl: float) -> bool:
+        return False
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def get_json(self, key: str) -> Any:
+        raw = self.get(key)
+        return None if raw is None else json.loads(raw)
+
+    def set_json(self, key: str, value: Any, ttl: float) -> bool:
+        if not self.max_value:
+            return False
+        data = json.dumps(value, default=str, separators=(",", ":"))
+        return self.set(key, data.encode("utf-8"), ttl)
+
+
+class LocalCache(CacheBackend):
+    """Per-process LRU cache with the same limits as the shared cache."""
+
+    def __init__(self, slots: int, slot_bytes: int) -> None:
+        super().__init__()
+        self.slots = slots
+        self.max_value = slot_bytes - SLOT_HEADER
+        # key -> (expires at, value)
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.time():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float) -> bool:
+        if len(key.encode("utf-8")) + len(value) > self.max_value:
+            return False
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.slots:
+            self._entries.popitem(last=False)
+        return True
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class SharedMemoryCache(CacheBackend):
+    """Fixed-size cache in a memory-mapped file shared between processes."""
+
+    def __init__(self, path: Path, slots: int, slot_bytes: int) -> None:
+        import fcntl
+
+        super().__init__()
+        self._fcntl = fcntl
+        self.path = Path(path)
+        self.sets = max(1, slots // WAYS)
+        self.slots = self.sets * WAYS
+        self.slot_bytes = slot_bytes
+        self.max_value = slot_bytes - SLOT_HEADER
+        self._thread_locks = [threading.Lock() for _ in range(STRIPES)]
+        size = HEADER_SIZE + self.slots * slot_bytes
+        header = HEADER.pack(MAGIC, LAYOUT_VERSION, self.slots, slot_bytes, WAYS)
+
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            _check_private(self._fd, self.path, stat.S_IFREG)
+        except OSError:
+            os.close(self._fd)
+            raise
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            current = os.pread(self._fd, HEADER.size, 0)
+            if current != header or os.fstat(self._fd).st_size != size:
+                if current:
+                    logger.warning("Reinitialising shared cache %s", self.path)
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, header, 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        # Never 0, which marks an empty slot
+        digest = hashlib.blake2b(key, digest_size=8).digest()
+        return int.from_bytes(digest, "little") | 1
+
+    def _set_index(self, key_hash: int) -> int:
+        return key_hash % self.sets
+
+    def _slot_offset(self, set_index: int, way: int) -> int:
+        return HEADER_SIZE + (set_index * WAYS + way) * self.slot_bytes
+
+    @contextmanager
+    def _stripe(self, set_index: int) -> Iterator[None]:
+        stripe = set_index % STRIPES
+        with self._thread_locks[stripe]:
+            # Byte-range locks on the first STRIPES bytes of the file
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN, 1, stripe)
+
+    def _read(self, offset: int, key_hash: int, key: bytes) -> Optional[bytes]:
+        view = self._map
+        # Most slots of a set belong to other keys; reject them cheaply
+        if SEQUENCE.unpack_from(view, offset + KEY_HASH_OFFSET)[0] != key_hash:
+            return None
+        for _ in range(READ_RETRIES):
+            sequence, stored_hash, expires, _, length, crc, key_length = (
+                SLOT.unpack_from(view, offset)
+            )
+            if stored_hash != key_hash:
+                return None
+            if sequence & 1:
+                continue
+            start = offset + SLOT_HEADER
+            if key_length + length > self.max_value:
+                continue
+            stored_key = view[start : start + key_length]
+            value = view[start + key_length : start + key_length + length]
+            if SEQUENCE.unpack_from(view, offset)[0] != sequence:
+                continue
+            if zlib.crc32(value) != crc:
+                continue
+            if stored_key != key:
+                return None
+            now = time.time()
+            if expires < now:
+                return None
+            # Unsynchronised recency hint for eviction; a lost update is fine
+            LAST_READ.pack_into(view, offset + LAST_READ_OFFSET, now)
+            return value
+        return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        encoded = key.encode("utf-8")
+        key_hash = self._hash(encoded)
+        set_index = self._set_index(key_hash)
+        for way in range(WAYS):
+            value = self._read(self._slot_offset(set_index, way), key_hash, encoded)
+            if value is not None:
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def _find(self, set_index: int, key_hash: int, key: bytes) -> Optional[int]:
+        """Offset of the slot holding ``key``; callers hold the stripe lock."""
+        for way in range(WAYS):
+            offset = self._slot_offset(set_index, way)
+            if SEQUENCE.unpack_from(self._map, offset + KEY_HASH_OFFSET)[0] != key_hash:
+                continue
+            key_length = SLOT.unpack_from(self._map, offset)[6]
+            start = offset + SLOT_HEADER
+            if self._map[start : start + key_length] == key:
+                return offset
+        return None
+
+    def _victim(self, set_index: int) -> int:
+        """An empty or expired slot, else the least recently read one."""
+        now = time.time()
+        best_offset, best_read = 0, float("inf")
+        for way in range(WAYS):
+            offset = self._slot_offset(set_index, way)
+            _, stored_hash, expires, last_read, _, _, _ = SLOT.unpack_from(
+                self._map, offset
+            )
+            if not stored_hash or expires < now:
+                return offset
+            if last_read < best_read:
+                best_offset, best_read = offset, last_read
+        return best_offset
+
+    def _write(self, offset: int, key_hash: int, key: bytes, value: bytes, ttl: float):
+        view = self._map
+        sequence = SEQUENCE.unpack_from(view, offset)[0]
+        SEQUENCE.pack_into(view, offset, sequence + 1)
+        start = offset + SLOT_HEADER
+        view[start : start + len(key)] = key
+        view[start + len(key) : start + len(key) + len(value)] = value
+        now = time.time()
+        SLOT.pack_into(
+            view,
+            offset,
+            sequence + 1,
+            key_hash,
+            now + ttl,
+            now,
+            len(value),
+            zlib.crc32(value),
+            len(key),
+        )
+        SEQUENCE.pack_into(view, offset, sequence + 2)
+
+    def set(self, key: str, value: bytes, ttl: float) -> bool:
+        encoded = key.encode("utf-8")
+        if len(encoded) + len(value) > self.max_value:
+            return False
+        key_hash = self._hash(encoded)
+        set_index = self._set_index(key_hash)
+        with self._stripe(set_index):
+            offset = self._find(set_index, key_hash, encoded)
+            if offset is None:
+                offset = self._victim(set_index)
+            self._write(offset, key_hash, encoded, value, ttl)
+        return True
+
+    def _erase(self, offset: int) -> None:
+        sequence = SEQUENCE.unpack_from(self._map, offset)[0]
+        SLOT.pack_into(self._map, offset, sequence + 1, 0, 0.0, 0.0, 0, 0, 0)
+        SEQUENCE.pack_into(self._map, offset, sequence + 2)
+
+    def delete(self, key: str) -> None:
+        encoded = key.encode("utf-8")
+        key_hash = self._hash(encoded)
+        set_index = self._set_index(key_hash)
+        with self._stripe(set_index):
+            offset = self._find(set_index, key_hash, encoded)
+            if offset is not None:
+                self._erase(offset)
+
+    def clear(self) -> None:
+        for set_index in range(self.sets):
+            with self._stripe(set_index):
+                for way in range(WAYS):
+                    self._erase(self._slot_offset(set_index, way))
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+_cache: Optional[CacheBackend] = None
+
+
+def get_cache() -> CacheBackend:
+    """Return the configured cache of this process, creating it on first use."""
+    global _cache
+    if _cache is None:
+        backend = cache_backend()
+        if backend == "shared":
+            try:
+                _cache = SharedMemoryCache(
+                    cache_path(), cache_slots(), cache_slot_bytes()
+                )
+            except (ImportError, OSError) as exc:
+                logger.warning("Shared cache unavailable, using local: %s", exc)
+                backend = "local"
+        if backend == "local":
+            _cache = LocalCache(cache_slots(), cache_slot_bytes())
+        elif _cache is None:
+            _cache = CacheBackend()
+    return _cache
+
+
+def reset_cache() -> None:
+    """Drop this process's cache object so the next use reads the config again."""
+    global _cache
+    if isinstance(_cache, SharedMemoryCache):
+        _cache.close()
+    _cache = None
@@ -0,0 +1,395 @@
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from ..errors import http_error
+from ..models import User, UserRole
+from ..utils import as_utc
+from .cache import get_cache
+from .db import db
+from .duplicates import (
+    remove_fingerprint,
+    screen_document,
+    signature,
+    store_fingerprint,
+)
+from .events import event_bus, is_published, notify_change
+from .facets import FACETED_COLLECTIONS, facet_fields, record_facets
+from .render import RENDERED_COLLECTIONS, offload, render_content, rendered_fields
+from .revisions import get_revision, record_revision, restorable_fields
+from .sections import section_index, select_sections, splice_section
+
+logger = logging.getLogger(__name__)
+
+# Roles that may edit content written by other users
+PRIVILEGED_ROLES = (UserRole.ADMIN, UserRole.EDITOR)
+
+
+async def insert_document(collection: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Insert a new document and announce it to change listeners.
+
+    Pages and articles are screened for near-duplicates first; matches are
+    returned under ``possible_duplicates`` (not stored) in ``warn`` mode.
+    """
+    duplicates = []
+    fingerprinted = collection in RENDERED_COLLECTIONS
+    if fingerprinted:
+        _check_schedule(doc)
+        sig, fields = await offload(_process, doc.get("content") or "")
+        duplicates = await screen_document(collection, doc.get("id"), sig)
+        if "content" in doc:
+            doc.update(fields)
+    await getattr(db, collection).insert_one(doc)
+    if fingerprinted:
+        await store_fingerprint(collection, doc["id"], sig)
+    await record_facets(collection, None, doc)
+    await record_revision(collection, doc)
+    await notify_change(collection, "insert", doc, is_published(doc))
+    if duplicates:
+        doc["possible_duplicates"] = duplicates
+    return doc
+
+
+def _process(content: str) -> Tuple[Any, Dict[str, Any]]:
+    """MinHash signature and render output of a body, in one thread hand-off."""
+    return signature(content), rendered_fields(content)
+
+
+def _check_schedule(data: Dict[str, Any]) -> None:
+    """Normalise ``published_at``; scheduled documents must have one."""
+    if data.get("published_at") is not None:
+        data["published_at"] = as_utc(data["published_at"])
+    if data.get("status") == "scheduled" and data.get("published_at") is None:
+        raise _schedule_error()
+
+
+def _schedule_filter(update_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Conditions on the stored document under which ``update_data`` is valid.
+
+    A patch setting only the status or only the publish time is checked
+    against the other field as stored, in the update filter itself.
+    """
+    if "status" in update_data and "published_at" in update_data:
+        _check_schedule(update_data)
+        return {}
+    if update_data.get("published_at") is not None:
+        update_data["published_at"] = as_utc(update_data["published_at"])
+    elif "published_at" in update_data:
+        return {"status": {"$ne": "scheduled"}}
+    if update_data.get("status") == "scheduled":
+        return {"published_at": {"$ne": None}}
+    return {}
+
+
+def _schedule_error() -> HTTPException:
+    return http_error(
+        422, "Scheduled documents need a published_at time", "publish_time_required"
+    )
+
+
+def _not_found(label: str) -> HTTPException:
+    return http_error(404, f"{label} not found", f"{label.lower()}_not_found")
+
+
+def content_cache_ttl() -> float:
+    """Seconds a page or article read may be served from the cache."""
+    return float(os.getenv("CONTENT_CACHE_TTL", "60"))
+
+
+async def get_document(collection: str, doc_id: str, label: str) -> Dict[str, Any]:
+    """Read a whole document, from the cache when configured.
+
+    Writes announce themselves on the event bus, which evicts the entry; the
+    TTL bounds staleness for writes this host never hears about.
+    """
+    cache = get_cache()
+    key = f"{collection}:{doc_id}"
+    doc = cache.get_json(key)
+    if doc is not None:
+        return doc
+    doc = await getattr(db, collection).find_one({"id": doc_id})
+    if not doc:
+        raise _not_found(label)
+    doc.pop("_id", None)
+    # Skip serialising documents that cannot fit a cache slot anyway
+    size = sum(len(doc.get(name) or "") for name in ("content", "content_html"))
+    if cache.fits(size):
+        cache.set_json(key, doc, content_cache_ttl())
+    return doc
+
+
+def evict_cached_document(event: Dict[str, Any]) -> None:
+    if event.get("collection") in RENDERED_COLLECTIONS and event.get("id"):
+        get_cache().delete(f"{event['collection']}:{event['id']}")
+
+
+event_bus.add_listener(evict_cached_document)
+
+
+def _select(index: List[Dict[str, Any]], keys: List[str]) -> List[Dict[str, Any]]:
+    try:
+        return select_sections(index, keys)
+    except KeyError as exc:
+        raise http_error(404, f"Unknown section: {exc.args[0]}", "section_not_found")
+
+
+async def _partial(doc: Dict[str, Any], content: str) -> Dict[str, Any]:
+    return {
+        **doc,
+        "content": content,
+        "content_html": await offload(render_content, content),
+    }
+
+
+async def get_section_index(
+    collection: str, doc_id: str, label: str = "Document"
+) -> List[Dict[str, Any]]:
+    """Return the section index of a document without reading its body."""
+    target = getattr(db, collection)
+    doc = await target.find_one({"id": doc_id}, {"_id": 0, "sections": 1})
+    if doc is None:
+        raise _not_found(label)
+    if "sections" not in doc:
+        doc = await target.find_one({"id": doc_id}, {"_id": 0, "content": 1})
+        return section_index(doc.get("content", ""))
+    return doc["sections"]
+
+
+async def read_sections(
+    collection: str, doc_id: str, keys: List[str], label: str = "Document"
+) -> Dict[str, Any]:
+    """Return the document with ``content`` limited to the sections ``keys``.
+
+    The body is never loaded: the first query reads everything but the body,
+    the second only the requested spans of it via ``$substrCP``. Should the
+    document change in between, the read is repeated.
+    """
+    target = getattr(db, collection)
+    for _ in range(3):
+        head = await target.find_one(
+            {"id": doc_id}, {"_id": 0, "content": 0, "content_html": 0}
+        )
+        if head is None:
+            raise _not_found(label)
+        if "sections" not in head:
+            # Stored before sections were indexed; split the full body once
+            doc = await target.find_one({"id": doc_id})
+            selected = _select(section_index(doc.get("content", "")), keys)
+            return await _partial(
+                doc,
+                "".join(
+                    doc["content"][s["offset"] : s["offset"] + s["length"]]
+                    for s in selected
+                ),
+            )
+        selected = _select(head["sections"], keys)
+        projection: Dict[str, Any] = {"_id": 0}
+        for position, section in enumerate(selected):
+            projection[f"s{position}"] = {
+                "$substrCP": ["$content", section["offset"], section["length"]]
+            }
+        parts = await target.find_one(
+            {"id": doc_id, "version": head.get("version")}, projection
+        )
+        if parts is not None:
+            return await _partial(
+                head, "".join(parts[f"s{i}"] for i in range(len(selected)))
+            )
+    raise http_error(409, f"{label} is changing too quickly", "version_conflict")
+
+
+async def update_section(
+    collection: str,
+    doc_id: str,
+    key: str,
+    text: str,
+    user: User,
+    expected_version: Optional[int] = None,
+    label: str = "Document",
+) -> Dict[str, Any]:
+    """Replace section ``key`` with ``text`` and return the updated section.
+
+    The body is spliced on the server and written through ``update_document``
+    so rendering, history and change events stay in one place. Without an
+    ``expected_version`` a concurrent edit of another section is retried.
+    """
+    attempts = 3
+    while True:
+        attempts -= 1
+        doc = await getattr(db, collection).find_one({"id": doc_id})
+        if doc is None:
+            raise _not_found(label)
+        content = doc.get("content", "")
+        index = doc.get("sections")
+        if index is None:
+            index = section_index(content)
+        (section,) = _select(index, [key])
+        try:
+            updated = await update_document(
+                collection,
+                doc_id,
+                {"content": splice_section(content, section, text)},
+                user,
+                doc.get("version") if expected_version is None else expected_version,
+                label=label,
+            )
+        except HTTPException as exc:
+            if exc.status_code == 409 and expected_version is None and attempts:
+                continue
+            raise
+        start, end = section["offset"], section["offset"] + len(text)
+        content = updated["content"]
+        touched = [s for s in updated["sections"] if start <= s["offset"] < end]
+        return await _partial(
+            updated,
+            "".join(content[s["offset"] : s["offset"] + s["length"]] for s in touched)
+            or text,
+        )
+
+
+async def delete_document(collection: str, doc_id: str, label: str) -> None:
+    """Delete a document by ``id`` or raise 404 if it does not exist."""
+    target = getattr(db, collection)
+    published = True
+    if collection in FACETED_COLLECTIONS or collection in RENDERED_COLLECTIONS:
+        # The deleted state is needed to decrement its facet counters and to
+        # tell whether published content went away
+        fields = ["status", *facet_fields(collection)]
+        projection = {"_id": 0, **{field: 1 for field in fields}}
+        deleted = await target.find_one_and_delete({"id": doc_id}, projection)
+        if deleted is None:
+            raise _not_found(label)
+        await record_facets(collection, deleted, None)
+        published = is_published(deleted)
+    else:
+        result = await target.delete_one({"id": doc_id})
+        if not getattr(result, "deleted_count", 0):
+            raise _not_found(label)
+    if collection in RENDERED_COLLECTIONS:
+        await remove_fingerprint(collection, doc_id)
+    await notify_change(collection, "delete", {"id": doc_id}, published)
+
+
+async def _updated(
+    collection: str,
+    before: Dict[str, Any],
+    doc: Dict[str, Any],
+    user: Optional[User],
+) -> None:
+    await record_facets(collection, before, doc)
+    await record_revision(collection, doc, before, user)
+    await notify_change(
+        collection, "update", doc, is_published(before) != is_published(doc)
+    )
+
+
+async def update_document(
+    collection: str,
+    doc_id: str,
+    update_data: Dict[str, Any],
+    user: User,
+    expected_version: Optional[int] = None,
+    label: str = "Document",
+) -> Dict[str, Any]:
+    """Atomically apply ``update_data`` and return the updated document.
+
+    Ownership and the optional ``expected_version`` are part of the update
+    filter, so permission check, compare-and-set and write happen in a single
+    ``find_one_and_update`` round trip. So is the stored half of the schedule
+    check when only status or publish time change. Only when nothing matched
+    is the document read again to tell 404, 403, 422 and 409 apart.
+
+    The pre-image is fetched and the new state derived from it, so revision
+    history gets both without another read.
+    """
+    query: Dict[str, Any] = {"id": doc_id}
+    if user.role not in PRIVILEGED_ROLES:
+        query["author_id"] = user.id
+    if expected_version is not None:
+        query["version"] = expected_version
+
+    if collection in RENDERED_COLLECTIONS:
+        query.update(_schedule_filter(update_data))
+    changes = {**update_data, "updated_at": datetime.utcnow()}
+    if collection in RENDERED_COLLECTIONS and "content" in update_data:
+        sig, fields = await offload(_process, update_data["content"] or "")
+        changes.update(fields)
+    target = getattr(db, collection)
+    # The previous state is returned so history can diff against it
+    before = await target.find_one_and_update(
+        query,
+        {"$set": changes, "$inc": {"version": 1}},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is not None:
+        doc = {**before, **changes, "version": before.get("version", 0) + 1}
+        if "content" in update_data and collection in RENDERED_COLLECTIONS:
+            await store_fingerprint(collection, doc_id, sig)
+        await _updated(collection, before, doc, user)
+        return doc
+
+    current = await target.find_one({"id": doc_id})
+    if not current:
+        raise _not_found(label)
+    if "author_id" in query and current.get("author_id") != user.id:
+        raise http_error(403, "Insufficient permissions", "insufficient_role")
+    merged = {**current, **update_data}
+    if merged.get("status") == "scheduled" and merged.get("published_at") is None:
+        raise _schedule_error()
+    raise http_error(
+        409,
+        f"{label} was modified by someone else",
+        "version_conflict",
+        current_version=current.get("version", 1),
+    )
+
+
+async def publish_scheduled(
+    collection: str, doc_id: str, now: datetime
+) -> Optional[Dict[str, Any]]:
+    """Publish a scheduled document that is due; None if it is not (any more).
+
+    Status and time are part of the update filter, so when several workers
+    race for the same document exactly one of them publishes it, and a
+    document rescheduled or unpublished in the meantime is left alone.
+    """
+    changes = {"status": "published", "updated_at": now}
+    before = await getattr(db, collection).find_one_and_update(
+        {"id": doc_id, "status": "scheduled", "published_at": {"$lte": now}},
+        {"$set": changes, "$inc": {"version": 1}},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is None:
+        return None
+    doc = {**before, **changes, "version": before.get("version", 0) + 1}
+    await _updated(collection, before, doc, None)
+    return doc
+
+
+async def ensure_document_versions() -> None:
+    """Give content documents created before versioning an initial version."""
+    for name in ("pages", "articles"):
+        collection = getattr(db, name, None)
+        if collection is None or not hasattr(collection, "update_many"):
+            continue
+        result = await collection.update_many(
+            {"version": {"$exists": False}}, {"$set": {"version": 1}}
+        )
+        if getattr(result, "modified_count", 0):
+            logger.info(
+                "Initialised version of %s %s documents", result.modified_count, name
+            )
+
+
+async def restore_revision(
+    collection: str, doc_id: str, version: int, user: User, label: str = "Document"
+) -> Dict[str, Any]:
+    """Write the state of ``version`` back as a new version of the document."""
+    revision = await get_revision(collection, doc_id, version)
+    return await update_document(
+        collection, doc_id, restorable_fields(collection, revision), user, label=label
+    )
@@ -1,37 +1,145 @@
 import logging
 import os
 import json
-from pathlib import Path
+from typing import Any, Dict, Optional
 
-from dotenv import load_dotenv
-from motor.motor_asyncio import AsyncIOMotorClient
-import firebase_admin
-from firebase_admin import credentials
+logger = logging.getLogger(__name__)
 
+client: Optional[Any] = None
+_database: Optional[Any] = None
+_listing_read_preference: Optional[Any] = None
+
+# Environment variable, Motor/PyMongo option name and type of each setting
+CLIENT_SETTINGS = (
+    ("MONGO_MAX_POOL_SIZE", "maxPoolSize", int),
+    ("MONGO_MIN_POOL_SIZE", "minPoolSize", int),
+    ("MONGO_MAX_CONNECTING", "maxConnecting", int),
+    ("MONGO_MAX_IDLE_TIME_MS", "maxIdleTimeMS", int),
+    ("MONGO_WAIT_QUEUE_TIMEOUT_MS", "waitQueueTimeoutMS", int),
+    ("MONGO_CONNECT_TIMEOUT_MS", "connectTimeoutMS", int),
+    ("MONGO_SOCKET_TIMEOUT_MS", "socketTimeoutMS", int),
+    ("MONGO_SERVER_SELECTION_TIMEOUT_MS", "serverSelectionTimeoutMS", int),
+    ("MONGO_TIMEOUT_MS", "timeoutMS", int),
+    ("MONGO_COMPRESSORS", "compressors", str),
+    ("MONGO_ZLIB_COMPRESSION_LEVEL", "zlibCompressionLevel", int),
+    ("MONGO_APP_NAME", "appname", str),
+)
+
+# Smallest maxStalenessSeconds accepted by MongoDB
+MIN_MAX_STALENESS_SECONDS = 90
 
-ROOT_DIR = Path(__file__).resolve().parent.parent
-load_dotenv(ROOT_DIR / ".env")
 
-MONGO_URL = os.getenv("MONGO_URL")
-DB_NAME = os.getenv("DB_NAME")
+def check_db_env() -> None:
+    """Ensure required MongoDB environment variables are set."""
+    if not os.getenv("MONGO_URL"):
+        raise RuntimeError("MONGO_URL environment variable must be set")
+    if not os.getenv("DB_NAME"):
+        raise RuntimeError("DB_NAME environment variable must be set")
 
-if not MONGO_URL:
-    raise RuntimeError("MONGO_URL environment variable must be set")
-if not DB_NAME:
-    raise RuntimeError("DB_NAME environment variable must be set")
 
-client = AsyncIOMotorClient(MONGO_URL)
-db = client[DB_NAME]
+def client_options() -> Dict[str, Any]:
+    """Build Motor client keyword arguments from the ``MONGO_*`` settings."""
+    options: Dict[str, Any] = {}
+    for env_name, option, cast in CLIENT_SETTINGS:
+        value = os.getenv(env_name)
+        if value:
+            try:
+                options[option] = cast(value)
+            except ValueError:
+                raise RuntimeError(f"{env_name} must be of type {cast.__name__}")
+    return options
+
+
+def listing_read_preference() -> Optional[Any]:
+    """Return the read preference for listing queries, or None for primary.
+
+    ``MONGO_LIST_READ_PREFERENCE`` selects the mode (e.g. ``secondaryPreferred``)
+    and ``MONGO_MAX_STALENESS_SECONDS`` bounds how far behind a secondary may
+    be before it is no longer used.
+    """
+    mode = os.getenv("MONGO_LIST_READ_PREFERENCE", "primary")
+    if mode == "primary":
+        return None
+
+    from pymongo import read_preferences
+
+    modes = {
+        "primaryPreferred": read_preferences.PrimaryPreferred,
+        "secondary": read_preferences.Secondary,
+        "secondaryPreferred": read_preferences.SecondaryPreferred,
+        "nearest": read_preferences.Nearest,
+    }
+    if mode not in modes:
+        raise RuntimeError(f"Unsupported MONGO_LIST_READ_PREFERENCE: {mode}")
+
+    max_staleness = int(
+        os.getenv("MONGO_MAX_STALENESS_SECONDS", str(MIN_MAX_STALENESS_SECONDS))
+    )
+    if max_staleness != -1 and max_staleness < MIN_MAX_STALENESS_SECONDS:
+        raise RuntimeError(
+            "MONGO_MAX_STALENESS_SECONDS must be -1 or at least "
+            f"{MIN_MAX_STALENESS_SECONDS}"
+        )
+    return modes[mode](max_staleness=max_staleness)
+
+
+def get_database():
+    """Return the application database, creating the Motor client on first use."""
+    global client, _database, _listing_read_preference
+    if _database is None:
+        check_db_env()
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        options = client_options()
+        _listing_read_preference = listing_read_preference()
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"], **options)
+        _database = client[os.environ["DB_NAME"]]
+        logger.info(
+            "MongoDB client created (options=%s, listing reads=%s)",
+            sorted(options),
+            _listing_read_preference.name if _listing_read_preference else "primary",
+        )
+    return _database
 
-logger = logging.getLogger(__name__)
 
+def close_client() -> None:
+    """Close the Motor client if it has been created."""
+    global client, _database, _listing_read_preference
+    if client is not None:
+        client.close()
+    client = None
+    _database = None
+    _listing_read_preference = None
 
-def check_db_env() -> None:
-    """Ensure required MongoDB environment variables are set."""
-    if not MONGO_URL:
-        raise RuntimeError("MONGO_URL environment variable must be set")
-    if not DB_NAME:
-        raise RuntimeError("DB_NAME environment variable must be set")
+
+class _LazyDatabase:
+    """Stand-in for the Motor database that connects on first access.
+
+    Modules keep importing ``db`` at import time while the client itself is
+    only created in the application lifespan (or by the first query).
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_database(), name)
+
+    def __getitem__(self, name: str) -> Any:
+        return get_database()[name]
+
+
+db = _LazyDatabase()
+
+
+def read_collection(name: str) -> Any:
+    """Return collection ``name`` for listing and search queries.
+
+    These reads tolerate bounded staleness and may be routed to secondaries.
+    Writes and read-after-write lookups must use ``db`` directly, which always
+    reads from the primary.
+    """
+    collection = getattr(db, name)
+    if _listing_read_preference is None:
+        return collection
+    return collection.with_options(read_preference=_listing_read_preference)
 
 
 async def ensure_indexes() -> None:
@@ -48,14 +156,65 @@ async def ensure_indexes() -> None:
         if pages and hasattr(pages, "create_index"):
             await pages.create_index("id", unique=True)
             await pages.create_index("slug")
+            # Upcoming publications for the scheduler
+            await pages.create_index([("status", 1), ("published_at", 1)])
             logger.info("Page indexes ensured")
 
         articles = getattr(db, "articles", None)
         if articles and hasattr(articles, "create_index"):
             await articles.create_index("id", unique=True)
             await articles.create_index("slug")
+            await articles.create_index([("status", 1), ("published_at", 1)])
+            # Newest published articles for the feed
+            await articles.create_index([("status", 1), ("updated_at", -1)])
             logger.info("Article indexes ensured")
 
+        media = getattr(db, "media", None)
+        if media and hasattr(media, "create_index"):
+            await media.create_index("id", unique=True)
+            indexes = await media.index_information()
+            if indexes.get("sha256_1", {}).get("unique"):
+                # Uploads of the same content now share one file via media_blobs
+                await media.drop_index("sha256_1")
+            await media.create_index("sha256")
+            logger.info("Media indexes ensured")
+
+        revisions = getattr(db, "revisions", None)
+        if revisions and hasattr(revisions, "create_index"):
+            await revisions.create_index(
+                [("collection", 1), ("doc_id", 1), ("version", 1)], unique=True
+            )
+            logger.info("Revision indexes ensured")
+
+        fingerprints = getattr(db, "fingerprints", None)
+        if fingerprints and hasattr(fingerprints, "create_index"):
+            await fingerprints.create_index(
+                [("collection", 1), ("doc_id", 1)], unique=True
+            )
+            # Multikey index over the LSH band hashes for candidate lookups
+            await fingerprints.create_index("bands")
+            logger.info("Fingerprint indexes ensured")
+
+        idempotency_keys = getattr(db, "idempotency_keys", None)
+        if idempotency_keys and hasattr(idempotency_keys, "create_index"):
+            # Entries are removed once ``expires_at`` has passed
+            await idempotency_keys.create_index("expires_at", expireAfterSeconds=0)
+            logger.info("Idempotency indexes ensured")
+
+        facet_counts = getattr(db, "facet_counts", None)
+        if facet_counts and hasattr(facet_counts, "create_index"):
+            # Serves facet listings sorted by count without a sort stage
+            await facet_counts.create_index(
+                [("collection", 1), ("facet", 1), ("count", -1), ("value", 1)]
+            )
+            logger.info("Facet indexes ensured")
+
+        audit = getattr(db, "audit_log", None)
+        if audit and hasattr(audit, "create_index"):
+            await audit.create_index("timestamp")
+            await audit.create_index([("user_id", 1), ("timestamp", -1)])
+            logger.info("Audit log indexes ensured")
+
         logger.info("MongoDB indexes ensured")
     except Exception as e:  # pragma: no cover - index creation best effort
         logger.exception("Failed to create indexes: %s", e)
@@ -68,6 +227,9 @@ def init_firebase() -> None:
             os.environ.get("FIREBASE_SERVICE_ACCOUNT", "{}")
         )
         if firebase_service_account:
+            import firebase_admin
+            from firebase_admin import credentials
+
             cred = credentials.Certificate(firebase_service_account)
             firebase_admin.initialize_app(cred)
             logger.info("Firebase Admin SDK initialized successfully")
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import logging
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..errors import http_error
+from . import media
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+# name -> (longest edge in pixels, output format)
+DEFAULT_DERIVATIVES = "thumb=320:webp,web=1280:webp"
+FORMAT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+# Source formats Pillow is asked to decode
+SOURCE_TYPES = ("image/jpeg", "image/png", "image/webp", "image/gif", "image/tiff")
+
+_executor: Optional[ProcessPoolExecutor] = None
+_inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+def derivative_specs() -> Dict[str, Tuple[int, str]]:
+    """Parse ``MEDIA_DERIVATIVES`` (``name=size:format,...``)."""
+    specs: Dict[str, Tuple[int, str]] = {}
+    raw = os.getenv("MEDIA_DERIVATIVES", DEFAULT_DERIVATIVES)
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        try:
+            name, spec = item.split("=")
+            size, fmt = spec.split(":")
+            specs[name.strip()] = (int(size), fmt.strip().lower())
+        except ValueError:
+            raise RuntimeError(f"Invalid MEDIA_DERIVATIVES entry: {item}")
+        if specs[name.strip()][1] not in FORMAT_TYPES:
+            raise RuntimeError(f"Unsupported derivative format: {fmt}")
+    return specs
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        workers = int(os.getenv("IMAGE_WORKERS", "0")) or None
+        _executor = ProcessPoolExecutor(max_workers=workers)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def render_derivative(data: bytes, size: int, fmt: str) -> bytes:
+    """Resize ``data`` to fit ``size`` pixels and encode it as ``fmt``.
+
+    Runs in a worker process; Pillow is only imported there.
+    """
+    from io import BytesIO
+
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA")
+        output = BytesIO()
+        image.save(output, format=fmt.upper(), quality=82, optimize=True)
+    return output.getvalue()
+
+
+async def _read_original(doc: Dict[str, Any]) -> bytes:
+    parts = [chunk async for chunk in media.iter_content(doc, 0, doc["file_size"] - 1)]
+    return b"".join(parts)
+
+
+async def _generate(doc: Dict[str, Any], name: str) -> Dict[str, Any]:
+    size, fmt = derivative_specs()[name]
+    data = await _read_original(doc)
+    loop = asyncio.get_running_loop()
+    try:
+        output = await loop.run_in_executor(
+            get_executor(), render_derivative, data, size, fmt
+        )
+    except Exception as exc:  # undecodable, truncated or oversized image
+        logger.warning("Derivative %s of %s failed: %s", name, doc["id"], exc)
+        raise http_error(422, "Image cannot be processed", "image_unprocessable")
+
+    stem = posixpath.splitext(doc["original_filename"])[0]
+    filename = f"{stem}-{name}.{fmt}"
+    grid_in = media.media_bucket().open_upload_stream(
+        filename, metadata={"media_id": doc["id"], "derivative": name}
+    )
+    await grid_in.write(output)
+    await grid_in.close()
+    entry = {
+        "storage_id": str(grid_in._id),
+        "file_type": FORMAT_TYPES[fmt],
+        "file_size": len(output),
+        "sha256": hashlib.sha256(output).hexdigest(),
+        "original_filename": filename,
+    }
+
+    # Another worker may have stored the same variant in the meantime
+    result = await db.media.update_one(
+        {"id": doc["id"], f"derivatives.{name}": {"$exists": False}},
+        {"$set": {f"derivatives.{name}": entry}},
+    )
+    if not getattr(result, "modified_count", 1):
+        await media.media_bucket().delete(grid_in._id)
+        current = await media.get_media(doc["id"])
+        return current["derivatives"][name]
+    return entry
+
+
+async def get_derivative(media_id: str, name: str) -> Dict[str, Any]:
+    """Return the stored variant ``name`` of a media file, creating it if needed.
+
+    Concurrent requests for a missing variant share one generation task, so
+    the image is decoded and resized only once per process.
+    """
+    if name not in derivative_specs():
+        raise http_error(404, "Unknown derivative", "derivative_not_found")
+    doc = await media.get_media(media_id)
+    existing = (doc.get("derivatives") or {}).get(name)
+    if existing:
+        return existing
+    if not doc["file_type"].startswith(SOURCE_TYPES):
+        raise http_error(415, "Media is not an image", "not_an_image")
+
+    key = (media_id, name)
+    future = _inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_generate(doc, name))
+        _inflight[key] = future
+        future.add_done_callback(lambda _: _inflight.pop(key, None))
+        # Waiters may all have disconnected; keep failures from being unretrieved
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    return await asyncio.shield(future)
+
+
+async def generate_all(media_id: str) -> None:
+    """Create every configured variant of an uploaded image."""
+    for name in derivative_specs():
+        try:
+            await get_derivative(media_id, name)
+        except HTTPException as exc:
+            logger.info("Skipping derivative %s of %s: %s", name, media_id, exc.detail)
+            return
@@ -0,0 +1,231 @@
+"""Near-duplicate detection for pages and articles with MinHash and LSH.
+
+Each body is reduced to a MinHash signature over word shingles. The
+signature is cut into bands whose hashes are stored in ``fingerprints`` with
+a multikey index, so finding candidates is an index lookup instead of a scan
+of all documents; candidates are then ranked by the estimated Jaccard
+similarity of their signatures.
+"""
+
+import hashlib
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from ..errors import http_error
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_COLLECTION = "fingerprints"
+SHINGLE_SIZE = 3
+PERMUTATIONS = 128
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard very likely share a band
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+MIN_SHINGLES = 5
+DUPLICATE_MODES = ("off", "warn", "reject")
+
+_permutations: Optional[Any] = None
+
+
+def duplicate_mode() -> str:
+    """What creating a near-duplicate does: ``off``, ``warn`` or ``reject``."""
+    mode = os.getenv("DUPLICATE_MODE", "warn").strip().lower()
+    return mode if mode in DUPLICATE_MODES else "warn"
+
+
+def duplicate_threshold() -> float:
+    return float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))
+
+
+def shingles(text: str) -> Set[bytes]:
+    """Return the distinct word trigrams of ``text``."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {word.encode("utf-8") for word in words}
+    # Deduplicate the tuples before joining; boilerplate repeats a lot
+    grams = set(zip(*(words[i:] for i in range(SHINGLE_SIZE))))
+    return {" ".join(gram).encode("utf-8") for gram in grams}
+
+
+def _hash_permutations():
+    global _permutations
+    if _permutations is None:
+        import numpy as np
+
+        # Fixed seed: stored signatures must stay comparable across processes
+        rng = np.random.default_rng(1)
+        _permutations = (
+            rng.integers(0, 1 << 64, PERMUTATIONS, dtype=np.uint64) | np.uint64(1),
+            rng.integers(0, 1 << 64, PERMUTATIONS, dtype=np.uint64),
+        )
+    return _permutations
+
+
+def signature(text: str):
+    """Return the MinHash signature of ``text`` or None if it is too short."""
+    import numpy as np
+
+    items = shingles(text)
+    if len(items) < MIN_SHINGLES:
+        return None
+    hashes = np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(item, digest_size=4).digest(), "little")
+            for item in items
+        ),
+        dtype=np.uint64,
+        count=len(items),
+    )
+    a, b = _hash_permutations()
+    # Multiply-shift hashing: products wrap modulo 2**64, the high 32 bits
+    # of each are a well-mixed permutation of the shingle hashes
+    permuted = (a[:, None] * hashes[None, :] + b[:, None]) >> np.uint64(32)
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_keys(sig) -> List[int]:
+    """Hash each band of ``sig`` (including its number) to a signed int64."""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(
+                band.to_bytes(1, "little")
+                + sig[band * ROWS : (band + 1) * ROWS].tobytes(),
+                digest_size=8,
+            ).digest(),
+            "little",
+            signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first, second) -> float:
+    """Estimate the Jaccard similarity of two signatures."""
+    return float((first == second).mean())
+
+
+def decode_signature(data: bytes):
+    import numpy as np
+
+    return np.frombuffer(data, dtype=np.uint32)
+
+
+def fingerprint(collection: str, doc_id: str, sig) -> Dict[str, Any]:
+    return {
+        "collection": collection,
+        "doc_id": doc_id,
+        "signature": sig.tobytes(),
+        "bands": band_keys(sig),
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def fingerprint_operation(collection: str, doc_id: str, sig):
+    """Upsert the fingerprint of a document, or drop it for short bodies."""
+    from pymongo import DeleteOne, ReplaceOne
+
+    key = {"collection": collection, "doc_id": doc_id}
+    if sig is None:
+        return DeleteOne(key)
+    return ReplaceOne(key, fingerprint(collection, doc_id, sig), upsert=True)
+
+
+def fingerprint_operations(collection: str, docs: Iterable[Dict[str, Any]]):
+    """Bulk-write operations storing the fingerprints of ``docs``."""
+    return [
+        fingerprint_operation(
+            collection, doc["id"], signature(doc.get("content") or "")
+        )
+        for doc in docs
+    ]
+
+
+async def find_similar(
+    collection: str,
+    sig,
+    threshold: Optional[float] = None,
+    exclude: Optional[str] = None,
+    limit: int = 10,
+) -> List[Dict[str, Any]]:
+    """Return documents whose signature is at least ``threshold`` similar."""
+    threshold = duplicate_threshold() if threshold is None else threshold
+    candidates = (
+        await getattr(db, FINGERPRINT_COLLECTION)
+        .find(
+            {"collection": collection, "bands": {"$in": band_keys(sig)}},
+            {"_id": 0, "doc_id": 1, "signature": 1},
+        )
+        .to_list(None)
+    )
+    matches = []
+    for candidate in candidates:
+        if candidate["doc_id"] == exclude:
+            continue
+        score = similarity(sig, decode_signature(candidate["signature"]))
+        if score >= threshold:
+            matches.append({"id": candidate["doc_id"], "similarity": round(score, 3)})
+    matches.sort(key=lambda match: match["similarity"], reverse=True)
+    return matches[:limit]
+
+
+async def screen_document(
+    collection: str, doc_id: Optional[str], sig
+) -> List[Dict[str, Any]]:
+    """Check a new body's signature against existing ones per DUPLICATE_MODE.
+
+    Returns the near-duplicates found in ``warn`` mode and raises 409 in
+    ``reject`` mode.
+    """
+    mode = duplicate_mode()
+    if mode == "off" or sig is None:
+        return []
+    duplicates = await find_similar(collection, sig, exclude=doc_id)
+    if duplicates and mode == "reject":
+        raise http_error(
+            409,
+            "Content is a near-duplicate of existing documents",
+            "duplicate_content",
+            duplicates=duplicates,
+        )
+    return duplicates
+
+
+async def store_fingerprint(collection: str, doc_id: str, sig) -> None:
+    await getattr(db, FINGERPRINT_COLLECTION).bulk_write(
+        [fingerprint_operation(collection, doc_id, sig)]
+    )
+
+
+async def ensure_fingerprint_indexes(database) -> None:
+    fingerprints = database[FINGERPRINT_COLLECTION]
+    await fingerprints.create_index([("collection", 1), ("doc_id", 1)], unique=True)
+    # Multikey index over the band hashes, used for candidate lookups
+    await fingerprints.create_index("bands")
+
+
+async def remove_fingerprint(collection: str, doc_id: str) -> None:
+    await getattr(db, FINGERPRINT_COLLECTION).delete_one(
+        {"collection": collection, "doc_id": doc_id}
+    )
+
+
+async def duplicates_of(
+    collection: str, doc_id: str, threshold: Optional[float] = None, limit: int = 10
+) -> Optional[List[Dict[str, Any]]]:
+    """Near-duplicates of a stored document; None if it has no fingerprint."""
+    entry = await getattr(db, FINGERPRINT_COLLECTION).find_one(
+        {"collection": collection, "doc_id": doc_id}, {"_id": 0, "signature": 1}
+    )
+    if entry is None:
+        return None
+    return await find_similar(
+        collection,
+        decode_signature(entry["signature"]),
+        threshold,
+        exclude=doc_id,
+        limit=limit,
+    )
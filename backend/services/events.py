@@ -0,0 +1,381 @@
+import asyncio
+import inspect
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+)
+
+from ..models import User, UserRole
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ("pages", "articles", "users")
+TOKEN_COLLECTION = "change_stream_tokens"
+
+
+def change_streams_enabled() -> bool:
+    return os.getenv("CHANGE_STREAMS_ENABLED", "").strip().lower() in {
+        "1",
+        "true",
+        "yes",
+        "on",
+    }
+
+
+class EventBus:
+    """In-process publish/subscribe hub for content change events.
+
+    Listeners are called for every event (cache invalidation, indexes) while
+    subscribers receive events through bounded queues (SSE clients). A slow
+    subscriber loses its oldest events instead of blocking the publisher.
+    Recent events are kept so reconnecting clients can catch up.
+
+    Every event gets an ``event_id``. Events from the change stream use
+    their resume token, which is the same on every worker, so a client can
+    resume on any of them. Local events are numbered per process and only
+    resume on the worker that published them.
+    """
+
+    def __init__(self, queue_size: int = 100, history: int = 500) -> None:
+        self.queue_size = queue_size
+        self._listeners: List[Callable[[Dict[str, Any]], Any]] = []
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._sequence = 0
+        # Keeps local event ids of different workers apart
+        self._origin = uuid.uuid4().hex[:12]
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], Any]) -> None:
+        """Call ``callback`` (sync or async) with every published event."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Dict[str, Any]], Any]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    async def publish(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        self._sequence += 1
+        event = {**event, "seq": self._sequence}
+        event.setdefault("event_id", f"{self._origin}-{self._sequence}")
+        self._history.append(event)
+        for callback in list(self._listeners):
+            try:
+                result = callback(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:  # pragma: no cover - listener bugs must not spread
+                logger.exception("Event listener %r failed", callback)
+        for queue in list(self._subscribers):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+        return event
+
+    def events_since(self, event_id: str) -> List[Dict[str, Any]]:
+        """Return buffered events after ``event_id``; none if it is unknown."""
+        history = list(self._history)
+        for position, event in enumerate(history):
+            if event["event_id"] == event_id:
+                return history[position + 1 :]
+        return []
+
+    @contextmanager
+    def subscription(
+        self, last_event_id: Optional[str] = None
+    ) -> Iterator[asyncio.Queue]:
+        """Return a queue receiving new events while the context is open.
+
+        Buffered events after ``last_event_id`` are queued first so that a
+        reconnecting client does not miss what happened in between.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        if last_event_id is not None:
+            for event in self.events_since(last_event_id)[-self.queue_size :]:
+                queue.put_nowait(event)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+
+def is_published(doc: Optional[Dict[str, Any]]) -> bool:
+    return bool(doc) and doc.get("status") == "published"
+
+
+def _publication_changed(change: Dict[str, Any]) -> bool:
+    """Whether a change may have published or unpublished a document."""
+    operation = change["operationType"]
+    before = change.get("fullDocumentBeforeChange")
+    after = change.get("fullDocument")
+    if operation == "insert":
+        return is_published(after)
+    if operation == "delete":
+        # Without a pre-image the old state is unknown
+        return before is None or is_published(before)
+    if before is not None and after is not None:
+        return is_published(before) != is_published(after)
+    if operation == "update":
+        description = change.get("updateDescription") or {}
+        return "status" in (description.get("updatedFields") or {}) or (
+            "status" in (description.get("removedFields") or [])
+        )
+    return True
+
+
+def _with_firebase_uid(event: Dict[str, Any], doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the Firebase UID to user events; cached users are keyed by it."""
+    if event["collection"] == "users" and doc.get("firebase_uid"):
+        event["firebase_uid"] = doc["firebase_uid"]
+    return event
+
+
+def change_to_event(change: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a change stream document to the fields clients may see."""
+    document = change.get("fullDocument") or change.get("fullDocumentBeforeChange")
+    document = document or {}
+    cluster_time = change.get("clusterTime")
+    event = {
+        "collection": change["ns"]["coll"],
+        "operation": change["operationType"],
+        "id": document.get("id"),
+        "version": document.get("version"),
+        "publication_changed": _publication_changed(change),
+        "time": (
+            cluster_time.as_datetime().isoformat()
+            if hasattr(cluster_time, "as_datetime")
+            else datetime.utcnow().isoformat()
+        ),
+    }
+    token = change.get("_id")
+    if isinstance(token, dict) and token.get("_data"):
+        # The resume token orders and identifies the event on every worker
+        event["event_id"] = token["_data"]
+    return _with_firebase_uid(event, document)
+
+
+async def enable_pre_images(collections) -> None:
+    """Keep pre-images so delete events still carry the document ``id``.
+
+    Change events only identify documents by ``_id``; the ``id`` of a deleted
+    document is known from its pre-image, which MongoDB (6.0+) records only
+    for collections with ``changeStreamPreAndPostImages`` enabled.
+    """
+    from pymongo.errors import OperationFailure, PyMongoError
+
+    option = {"enabled": True}
+    for name in collections:
+        try:
+            try:
+                await db.command(
+                    {"collMod": name, "changeStreamPreAndPostImages": option}
+                )
+            except OperationFailure as exc:
+                if exc.code != 26:  # NamespaceNotFound
+                    raise
+                await db.create_collection(name, changeStreamPreAndPostImages=option)
+        except PyMongoError as exc:
+            logger.warning(
+                "Pre-images for %s not enabled, delete events lack ids: %s", name, exc
+            )
+
+
+class ChangeStreamWatcher:
+    """Tail the database change stream and publish events to an ``EventBus``.
+
+    The resume token is stored in ``change_stream_tokens`` so a restarted
+    worker continues where it stopped. Tokens are persisted at most every
+    ``checkpoint_interval`` seconds, so delivery is at-least-once.
+    """
+
+    def __init__(
+        self,
+        bus: EventBus,
+        name: str = "content",
+        collections=WATCHED_COLLECTIONS,
+        checkpoint_interval: float = 1.0,
+        retry_delay: float = 1.0,
+    ) -> None:
+        self.bus = bus
+        self.name = name
+        self.collections = tuple(collections)
+        self.checkpoint_interval = checkpoint_interval
+        self.retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+        self._token: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def pipeline(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "$match": {
+                    "ns.coll": {"$in": list(self.collections)},
+                    "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+                }
+            },
+            {
+                "$project": {
+                    "operationType": 1,
+                    "ns": 1,
+                    "clusterTime": 1,
+                    "fullDocument.id": 1,
+                    "fullDocument.version": 1,
+                    "fullDocument.status": 1,
+                    "fullDocument.firebase_uid": 1,
+                    "fullDocumentBeforeChange.id": 1,
+                    "fullDocumentBeforeChange.status": 1,
+                    "fullDocumentBeforeChange.firebase_uid": 1,
+                    "updateDescription.updatedFields.status": 1,
+                    "updateDescription.removedFields": 1,
+                }
+            },
+        ]
+
+    async def load_token(self) -> Optional[Dict[str, Any]]:
+        doc = await getattr(db, TOKEN_COLLECTION).find_one({"_id": self.name})
+        return doc["token"] if doc else None
+
+    async def save_token(self) -> None:
+        if self._token is None:
+            return
+        await getattr(db, TOKEN_COLLECTION).update_one(
+            {"_id": self.name},
+            {"$set": {"token": self._token, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+
+    async def watch_once(self) -> None:
+        """Consume the change stream until it fails or is cancelled."""
+        from pymongo.errors import OperationFailure
+
+        token = self._token or await self.load_token()
+        last_checkpoint = asyncio.get_running_loop().time()
+        try:
+            stream = db.watch(
+                self.pipeline(),
+                resume_after=token,
+                full_document="updateLookup",
+                full_document_before_change="whenAvailable",
+            )
+            async with stream:
+                async for change in stream:
+                    self._token = stream.resume_token
+                    await self.bus.publish(change_to_event(change))
+                    now = asyncio.get_running_loop().time()
+                    if now - last_checkpoint >= self.checkpoint_interval:
+                        await self.save_token()
+                        last_checkpoint = now
+        except OperationFailure as exc:
+            # 260/280/286: resume token no longer in the oplog
+            if token is not None and exc.code in (260, 280, 286):
+                logger.warning("Change stream history lost, restarting: %s", exc)
+                self._token = None
+                await getattr(db, TOKEN_COLLECTION).delete_one({"_id": self.name})
+                return
+            raise
+
+    async def run(self) -> None:
+        from pymongo.errors import PyMongoError
+
+        delay = self.retry_delay
+        await enable_pre_images(self.collections)
+        while True:
+            try:
+                await self.watch_once()
+                delay = self.retry_delay
+            except PyMongoError as exc:
+                logger.warning(
+                    "Change stream interrupted, retry in %ss: %s", delay, exc
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+            logger.info("Change stream watcher started for %s", self.collections)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await self.save_token()
+        except Exception:  # pragma: no cover - best effort on shutdown
+            logger.exception("Failed to store change stream resume token")
+
+
+event_bus = EventBus()
+change_watcher = ChangeStreamWatcher(event_bus)
+
+
+async def notify_change(
+    collection: str,
+    operation: str,
+    doc: Dict[str, Any],
+    publication_changed: bool = True,
+) -> None:
+    """Publish a local write when no change stream watcher delivers it.
+
+    With change streams enabled every worker receives all writes from the
+    database, so local notifications would only produce duplicates.
+    ``publication_changed`` tells whether the write may have published or
+    unpublished the document.
+    """
+    if change_watcher.running:
+        return
+    event = {
+        "collection": collection,
+        "operation": operation,
+        "id": doc.get("id"),
+        "version": doc.get("version"),
+        "publication_changed": publication_changed,
+        "time": datetime.utcnow().isoformat(),
+    }
+    await event_bus.publish(_with_firebase_uid(event, doc))
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"id: {event['event_id']}\nevent: change\ndata: {json.dumps(event)}\n\n"
+
+
+async def sse_stream(
+    user: User,
+    bus: EventBus = event_bus,
+    last_event_id: Optional[str] = None,
+    keepalive: float = 15.0,
+) -> AsyncIterator[str]:
+    """Yield change events for ``user`` formatted as Server-Sent Events."""
+    with bus.subscription(last_event_id) as queue:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event["collection"] == "users" and user.role != UserRole.ADMIN:
+                continue
+            yield format_sse(event)
@@ -0,0 +1,196 @@
+"""Facet counts for browsing articles by tag, category, status and author.
+
+Every (facet, value) pair has a counter document in ``facet_counts`` that
+content writes adjust with ``$inc`` from the difference between the old and
+the new state of an article, so listing a facet is one read of an index
+sorted by count instead of a scan of all articles. ``rebuild_facets``
+recomputes the counters from the articles themselves and ``check_facets``
+reports where they disagree.
+"""
+
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from .db import db, read_collection
+
+logger = logging.getLogger(__name__)
+
+FACET_COLLECTION = "facet_counts"
+# Facet name -> document field, per collection with facet counts
+FACETS: Dict[str, Dict[str, str]] = {
+    "articles": {
+        "tags": "tags",
+        "category": "category_id",
+        "status": "status",
+        "author": "author_id",
+    }
+}
+FACETED_COLLECTIONS = tuple(FACETS)
+
+
+def facet_fields(collection: str) -> List[str]:
+    return list(FACETS.get(collection, {}).values())
+
+
+def facet_values(collection: str, doc: Optional[Dict[str, Any]]) -> Counter:
+    """Count of each (facet, value) pair ``doc`` contributes; tags count once."""
+    counts: Counter = Counter()
+    if not doc:
+        return counts
+    for facet, field in FACETS[collection].items():
+        value = doc.get(field)
+        values = set(value) if isinstance(value, (list, tuple, set)) else {value}
+        for item in values:
+            if item is not None and item != "":
+                counts[(facet, str(item))] += 1
+    return counts
+
+
+def facet_delta(
+    collection: str,
+    before: Optional[Dict[str, Any]],
+    after: Optional[Dict[str, Any]],
+) -> Dict[Tuple[str, str], int]:
+    """Counter changes turning ``before`` into ``after`` (None = absent)."""
+    delta = facet_values(collection, after)
+    delta.subtract(facet_values(collection, before))
+    return {key: amount for key, amount in delta.items() if amount}
+
+
+def counter_id(collection: str, facet: str, value: str) -> str:
+    return f"{collection}:{facet}:{value}"
+
+
+def _counters(database=None):
+    if database is None:
+        return getattr(db, FACET_COLLECTION)
+    return database[FACET_COLLECTION]
+
+
+def _increment(collection: str, facet: str, value: str, amount: int):
+    from pymongo import UpdateOne
+
+    return UpdateOne(
+        {"_id": counter_id(collection, facet, value)},
+        {
+            "$inc": {"count": amount},
+            "$setOnInsert": {"collection": collection, "facet": facet, "value": value},
+        },
+        upsert=True,
+    )
+
+
+async def apply_delta(
+    collection: str, delta: Dict[Tuple[str, str], int], database=None
+) -> None:
+    """Apply counter changes; counters reaching zero are removed."""
+    if not delta:
+        return
+    target = _counters(database)
+    await target.bulk_write(
+        [
+            _increment(collection, facet, value, amount)
+            for (facet, value), amount in sorted(delta.items())
+        ],
+        ordered=False,
+    )
+    if any(amount < 0 for amount in delta.values()):
+        await target.delete_many(
+            {
+                "_id": {
+                    "$in": [
+                        counter_id(collection, facet, value)
+                        for (facet, value), amount in delta.items()
+                        if amount < 0
+                    ]
+                },
+                "count": {"$lte": 0},
+            }
+        )
+
+
+async def record_facets(
+    collection: str,
+    before: Optional[Dict[str, Any]],
+    after: Optional[Dict[str, Any]],
+) -> None:
+    """Adjust the counters for a write turning ``before`` into ``after``."""
+    if collection in FACETS:
+        await apply_delta(collection, facet_delta(collection, before, after))
+
+
+async def facet_counts(
+    collection: str, facet: str, limit: int = 50, database=None
+) -> List[Dict[str, Any]]:
+    """Values of one facet with their counts, most frequent first."""
+    if database is None:
+        counters = read_collection(FACET_COLLECTION)
+    else:
+        counters = database[FACET_COLLECTION]
+    cursor = counters.find(
+        {"collection": collection, "facet": facet, "count": {"$gt": 0}},
+        {"_id": 0, "value": 1, "count": 1},
+    ).sort([("count", -1), ("value", 1)])
+    return await cursor.to_list(limit)
+
+
+async def count_facets(database, collection: str, batch_size: int = 1000) -> Counter:
+    """Compute the facet counts of ``collection`` from its documents."""
+    projection = {"_id": 0, **{field: 1 for field in facet_fields(collection)}}
+    counts: Counter = Counter()
+    async for doc in database[collection].find({}, projection).batch_size(batch_size):
+        counts.update(facet_values(collection, doc))
+    return counts
+
+
+async def _stored_counts(database, collection: str) -> Counter:
+    stored: Counter = Counter()
+    async for entry in database[FACET_COLLECTION].find(
+        {"collection": collection}, {"_id": 0, "facet": 1, "value": 1, "count": 1}
+    ):
+        stored[(entry["facet"], entry["value"])] = entry["count"]
+    return stored
+
+
+async def check_facets(database, collection: str) -> List[Dict[str, Any]]:
+    """Counters that disagree with the documents of ``collection``."""
+    actual = await count_facets(database, collection)
+    stored = await _stored_counts(database, collection)
+    return [
+        {
+            "facet": facet,
+            "value": value,
+            "stored": stored.get((facet, value), 0),
+            "actual": actual.get((facet, value), 0),
+        }
+        for facet, value in sorted(set(actual) | set(stored))
+        if stored.get((facet, value), 0) != actual.get((facet, value), 0)
+    ]
+
+
+async def rebuild_facets(database, collection: str) -> int:
+    """Correct every counter of ``collection``; return how many changed.
+
+    Counters are adjusted by the difference to a fresh count rather than
+    dropped and reinserted, so readers never see an empty facet. Writes that
+    land during the scan can still leave a small drift for the next run.
+    """
+    mismatches = await check_facets(database, collection)
+    await apply_delta(
+        collection,
+        {
+            (entry["facet"], entry["value"]): entry["actual"] - entry["stored"]
+            for entry in mismatches
+        },
+        database,
+    )
+    if mismatches:
+        logger.info("Corrected %d %s facet counters", len(mismatches), collection)
+    return len(mismatches)
+
+
+async def ensure_facet_indexes(database) -> None:
+    await database[FACET_COLLECTION].create_index(
+        [("collection", 1), ("facet", 1), ("count", -1), ("value", 1)]
+    )
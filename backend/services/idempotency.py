@@ -0,0 +1,174 @@
+"""Idempotency keys for tool calls.
+
+A client that retries a call with the same key gets the stored response of
+the first successful attempt instead of running the tool again. The first
+attempt claims the key by inserting a ``pending`` entry; concurrent
+duplicates wait until it is ``done`` (or its lock expires because the worker
+died) rather than running in parallel. Entries expire through a TTL index on
+``expires_at``.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from ..errors import http_error
+from ..models import ToolCall, ToolResponse, User
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+
+
+def idempotency_ttl() -> float:
+    """Seconds a stored response can be replayed."""
+    return float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+
+def idempotency_lock_seconds() -> float:
+    """Seconds after which a pending call is presumed dead and taken over."""
+    return float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+
+
+def request_hash(tool_call: ToolCall) -> str:
+    payload = json.dumps(
+        {"tool": tool_call.tool, "args": tool_call.args}, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Run each (user, key) pair at most once and replay its response."""
+
+    def __init__(self) -> None:
+        # Waiters in this process are woken directly instead of polling
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def run(
+        self,
+        tool_call: ToolCall,
+        user: User,
+        execute: Callable[[ToolCall, User], Awaitable[ToolResponse]],
+    ) -> ToolResponse:
+        key = tool_call.idempotency_key or ""
+        if len(key) > MAX_KEY_LENGTH:
+            raise http_error(
+                400, "Idempotency key is too long", "invalid_idempotency_key"
+            )
+        entry_id = f"{user.id}:{key}"
+        digest = request_hash(tool_call)
+
+        while True:
+            inflight = self._inflight.get(entry_id)
+            if inflight is not None:
+                await asyncio.shield(inflight)
+            if await self._claim(entry_id, user, digest):
+                return await self._execute(entry_id, tool_call, user, execute)
+            stored = await self._wait(entry_id, digest)
+            if stored is not None:
+                return stored
+
+    async def _claim(self, entry_id: str, user: User, digest: str) -> bool:
+        """Insert a pending entry, or take over one whose lock has expired."""
+        collection = getattr(db, IDEMPOTENCY_COLLECTION)
+        now = datetime.utcnow()
+        lock = {
+            "state": "pending",
+            "locked_until": now + timedelta(seconds=idempotency_lock_seconds()),
+            "expires_at": now + timedelta(seconds=idempotency_ttl()),
+        }
+        try:
+            await collection.insert_one(
+                {
+                    "_id": entry_id,
+                    "user_id": user.id,
+                    "request_hash": digest,
+                    "created_at": now,
+                    **lock,
+                }
+            )
+            return True
+        except DuplicateKeyError:
+            pass
+        stale = await collection.find_one_and_update(
+            {
+                "_id": entry_id,
+                "request_hash": digest,
+                "state": "pending",
+                "locked_until": {"$lt": now},
+            },
+            {"$set": lock},
+        )
+        if stale is not None:
+            logger.warning("Taking over expired idempotency lock %s", entry_id)
+        return stale is not None
+
+    async def _wait(self, entry_id: str, digest: str) -> Optional[ToolResponse]:
+        """Wait for another attempt; None means the key can be claimed again."""
+        collection = getattr(db, IDEMPOTENCY_COLLECTION)
+        delay = POLL_INTERVAL
+        while True:
+            entry = await collection.find_one({"_id": entry_id})
+            if entry is None:
+                return None
+            if entry["request_hash"] != digest:
+                raise http_error(
+                    422,
+                    "Idempotency key was used for a different tool call",
+                    "idempotency_key_reused",
+                )
+            if entry["state"] == "done":
+                return ToolResponse(**entry["response"])
+            if entry["locked_until"] < datetime.utcnow():
+                return None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_POLL_INTERVAL)
+
+    async def _execute(
+        self,
+        entry_id: str,
+        tool_call: ToolCall,
+        user: User,
+        execute: Callable[[ToolCall, User], Awaitable[ToolResponse]],
+    ) -> ToolResponse:
+        collection = getattr(db, IDEMPOTENCY_COLLECTION)
+        done = asyncio.get_running_loop().create_future()
+        self._inflight[entry_id] = done
+        try:
+            response = await execute(tool_call, user)
+            if response.success:
+                await collection.update_one(
+                    {"_id": entry_id},
+                    {
+                        "$set": {
+                            "state": "done",
+                            "response": response.dict(),
+                            "expires_at": datetime.utcnow()
+                            + timedelta(seconds=idempotency_ttl()),
+                        },
+                        "$unset": {"locked_until": ""},
+                    },
+                )
+            else:
+                # Failed calls had no effect; a retry may run them again
+                await collection.delete_one({"_id": entry_id})
+            return response
+        except BaseException:
+            await collection.delete_one({"_id": entry_id})
+            raise
+        finally:
+            del self._inflight[entry_id]
+            done.set_result(None)
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,346 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Set
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from pymongo.errors import PyMongoError
+
+from ..auth import authenticate_token
+from ..models import ToolCall, ToolResponse, User
+from .ai import AIServiceError
+from .audit import audit_entry, audit_log
+from .idempotency import idempotency_store
+from .tool_cache import tool_result_cache
+from .registry import tool_registry
+
+logger = logging.getLogger(__name__)
+
+# Close codes for the WebSocket transport (4000-4999 are application defined)
+WS_AUTH_FAILED = 4401
+WS_AUTH_TIMEOUT = 4408
+
+
+def _failure(exc: HTTPException) -> ToolResponse:
+    logger.warning("Tool dispatch error: %s", exc.detail)
+    code = exc.detail.get("code") if isinstance(exc.detail, dict) else None
+    error = f"Tool execution failed ({code})" if code else "Tool execution failed"
+    return ToolResponse(success=False, error=error)
+
+
+async def run_tool(tool_call: ToolCall, user: User) -> ToolResponse:
+    """Execute a tool, answering from the result cache where it opted in."""
+    try:
+        tool = tool_registry.get_tool(tool_call.tool)
+        if not tool:
+            return ToolResponse(
+                success=False, error=f"Tool '{tool_call.tool}' not found"
+            )
+
+        if tool.cache_ttl is None:
+            result = await tool.execute(tool_call.args, user)
+            return ToolResponse(success=True, data=result)
+        key = tool_result_cache.key(tool_call.tool, tool_call.args, user)
+        result = tool_result_cache.get(key)
+        if result is None:
+            result = await tool.execute(tool_call.args, user)
+            tool_result_cache.put(key, result, tool.cache_ttl)
+        return ToolResponse(success=True, data=result)
+    except HTTPException as e:
+        return _failure(e)
+    except (AIServiceError, PyMongoError, ValidationError) as exc:
+        logger.warning("Tool execution failed: %s", exc)
+        return ToolResponse(success=False, error="Tool execution failed")
+
+
+async def execute_tool_call(tool_call: ToolCall, user: User) -> ToolResponse:
+    """Run ``tool_call`` for ``user`` and wrap the outcome in a ``ToolResponse``.
+
+    Shared by every MCP transport so errors look the same everywhere. Calls
+    carrying an idempotency key run at most once per user and key. Every
+    call is recorded in the audit log.
+    """
+    started = time.perf_counter()
+    response: Optional[ToolResponse] = None
+    outcome = "exception"
+    try:
+        response = await _execute(tool_call, user)
+        return response
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        if audit_log.recording:
+            audit_log.record(
+                audit_entry(
+                    tool_call,
+                    user,
+                    response,
+                    time.perf_counter() - started,
+                    outcome,
+                )
+            )
+
+
+async def _execute(tool_call: ToolCall, user: User) -> ToolResponse:
+    if not tool_call.idempotency_key:
+        return await run_tool(tool_call, user)
+    try:
+        return await idempotency_store.run(tool_call, user, run_tool)
+    except HTTPException as e:
+        return _failure(e)
+    except PyMongoError as exc:
+        logger.warning("Idempotency store failed: %s", exc)
+        return ToolResponse(success=False, error="Tool execution failed")
+
+
+def ws_max_concurrency() -> int:
+    return int(os.getenv("MCP_WS_MAX_CONCURRENCY", "8"))
+
+
+class ToolCallSession:
+    """One authenticated WebSocket connection pipelining tool calls.
+
+    The first message must be ``{"type": "auth", "token": "<firebase id token>"}``.
+    Afterwards every ``{"id": ..., "tool": ..., "args": {...}}`` message is run
+    as its own task and answered with ``{"id": ..., "success": ..., ...}`` as
+    soon as it completes, so responses may arrive out of order.
+
+    At most ``max_concurrency`` calls run at once. When the cap is reached the
+    session stops reading from the socket until a call finishes, so a client
+    sending faster than the tools complete is slowed down by TCP flow control
+    instead of growing an unbounded backlog on the server.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_concurrency: Optional[int] = None,
+        auth_timeout: float = 10.0,
+    ) -> None:
+        self.websocket = websocket
+        self.max_concurrency = max_concurrency or ws_max_concurrency()
+        self.auth_timeout = auth_timeout
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._send_lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        async with self._send_lock:
+            await self.websocket.send_json(message)
+
+    async def authenticate(self) -> Optional[User]:
+        try:
+            text = await asyncio.wait_for(
+                self.websocket.receive_text(), self.auth_timeout
+            )
+            message = json.loads(text)
+        except asyncio.TimeoutError:
+            await self.websocket.close(code=WS_AUTH_TIMEOUT)
+            return None
+        except ValueError:
+            message = None
+        token = message.get("token") if isinstance(message, dict) else None
+        if not token or message.get("type") != "auth":
+            await self.websocket.close(code=WS_AUTH_FAILED)
+            return None
+        try:
+            return await authenticate_token(token)
+        except HTTPException as exc:
+            logger.warning("WebSocket authentication failed: %s", exc.detail)
+            await self.websocket.close(code=WS_AUTH_FAILED)
+            return None
+
+    async def _run(self, call_id: Any, tool_call: ToolCall, user: User) -> None:
+        try:
+            response = await execute_tool_call(tool_call, user)
+            await self.send({"id": call_id, **response.dict()})
+        except WebSocketDisconnect:
+            pass
+        except Exception:
+            logger.exception("Tool call %s failed", call_id)
+            try:
+                await self.send(
+                    {"id": call_id, "success": False, "error": "Internal error"}
+                )
+            except Exception:  # pragma: no cover - socket already gone
+                pass
+        finally:
+            self._slots.release()
+
+    async def serve(self) -> None:
+        await self.websocket.accept()
+        try:
+            user = await self.authenticate()
+            if user is None:
+                return
+            await self.send(
+                {
+                    "type": "ready",
+                    "user_id": user.id,
+                    "max_concurrency": self.max_concurrency,
+                    "tools": tool_registry.list_tools(),
+                }
+            )
+            while True:
+                await self._slots.acquire()
+                try:
+                    text = await self.websocket.receive_text()
+                except Exception:
+                    self._slots.release()
+                    raise
+                call_id = None
+                try:
+                    message = json.loads(text)
+                    call_id = message.get("id") if isinstance(message, dict) else None
+                    tool_call = ToolCall(**message)
+                except (TypeError, ValueError):
+                    self._slots.release()
+                    await self.send(
+                        {"id": call_id, "success": False, "error": "Invalid tool call"}
+                    )
+                    continue
+                task = asyncio.create_task(self._run(call_id, tool_call, user))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+SUPPORTED_PROTOCOL_VERSIONS = ("2025-03-26", "2024-11-05")
+SERVER_INFO = {"name": "amtlich", "version": "1.0.0"}
+
+
+def jsonrpc_error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": code, "message": message},
+    }
+
+
+class JsonRpcError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+async def _initialize(params: Dict[str, Any], user: User) -> Dict[str, Any]:
+    requested = params.get("protocolVersion")
+    version = (
+        requested
+        if requested in SUPPORTED_PROTOCOL_VERSIONS
+        else SUPPORTED_PROTOCOL_VERSIONS[0]
+    )
+    return {
+        "protocolVersion": version,
+        "capabilities": {"tools": {"listChanged": False}},
+        "serverInfo": SERVER_INFO,
+    }
+
+
+async def _ping(params: Dict[str, Any], user: User) -> Dict[str, Any]:
+    return {}
+
+
+async def _tools_list(params: Dict[str, Any], user: User) -> Dict[str, Any]:
+    return {"tools": tool_registry.describe_tools()}
+
+
+async def _tools_call(params: Dict[str, Any], user: User) -> Dict[str, Any]:
+    name = params.get("name")
+    arguments = params.get("arguments") or {}
+    if not isinstance(name, str) or not isinstance(arguments, dict):
+        raise JsonRpcError(INVALID_PARAMS, "tools/call needs a name and arguments")
+    if tool_registry.get_tool(name) is None:
+        raise JsonRpcError(INVALID_PARAMS, f"Unknown tool: {name}")
+
+    response = await execute_tool_call(ToolCall(tool=name, args=arguments), user)
+    if not response.success:
+        return {"content": [{"type": "text", "text": response.error}], "isError": True}
+    return {
+        "content": [{"type": "text", "text": json.dumps(response.data, default=str)}],
+        "structuredContent": response.data,
+        "isError": False,
+    }
+
+
+JSONRPC_METHODS = {
+    "initialize": _initialize,
+    "ping": _ping,
+    "tools/list": _tools_list,
+    "tools/call": _tools_call,
+}
+
+
+async def handle_jsonrpc_message(message: Any, user: User) -> Optional[Dict[str, Any]]:
+    """Handle a single JSON-RPC request or notification.
+
+    Returns the response object, or None for notifications, which never get
+    an answer (not even an error).
+    """
+    if not isinstance(message, dict) or message.get("jsonrpc") != "2.0":
+        return jsonrpc_error(None, INVALID_REQUEST, "Invalid Request")
+    method = message.get("method")
+    is_notification = "id" not in message
+    request_id = message.get("id")
+    if not isinstance(method, str):
+        return jsonrpc_error(request_id, INVALID_REQUEST, "Invalid Request")
+    if is_notification:
+        # notifications/initialized, notifications/cancelled, ...
+        logger.debug("MCP notification %s", method)
+        return None
+
+    handler = JSONRPC_METHODS.get(method)
+    if handler is None:
+        return jsonrpc_error(request_id, METHOD_NOT_FOUND, "Method not found")
+    params = message.get("params") or {}
+    if not isinstance(params, dict):
+        return jsonrpc_error(request_id, INVALID_PARAMS, "Invalid params")
+    try:
+        result = await handler(params, user)
+    except JsonRpcError as exc:
+        return jsonrpc_error(request_id, exc.code, exc.message)
+    except Exception:
+        logger.exception("MCP method %s failed", method)
+        return jsonrpc_error(request_id, INTERNAL_ERROR, "Internal error")
+    return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+
+async def handle_jsonrpc_payload(payload: Any, user: User) -> Optional[Any]:
+    """Handle a decoded JSON-RPC payload, which may be a batch.
+
+    Requests in a batch run concurrently; the response array only contains
+    answers to requests, and None is returned when there is nothing to send.
+    """
+    if isinstance(payload, list):
+        if not payload:
+            return jsonrpc_error(None, INVALID_REQUEST, "Invalid Request")
+        responses = await asyncio.gather(
+            *(handle_jsonrpc_message(message, user) for message in payload)
+        )
+        responses = [response for response in responses if response is not None]
+        return responses or None
+    return await handle_jsonrpc_message(payload, user)
+
+
+async def handle_jsonrpc_text(text: str, user: User) -> Optional[Any]:
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return jsonrpc_error(None, PARSE_ERROR, "Parse error")
+    return await handle_jsonrpc_payload(payload, user)
@@ -0,0 +1,342 @@
+import hashlib
+import logging
+import os
+import posixpath
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..errors import http_error
+from ..models import MediaFile, User
+from .content import insert_document
+from .db import db, get_database
+
+logger = logging.getLogger(__name__)
+
+MEDIA_BUCKET = "media"
+# sha256 -> shared GridFS file and the number of media documents using it
+BLOB_COLLECTION = "media_blobs"
+# GridFS default chunk size; also the read size when streaming downloads
+CHUNK_SIZE = 255 * 1024
+# Types browsers may render inline; everything else is served as attachment.
+# The type comes from the client, so scriptable ones (image/svg+xml) are out.
+INLINE_TYPES = (
+    "image/png",
+    "image/jpeg",
+    "image/gif",
+    "image/webp",
+    "image/avif",
+    "video/",
+    "audio/",
+    "application/pdf",
+)
+
+_bucket: Optional[Any] = None
+_bucket_database: Optional[Any] = None
+
+
+def max_upload_bytes() -> int:
+    return int(os.getenv("MEDIA_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+
+
+def media_bucket():
+    """Return the GridFS bucket for media, bound to the current database."""
+    global _bucket, _bucket_database
+    database = get_database()
+    if _bucket is None or _bucket_database is not database:
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+        _bucket = AsyncIOMotorGridFSBucket(
+            database, bucket_name=MEDIA_BUCKET, chunk_size_bytes=CHUNK_SIZE
+        )
+        _bucket_database = database
+    return _bucket
+
+
+class MultipartFileReader:
+    """Incremental multipart parser that extracts the chunks of one file field.
+
+    Body chunks are fed as they arrive from the client; ``feed`` returns the
+    events produced by that chunk, so at most one network chunk of file data
+    is held in memory at a time.
+    """
+
+    def __init__(self, content_type: str, field: str = "file") -> None:
+        from python_multipart.multipart import MultipartParser, parse_options_header
+
+        self._parse_options_header = parse_options_header
+        mime, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if mime != b"multipart/form-data" or not boundary:
+            raise http_error(
+                400, "Expected multipart/form-data upload", "invalid_content_type"
+            )
+        self.field = field
+        self.found = False
+        self._events: List[Tuple[str, Any]] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file = False
+        self._parser = MultipartParser(
+            boundary,
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._in_file = False
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = self._parse_options_header(
+            self._headers.get(b"content-disposition", b"")
+        )
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if self.found or name != self.field or b"filename" not in options:
+            return
+        self.found = True
+        self._in_file = True
+        self._events.append(
+            (
+                "start",
+                {
+                    "filename": options[b"filename"].decode("utf-8", "replace"),
+                    "content_type": self._headers.get(
+                        b"content-type", b"application/octet-stream"
+                    ).decode("latin-1"),
+                },
+            )
+        )
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file and end > start:
+            self._events.append(("data", bytes(data[start:end])))
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._events.append(("end", None))
+
+    def feed(self, chunk: bytes) -> List[Tuple[str, Any]]:
+        from python_multipart.exceptions import MultipartParseError
+
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError:
+            raise http_error(400, "Malformed multipart body", "invalid_multipart")
+        events, self._events = self._events, []
+        return events
+
+
+def safe_filename(filename: str) -> str:
+    name = posixpath.basename(filename.replace("\\", "/")).strip()
+    return name or "upload"
+
+
+async def store_upload(
+    body: AsyncIterator[bytes], content_type: str, user: User
+) -> Tuple[Dict[str, Any], bool]:
+    """Stream the ``file`` field of a multipart body into GridFS.
+
+    The SHA-256 is computed while the chunks are written. Every upload gets
+    its own media document, but if the same content is already stored the
+    new copy is removed again and the document shares the existing file.
+    Returns the document and whether its content was a duplicate.
+    """
+    reader = MultipartFileReader(content_type)
+    limit = max_upload_bytes()
+    bucket = media_bucket()
+    hasher = hashlib.sha256()
+    grid_in = None
+    info: Dict[str, Any] = {}
+    size = 0
+    done = False
+    try:
+        async for chunk in body:
+            for kind, value in reader.feed(chunk):
+                if kind == "start":
+                    info = value
+                    grid_in = bucket.open_upload_stream(
+                        safe_filename(value["filename"]),
+                        metadata={"content_type": value["content_type"]},
+                    )
+                elif kind == "data":
+                    size += len(value)
+                    if size > limit:
+                        raise http_error(
+                            413,
+                            f"File exceeds the upload limit of {limit} bytes",
+                            "file_too_large",
+                        )
+                    hasher.update(value)
+                    await grid_in.write(value)
+                else:
+                    done = True
+            if done:
+                break
+        if grid_in is None or not done:
+            raise http_error(400, "No file field in upload", "missing_file")
+        await grid_in.close()
+    except BaseException:
+        if grid_in is not None:
+            await grid_in.abort()
+        raise
+
+    digest = hasher.hexdigest()
+    storage_id = await _claim_blob(digest, str(grid_in._id))
+    duplicate = storage_id != str(grid_in._id)
+    if duplicate:
+        await bucket.delete(grid_in._id)
+    media_id = str(uuid.uuid4())
+    original = safe_filename(info["filename"])
+    media = MediaFile(
+        id=media_id,
+        filename=original,
+        original_filename=original,
+        file_type=info["content_type"],
+        file_size=size,
+        url=f"/api/media/{media_id}/content",
+        uploaded_by=user.id,
+        sha256=digest,
+        storage_id=storage_id,
+    )
+    try:
+        return await insert_document("media", media.dict()), duplicate
+    except BaseException:
+        await _release_blob(digest, storage_id)
+        raise
+
+
+async def _claim_blob(digest: str, storage_id: str) -> str:
+    """Add a reference to the file stored for ``digest``; return its id.
+
+    The first upload of a content registers its own GridFS file, later ones
+    get the id of that file and drop their copy.
+    """
+    from pymongo import ReturnDocument
+
+    blob = await getattr(db, BLOB_COLLECTION).find_one_and_update(
+        {"_id": digest},
+        {"$inc": {"refs": 1}, "$setOnInsert": {"storage_id": storage_id}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return blob["storage_id"]
+
+
+async def _release_blob(digest: str, storage_id: str) -> None:
+    """Drop a reference; delete the GridFS file once nothing uses it."""
+    from bson import ObjectId
+    from pymongo import ReturnDocument
+
+    blobs = getattr(db, BLOB_COLLECTION)
+    # Media stored before blobs were counted own their file alone
+    blob = await blobs.find_one_and_update(
+        {"_id": digest, "storage_id": storage_id},
+        {"$inc": {"refs": -1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if blob is not None:
+        if blob["refs"] > 0:
+            return
+        result = await blobs.delete_one(
+            {"_id": digest, "storage_id": storage_id, "refs": {"$lte": 0}}
+        )
+        if not result.deleted_count:
+            # An upload of the same content claimed it in the meantime
+            return
+    await media_bucket().delete(ObjectId(storage_id))
+
+
+async def get_media(media_id: str) -> Dict[str, Any]:
+    doc = await db.media.find_one({"id": media_id})
+    if not doc:
+        raise http_error(404, "Media not found", "media_not_found")
+    return doc
+
+
+async def delete_media(media_id: str) -> None:
+    from bson import ObjectId
+
+    doc = await get_media(media_id)
+    await db.media.delete_one({"id": media_id})
+    await _release_blob(doc["sha256"], doc["storage_id"])
+    bucket = media_bucket()
+    for derivative in (doc.get("derivatives") or {}).values():
+        await bucket.delete(ObjectId(derivative["storage_id"]))
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive ``(start, end)`` offsets.
+
+    Returns None when the header should be ignored (other units, multiple
+    ranges, malformed) and raises ValueError when the range cannot be
+    satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first or last) or not (first + last).isdigit():
+        return None
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("empty suffix range")
+        start, end = max(size - suffix, 0), size - 1
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def etag_for(doc: Dict[str, Any]) -> str:
+    return f'"{doc["sha256"]}"'
+
+
+def content_disposition(doc: Dict[str, Any]) -> str:
+    from urllib.parse import quote
+
+    disposition = (
+        "inline" if doc["file_type"].startswith(INLINE_TYPES) else "attachment"
+    )
+    return f"{disposition}; filename*=UTF-8''{quote(doc['original_filename'])}"
+
+
+async def iter_content(
+    doc: Dict[str, Any], start: int, end: int
+) -> AsyncIterator[bytes]:
+    """Yield bytes ``start`` to ``end`` (inclusive) of the stored file."""
+    from bson import ObjectId
+
+    grid_out = await media_bucket().open_download_stream(ObjectId(doc["storage_id"]))
+    grid_out.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        data = await grid_out.read(min(CHUNK_SIZE, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
@@ -0,0 +1,196 @@
+"""Tool registry with lazily loaded implementations.
+
+Built-in tools come from ``tool_specs``; further tools are discovered from
+the ``amtlich.tools`` entry point group of installed packages::
+
+    [project.entry-points."amtlich.tools"]
+    searchDocs = "amtlich_search.spec:SEARCH_DOCS"
+
+An entry point should reference a ``ToolSpec`` in a module that imports
+nothing heavy; its ``target`` is imported on first dispatch. Entry points
+referencing a ``Tool`` class directly work too, but load with discovery.
+"""
+
+import importlib
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+from ..models import User
+from .tool_specs import BUILTIN_TOOLS, ToolSpec
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "amtlich.tools"
+
+
+class Tool(ABC):
+    # Advertised to MCP clients in ``tools/list``; tools loaded from a spec
+    # get both from the spec
+    description: str = ""
+    input_schema: Dict[str, Any] = {"type": "object"}
+    # Seconds results may be served from the tool result cache; only for
+    # tools without side effects
+    cache_ttl: Optional[float] = None
+
+    @abstractmethod
+    def get_name(self) -> str:
+        pass
+
+    @abstractmethod
+    async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
+        pass
+
+    async def warm_up(self) -> None:
+        """Prepare expensive state (parsers, tables) before the first call."""
+
+
+def warmup_selection() -> Optional[List[str]]:
+    """Tools named in TOOL_WARMUP (``all``, ``none`` or a list); None = default."""
+    value = os.getenv("TOOL_WARMUP", "").strip()
+    if not value:
+        return None
+    if value.lower() == "none":
+        return []
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def _resolve(target: str) -> Any:
+    module, _, attribute = target.partition(":")
+    obj = importlib.import_module(module)
+    for part in attribute.split(".") if attribute else []:
+        obj = getattr(obj, part)
+    return obj
+
+
+class ToolRegistry:
+    def __init__(self, specs: Optional[List[ToolSpec]] = None) -> None:
+        self.tools: Dict[str, Tool] = {}
+        self._specs: Dict[str, ToolSpec] = {spec.name: spec for spec in specs or []}
+        self._discovered = False
+        # name -> {"load_ms": ..., "warm_up_ms": ...}
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def register(self, tool: Tool) -> None:
+        self._specs.pop(tool.get_name(), None)
+        self.tools[tool.get_name()] = tool
+
+    def register_spec(self, spec: ToolSpec) -> None:
+        """Register a tool that is only loaded when first requested."""
+        self.tools.pop(spec.name, None)
+        self._specs[spec.name] = spec
+
+    def register_factory(self, name: str, factory: Callable[[], Tool]) -> None:
+        self.register_spec(ToolSpec(name, factory))
+
+    def discover(self) -> None:
+        """Register the tools of installed ``amtlich.tools`` entry points."""
+        self._discovered = True
+        from importlib.metadata import entry_points
+
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            if entry_point.name in self._specs or entry_point.name in self.tools:
+                logger.warning("Ignoring duplicate tool %s", entry_point.name)
+                continue
+            try:
+                loaded = entry_point.load()
+            except Exception:
+                logger.exception("Could not load tool plugin %s", entry_point.value)
+                continue
+            if isinstance(loaded, ToolSpec):
+                self.register_spec(loaded)
+            else:
+                self.register_factory(entry_point.name, loaded)
+
+    def _ensure_discovered(self) -> None:
+        if not self._discovered:
+            self.discover()
+
+    def _load(self, spec: ToolSpec) -> Tool:
+        started = time.perf_counter()
+        factory = _resolve(spec.target) if isinstance(spec.target, str) else spec.target
+        tool = factory()
+        if spec.description is not None:
+            tool.description = spec.description
+            tool.input_schema = spec.input_schema
+        elapsed = (time.perf_counter() - started) * 1000
+        self.timings.setdefault(spec.name, {})["load_ms"] = elapsed
+        logger.debug("Loaded tool %s in %.1f ms", spec.name, elapsed)
+        return tool
+
+    def get_tool(self, name: str) -> Optional[Tool]:
+        tool = self.tools.get(name)
+        if tool is not None:
+            return tool
+        self._ensure_discovered()
+        spec = self._specs.get(name)
+        if spec is None:
+            return None
+        tool = self._load(spec)
+        self.tools[name] = tool
+        del self._specs[name]
+        return tool
+
+    def list_tools(self) -> List[str]:
+        self._ensure_discovered()
+        return [*self.tools, *self._specs]
+
+    def describe_tools(self) -> List[Dict[str, Any]]:
+        """Return MCP tool descriptors; only tools without metadata are loaded."""
+        descriptors = []
+        for name in self.list_tools():
+            spec = self._specs.get(name)
+            source: Any = spec
+            if spec is None or spec.description is None:
+                source = self.get_tool(name)
+            descriptors.append(
+                {
+                    "name": name,
+                    "description": source.description,
+                    "inputSchema": source.input_schema,
+                }
+            )
+        return descriptors
+
+    async def warm_up(self) -> Dict[str, Dict[str, float]]:
+        """Load and warm the selected tools; return and log their timings.
+
+        By default the tools whose spec sets ``warm_up`` are prepared;
+        TOOL_WARMUP overrides the selection.
+        """
+        self._ensure_discovered()
+        selection = warmup_selection()
+        if selection is None:
+            names = [name for name, spec in self._specs.items() if spec.warm_up]
+        elif selection == ["all"]:
+            names = self.list_tools()
+        else:
+            names = selection
+        report: Dict[str, Dict[str, float]] = {}
+        for name in names:
+            tool = self.get_tool(name)
+            if tool is None:
+                logger.warning("Cannot warm up unknown tool %s", name)
+                continue
+            started = time.perf_counter()
+            try:
+                await tool.warm_up()
+            except Exception:
+                logger.exception("Warm-up of tool %s failed", name)
+            timing = self.timings.setdefault(name, {})
+            timing["warm_up_ms"] = (time.perf_counter() - started) * 1000
+            report[name] = timing
+            logger.info(
+                "Tool %s ready: load %.1f ms, warm-up %.1f ms",
+                name,
+                timing.get("load_ms", 0.0),
+                timing["warm_up_ms"],
+            )
+        total = sum(sum(timing.values()) for timing in report.values())
+        logger.info("Warmed up %d tools in %.1f ms", len(report), total)
+        return report
+
+
+tool_registry = ToolRegistry(BUILTIN_TOOLS)
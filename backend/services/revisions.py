@@ -0,0 +1,261 @@
+import difflib
+import logging
+import os
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..errors import http_error
+from ..models import User
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+REVISION_COLLECTION = "revisions"
+# Fields kept in the history of each content collection; ``content`` is
+# stored as a line diff, all others in full with every revision.
+TRACKED_FIELDS = {
+    "pages": ("title", "slug", "content", "meta_description", "parent_id", "status"),
+    "articles": (
+        "title",
+        "slug",
+        "content",
+        "excerpt",
+        "featured_image",
+        "category_id",
+        "tags",
+        "status",
+    ),
+}
+
+# Tracked for the history but not changed by a restore
+PUBLICATION_FIELDS = ("status",)
+
+
+def snapshot_interval() -> int:
+    """Number of versions after which a full snapshot is stored again."""
+    return max(1, int(os.getenv("REVISION_SNAPSHOT_INTERVAL", "20")))
+
+
+def make_delta(old: str, new: str) -> List[Any]:
+    """Return a compact line diff turning ``old`` into ``new``.
+
+    The delta is a list of operations: a positive int copies that many lines,
+    a negative int skips that many lines and a list inserts its lines.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    delta: List[Any] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append(i2 - i1)
+            continue
+        if i2 > i1:
+            delta.append(i1 - i2)
+        if j2 > j1:
+            delta.append(new_lines[j1:j2])
+    return delta
+
+
+def apply_delta(old: str, delta: List[Any]) -> str:
+    lines = old.splitlines(keepends=True)
+    result: List[str] = []
+    position = 0
+    for op in delta:
+        if isinstance(op, list):
+            result.extend(op)
+        elif op > 0:
+            result.extend(lines[position : position + op])
+            position += op
+        else:
+            position -= op
+    return "".join(result)
+
+
+def encode_snapshot(content: str) -> bytes:
+    return zlib.compress(content.encode("utf-8"), 6)
+
+
+def decode_snapshot(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+
+def build_revision(
+    collection: str,
+    after: Dict[str, Any],
+    before: Optional[Dict[str, Any]],
+    snapshot_version: Optional[int],
+    author_id: Optional[str],
+) -> Dict[str, Any]:
+    """Create the stored form of version ``after["version"]``.
+
+    A delta against ``before`` is stored unless there is no usable previous
+    revision or the last snapshot is ``snapshot_interval()`` versions old.
+    """
+    version = after.get("version", 1)
+    fields = {
+        name: after.get(name)
+        for name in TRACKED_FIELDS[collection]
+        if name != "content"
+    }
+    revision: Dict[str, Any] = {
+        "collection": collection,
+        "doc_id": after["id"],
+        "version": version,
+        "fields": fields,
+        "author_id": author_id,
+        "created_at": datetime.utcnow(),
+    }
+    content = after.get("content") or ""
+    if (
+        before is None
+        or snapshot_version is None
+        or version - snapshot_version >= snapshot_interval()
+    ):
+        revision.update(
+            kind="snapshot", snapshot_version=version, data=encode_snapshot(content)
+        )
+    else:
+        revision.update(
+            kind="delta",
+            snapshot_version=snapshot_version,
+            delta=make_delta(before.get("content") or "", content),
+        )
+    return revision
+
+
+async def record_revision(
+    collection: str,
+    after: Dict[str, Any],
+    before: Optional[Dict[str, Any]] = None,
+    user: Optional[User] = None,
+) -> None:
+    """Store the revision for a freshly written content document."""
+    from pymongo.errors import DuplicateKeyError
+
+    if collection not in TRACKED_FIELDS:
+        return
+    revisions = getattr(db, REVISION_COLLECTION)
+    last = None
+    if before is not None:
+        last = await revisions.find_one(
+            {"collection": collection, "doc_id": after["id"]},
+            {"version": 1, "snapshot_version": 1},
+            sort=[("version", -1)],
+        )
+        previous = before.get("version", 1)
+        if last is None or last["version"] < previous:
+            # Document predates revision tracking or was changed without a
+            # revision (e.g. by the statute importer): keep its state as the
+            # base, since a delta must not span versions the history lacks
+            await revisions.insert_one(
+                build_revision(collection, before, None, None, before.get("author_id"))
+            )
+            last = {"snapshot_version": previous}
+        elif last["version"] != previous:
+            last = None
+    revision = build_revision(
+        collection,
+        after,
+        before,
+        last["snapshot_version"] if last else None,
+        user.id if user else after.get("author_id"),
+    )
+    try:
+        await revisions.insert_one(revision)
+    except DuplicateKeyError:  # pragma: no cover - replayed write
+        logger.warning(
+            "Revision %s of %s already stored", after["version"], after["id"]
+        )
+
+
+async def list_revisions(collection: str, doc_id: str) -> List[Dict[str, Any]]:
+    cursor = getattr(db, REVISION_COLLECTION).find(
+        {"collection": collection, "doc_id": doc_id},
+        {"_id": 0, "version": 1, "kind": 1, "author_id": 1, "created_at": 1},
+        sort=[("version", -1)],
+    )
+    return await cursor.to_list(None)
+
+
+async def get_revision(collection: str, doc_id: str, version: int) -> Dict[str, Any]:
+    """Reconstruct the tracked fields of ``version``.
+
+    Reads the nearest snapshot and the deltas after it in a single query;
+    raises instead of returning wrong content when versions are missing.
+    """
+    revisions = getattr(db, REVISION_COLLECTION)
+    target = await revisions.find_one(
+        {"collection": collection, "doc_id": doc_id, "version": version},
+        {"_id": 0, "snapshot_version": 1},
+    )
+    if target is None:
+        raise http_error(404, "Revision not found", "revision_not_found")
+    chain = await revisions.find(
+        {
+            "collection": collection,
+            "doc_id": doc_id,
+            "version": {"$gte": target["snapshot_version"], "$lte": version},
+        },
+        {"_id": 0},
+        sort=[("version", 1)],
+    ).to_list(None)
+    versions = [revision["version"] for revision in chain]
+    if (
+        versions != list(range(target["snapshot_version"], version + 1))
+        or chain[0]["kind"] != "snapshot"
+    ):
+        logger.error("Revision history of %s %s has gaps", collection, doc_id)
+        raise http_error(409, "Revision history is incomplete", "revision_history_gap")
+    content = ""
+    for revision in chain:
+        if revision["kind"] == "snapshot":
+            content = decode_snapshot(revision["data"])
+        else:
+            content = apply_delta(content, revision["delta"])
+    last = chain[-1]
+    return {
+        "version": version,
+        "author_id": last.get("author_id"),
+        "created_at": last.get("created_at"),
+        **last["fields"],
+        "content": content,
+    }
+
+
+def diff_revisions(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a unified diff of the content and the changed other fields."""
+    content_diff = "".join(
+        difflib.unified_diff(
+            (old.get("content") or "").splitlines(keepends=True),
+            (new.get("content") or "").splitlines(keepends=True),
+            fromfile=f"v{old['version']}",
+            tofile=f"v{new['version']}",
+        )
+    )
+    changed = {
+        name: {"from": old.get(name), "to": new.get(name)}
+        for name in new
+        if name not in ("content", "version", "author_id", "created_at")
+        and old.get(name) != new.get(name)
+    }
+    return {
+        "from_version": old["version"],
+        "to_version": new["version"],
+        "content_diff": content_diff,
+        "fields": changed,
+    }
+
+
+def restorable_fields(collection: str, revision: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields written back when restoring ``revision``.
+
+    The publication state is left as it is: the history does not hold
+    ``published_at``, and a restore should not publish or withdraw anything.
+    """
+    return {
+        name: revision.get(name)
+        for name in TRACKED_FIELDS[collection]
+        if name not in PUBLICATION_FIELDS
+    }
@@ -0,0 +1,251 @@
+"""Publish pages and articles at their scheduled time.
+
+A document with status ``scheduled`` is published once its ``published_at``
+has passed. One worker at a time holds the ``scheduled-publishing`` lease
+and runs the scheduler: it keeps the upcoming publications in a min-heap
+ordered by time and sleeps exactly until the first one is due, waking early
+when a write schedules something sooner. Heap entries are never removed
+when a document is rescheduled or unpublished; ``publish_scheduled`` checks
+status and time in its update filter, so stale entries are no-ops.
+
+Writes on the leader (or, with change streams, on any worker) reach the
+heap through the event bus. Without change streams the leader only learns
+of other workers' writes with the periodic reload, so each follower keeps a
+heap of what its own writes scheduled and publishes those on time itself.
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from ..utils import as_utc
+from .content import publish_scheduled
+from .db import db
+from .events import change_watcher
+
+logger = logging.getLogger(__name__)
+
+SCHEDULED_COLLECTIONS = ("pages", "articles")
+LEASE_COLLECTION = "leases"
+LEASE_NAME = "scheduled-publishing"
+
+
+def scheduler_enabled() -> bool:
+    return os.getenv("SCHEDULED_PUBLISHING", "on").strip().lower() in {
+        "1",
+        "true",
+        "yes",
+        "on",
+    }
+
+
+def lease_seconds() -> float:
+    """Seconds a lease lasts without renewal; renewed every third of that."""
+    return float(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))
+
+
+def reload_seconds() -> float:
+    """Seconds between reloads of the heap from the database."""
+    return float(os.getenv("SCHEDULER_RELOAD_SECONDS", "60"))
+
+
+def preload_limit() -> int:
+    """Upcoming publications per collection held in memory."""
+    return int(os.getenv("SCHEDULER_PRELOAD", "1000"))
+
+
+class Lease:
+    """A named lock in MongoDB that expires unless its owner renews it."""
+
+    def __init__(self, name: str, owner: Optional[str] = None) -> None:
+        self.name = name
+        self.owner = (
+            owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )
+
+    async def acquire(self, seconds: float) -> bool:
+        """Take or renew the lease; False while another owner holds it."""
+        now = datetime.utcnow()
+        try:
+            await getattr(db, LEASE_COLLECTION).update_one(
+                {
+                    "_id": self.name,
+                    "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}],
+                },
+                {
+                    "$set": {
+                        "owner": self.owner,
+                        "expires_at": now + timedelta(seconds=seconds),
+                    }
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def release(self) -> None:
+        await getattr(db, LEASE_COLLECTION).delete_one(
+            {"_id": self.name, "owner": self.owner}
+        )
+
+
+class PublishScheduler:
+    def __init__(self, lease: Optional[Lease] = None) -> None:
+        self.lease = lease or Lease(LEASE_NAME)
+        self.leader = False
+        self.published = 0
+        # (due, collection, id)
+        self._heap: List[Tuple[datetime, str, str]] = []
+        # Latest time up to which the heap is complete; None = everything
+        self._horizon: Optional[datetime] = None
+        self._loaded_at = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def push(self, due: datetime, collection: str, doc_id: str) -> None:
+        due = as_utc(due)
+        if self._horizon is not None and due > self._horizon:
+            # Beyond what is held in memory; the next reload finds it
+            return
+        heapq.heappush(self._heap, (due, collection, doc_id))
+        if self._heap[0][0] == due:
+            self._wakeup.set()
+
+    async def load(self) -> None:
+        """Replace the heap with the next publications from the database."""
+        limit = preload_limit()
+        heap: List[Tuple[datetime, str, str]] = []
+        horizon: Optional[datetime] = None
+        for collection in SCHEDULED_COLLECTIONS:
+            docs = (
+                await getattr(db, collection)
+                .find(
+                    {"status": "scheduled", "published_at": {"$ne": None}},
+                    {"_id": 0, "id": 1, "published_at": 1},
+                )
+                .sort("published_at", 1)
+                .to_list(limit)
+            )
+            heap.extend((as_utc(d["published_at"]), collection, d["id"]) for d in docs)
+            if len(docs) >= limit:
+                last = as_utc(docs[-1]["published_at"])
+                horizon = last if horizon is None else min(horizon, last)
+        if horizon is not None:
+            heap = [entry for entry in heap if entry[0] <= horizon]
+        heapq.heapify(heap)
+        self._heap, self._horizon = heap, horizon
+        self._loaded_at = asyncio.get_running_loop().time()
+        logger.debug("Loaded %d scheduled publications", len(heap))
+
+    async def handle_event(self, event: Dict[str, Any]) -> None:
+        if event.get("collection") not in SCHEDULED_COLLECTIONS:
+            return
+        if not self.leader and change_watcher.running:
+            # The leader sees every write through the change stream
+            return
+        if event.get("operation") == "delete" or not event.get("id"):
+            return
+        doc = await getattr(db, event["collection"]).find_one(
+            {"id": event["id"]}, {"_id": 0, "status": 1, "published_at": 1}
+        )
+        if doc and doc.get("status") == "scheduled" and doc.get("published_at"):
+            self.push(doc["published_at"], event["collection"], event["id"])
+
+    async def publish_due(self) -> int:
+        """Publish every heap entry whose time has come."""
+        published = 0
+        now = datetime.utcnow()
+        while self._heap and self._heap[0][0] <= now:
+            _, collection, doc_id = heapq.heappop(self._heap)
+            if await publish_scheduled(collection, doc_id, now) is not None:
+                published += 1
+                logger.info("Published scheduled %s %s", collection, doc_id)
+        self.published += published
+        return published
+
+    def _sleep_seconds(self) -> float:
+        """Until the next publication, lease renewal or reload."""
+        seconds = lease_seconds() / 3
+        if self.leader:
+            loop_time = asyncio.get_running_loop().time()
+            seconds = min(seconds, self._loaded_at + reload_seconds() - loop_time)
+        if self._heap:
+            until_due = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+            seconds = min(seconds, until_due)
+        return max(seconds, 0.0)
+
+    async def step(self) -> float:
+        """Run one round; return how long to sleep before the next."""
+        if not await self.lease.acquire(lease_seconds()):
+            if self.leader:
+                logger.warning("Lost the scheduled publishing lease")
+                self.leader = False
+                self._heap, self._horizon = [], None
+            # Publications scheduled by this worker's own writes
+            await self.publish_due()
+            return self._sleep_seconds()
+        loop_time = asyncio.get_running_loop().time()
+        if not self.leader or loop_time >= self._loaded_at + reload_seconds():
+            self.leader = True
+            await self.load()
+        elif not self._heap and self._horizon is not None:
+            await self.load()
+        await self.publish_due()
+        return self._sleep_seconds()
+
+    async def run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                delay = await self.step()
+            except Exception:
+                logger.exception("Scheduled publishing failed")
+                delay = lease_seconds() / 3
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        from .events import event_bus
+
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        event_bus.add_listener(self.handle_event)
+        self._task = asyncio.get_running_loop().create_task(self.run())
+        logger.info("Scheduled publishing started as %s", self.lease.owner)
+
+    async def stop(self) -> None:
+        from .events import event_bus
+
+        event_bus.remove_listener(self.handle_event)
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.leader:
+            self.leader = False
+            try:
+                await self.lease.release()
+            except Exception:  # pragma: no cover - best effort on shutdown
+                logger.exception("Failed to release the scheduled publishing lease")
+
+
+publish_scheduler = PublishScheduler()
@@ -0,0 +1,79 @@
+import re
+from typing import Any, Dict, List
+
+# Sections start at Markdown ATX headings (``# …`` to ``###### …``)
+HEADING = re.compile(r"^#{1,6}[ \t]+(.+?)[ \t#]*$", re.M)
+NORM = re.compile(r"(§|Art\.?|Artikel)\s*(\d+[a-z]?)\b", re.I)
+PREAMBLE = "preamble"
+
+
+def section_key(title: str) -> str:
+    """Derive a stable key from a heading, e.g. ``p3`` for ``§ 3 Zuständigkeit``.
+
+    Headings of norms are keyed by their number only, so editing the title of
+    a paragraph keeps its address.
+    """
+    match = NORM.match(title)
+    if match:
+        prefix = "p" if match.group(1) == "§" else "art"
+        return f"{prefix}{match.group(2).lower()}"
+    return re.sub(r"\W+", "-", title.lower()).strip("-") or "section"
+
+
+def section_index(content: str) -> List[Dict[str, Any]]:
+    """Split ``content`` into sections and return their key, title and span.
+
+    Offsets and lengths count code points, matching Python string indices
+    and MongoDB's ``$substrCP``. Text before the first heading forms the
+    ``preamble`` section. A body without headings has no sections.
+    """
+    matches = list(HEADING.finditer(content))
+    if not matches:
+        return []
+    index: List[Dict[str, Any]] = []
+    if content[: matches[0].start()].strip():
+        index.append(
+            {"key": PREAMBLE, "title": "", "offset": 0, "length": matches[0].start()}
+        )
+    seen: Dict[str, int] = {}
+    for position, match in enumerate(matches):
+        end = (
+            matches[position + 1].start()
+            if position + 1 < len(matches)
+            else len(content)
+        )
+        title = match.group(1).strip()
+        key = section_key(title)
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] > 1:
+            key = f"{key}-{seen[key]}"
+        index.append(
+            {
+                "key": key,
+                "title": title,
+                "offset": match.start(),
+                "length": end - match.start(),
+            }
+        )
+    return index
+
+
+def select_sections(
+    index: List[Dict[str, Any]], keys: List[str]
+) -> List[Dict[str, Any]]:
+    """Return the entries of ``keys`` in document order; unknown keys raise."""
+    wanted = set(keys)
+    selected = [section for section in index if section["key"] in wanted]
+    missing = wanted - {section["key"] for section in selected}
+    if missing:
+        raise KeyError(", ".join(sorted(missing)))
+    return selected
+
+
+def splice_section(content: str, section: Dict[str, Any], text: str) -> str:
+    """Replace the span of ``section`` in ``content`` with ``text``."""
+    end = section["offset"] + section["length"]
+    if end < len(content) and not text.endswith("\n"):
+        # Keep the following heading at the start of a line
+        text += "\n"
+    return content[: section["offset"]] + text + content[end:]
@@ -0,0 +1,270 @@
+"""Sitemaps and the Atom feed of published content.
+
+Published pages and articles are split into sitemap shards by ranges of
+their ``id`` (UUIDs, so the ranges fill evenly), which lets each shard be
+read with a range scan of the ``id`` index. The number of shards is the
+power of two that keeps them at about ``SITEMAP_SHARD_SIZE`` URLs, well
+below the protocol limit of 50 000; with more than one shard
+``/sitemap.xml`` becomes a sitemap index.
+
+Documents are rendered in one pass over a cursor. The output is kept per
+process and regenerated on demand: a content change only invalidates the
+shard holding the changed document (and the feed, for articles), and only
+publishing or unpublishing triggers a recount of the shards. Writes this
+worker never hears about are picked up after ``SITEMAP_MAX_AGE``.
+
+Output is rendered once for all hosts with a placeholder for the base URL,
+which is substituted per response; otherwise every ``Host`` header a
+client sends would render and cache its own copy.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from .db import read_collection
+from .events import event_bus
+
+SITEMAP_COLLECTIONS = ("pages", "articles")
+MAX_SITEMAP_URLS = 50_000
+# Shard boundaries are taken from the first four hex digits of the id
+KEY_SPACE = 16**4
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+ATOM_NS = "http://www.w3.org/2005/Atom"
+# Stands for the base URL in cached output; NUL is not allowed in XML, so
+# well-formed output never contains it otherwise
+BASE = "\x00base\x00"
+
+
+def site_url() -> str:
+    """Public base URL of the portal; empty = the requested host."""
+    return os.getenv("SITE_URL", "").rstrip("/")
+
+
+def shard_size() -> int:
+    return min(int(os.getenv("SITEMAP_SHARD_SIZE", "40000")), MAX_SITEMAP_URLS)
+
+
+def sitemap_max_age() -> float:
+    return float(os.getenv("SITEMAP_MAX_AGE", "300"))
+
+
+def feed_size() -> int:
+    return int(os.getenv("FEED_SIZE", "50"))
+
+
+def feed_title() -> str:
+    return os.getenv("FEED_TITLE", "AMTLICH.AI")
+
+
+def public_path(collection: str, slug: str) -> str:
+    """Path of a document on the public portal."""
+    pattern = {
+        "pages": os.getenv("PUBLIC_PAGE_PATH", "/{slug}"),
+        "articles": os.getenv("PUBLIC_ARTICLE_PATH", "/artikel/{slug}"),
+    }[collection]
+    return pattern.format(slug=quote(slug or "", safe=""))
+
+
+def shard_count(published: int) -> int:
+    needed = max(1, math.ceil(published / shard_size()))
+    return min(1 << (needed - 1).bit_length(), KEY_SPACE)
+
+
+def shard_boundaries(shards: int) -> List[str]:
+    """Lowest id of every shard after the first."""
+    return [f"{index * KEY_SPACE // shards:04x}" for index in range(1, shards)]
+
+
+def shard_of(doc_id: str, shards: int) -> int:
+    return bisect.bisect_right(shard_boundaries(shards), doc_id)
+
+
+def shard_query(shard: int, shards: int) -> Dict[str, Any]:
+    boundaries = shard_boundaries(shards)
+    id_range: Dict[str, str] = {}
+    if shard > 0:
+        id_range["$gte"] = boundaries[shard - 1]
+    if shard < shards - 1:
+        id_range["$lt"] = boundaries[shard]
+    query: Dict[str, Any] = {"status": "published"}
+    if id_range:
+        query["id"] = id_range
+    return query
+
+
+def w3c_time(value: Optional[datetime]) -> str:
+    value = value or datetime.utcnow()
+    return value.replace(microsecond=0).isoformat() + "Z"
+
+
+async def iter_urlset(shard: int, shards: int) -> AsyncIterator[str]:
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+    for collection in SITEMAP_COLLECTIONS:
+        cursor = read_collection(collection).find(
+            shard_query(shard, shards),
+            {"_id": 0, "slug": 1, "updated_at": 1},
+        )
+        async for doc in cursor:
+            loc = BASE + escape(public_path(collection, doc.get("slug")))
+            lastmod = w3c_time(doc.get("updated_at"))
+            yield f"<url><loc>{loc}</loc><lastmod>{lastmod}</lastmod></url>\n"
+    yield "</urlset>\n"
+
+
+async def iter_sitemap_index(shards: int) -> AsyncIterator[str]:
+    yield (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<sitemapindex xmlns="{SITEMAP_NS}">\n'
+    )
+    for shard in range(shards):
+        loc = f"{BASE}/sitemaps/{shard}.xml"
+        yield f"<sitemap><loc>{loc}</loc></sitemap>\n"
+    yield "</sitemapindex>\n"
+
+
+async def iter_feed() -> AsyncIterator[str]:
+    cursor = (
+        read_collection("articles")
+        .find(
+            {"status": "published"},
+            {
+                "_id": 0,
+                "id": 1,
+                "title": 1,
+                "slug": 1,
+                "excerpt": 1,
+                "updated_at": 1,
+                "published_at": 1,
+            },
+        )
+        .sort("updated_at", -1)
+        .limit(feed_size())
+    )
+    entries: List[str] = []
+    updated: Optional[datetime] = None
+    async for doc in cursor:
+        updated = updated or doc.get("updated_at")
+        link = BASE + escape(public_path("articles", doc.get("slug")), {'"': "&quot;"})
+        parts = [
+            f"<id>urn:uuid:{escape(doc['id'])}</id>",
+            f"<title>{escape(doc.get('title') or '')}</title>",
+            f'<link href="{link}"/>',
+            f"<updated>{w3c_time(doc.get('updated_at'))}</updated>",
+        ]
+        if doc.get("published_at"):
+            parts.append(f"<published>{w3c_time(doc['published_at'])}</published>")
+        if doc.get("excerpt"):
+            parts.append(f"<summary>{escape(doc['excerpt'])}</summary>")
+        entries.append(f"<entry>{''.join(parts)}</entry>\n")
+    title = escape(feed_title())
+    yield (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="{ATOM_NS}">\n'
+        f"<id>{BASE}/feed.xml</id><title>{title}</title>"
+        f"<updated>{w3c_time(updated)}</updated>"
+        f'<link rel="self" href="{BASE}/feed.xml"/>'
+        f"<author><name>{title}</name></author>\n"
+    )
+    for entry in entries:
+        yield entry
+    yield "</feed>\n"
+
+
+@dataclass
+class Rendered:
+    body: bytes
+    etag: str
+    generated_at: datetime = field(default_factory=datetime.utcnow)
+    created: float = field(default_factory=time.monotonic)
+
+    def etag_for(self, base: str) -> str:
+        digest = hashlib.sha256(f"{self.etag}{base}".encode("utf-8"))
+        return '"' + digest.hexdigest()[:32] + '"'
+
+    def body_for(self, base: str) -> bytes:
+        value = escape(base, {'"': "&quot;"}).encode("utf-8")
+        return self.body.replace(BASE.encode("utf-8"), value)
+
+
+async def _render(chunks: AsyncIterator[str]) -> Rendered:
+    body = "".join([chunk async for chunk in chunks]).encode("utf-8")
+    return Rendered(body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+
+
+class SitemapCache:
+    """Rendered sitemaps and feeds, invalidated by content change events."""
+
+    def __init__(self) -> None:
+        # Names are "index", "feed" and shard numbers
+        self._entries: Dict[Any, Rendered] = {}
+        self._shards: Optional[int] = None
+        self._counted = 0.0
+        self._lock = asyncio.Lock()
+        self.renders = 0
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._shards = None
+
+    def _drop(self, name: Any) -> None:
+        self._entries.pop(name, None)
+
+    def handle_event(self, event: Dict[str, Any]) -> None:
+        collection = event.get("collection")
+        if collection not in SITEMAP_COLLECTIONS or not event.get("id"):
+            return
+        if self._shards is not None:
+            self._drop(shard_of(event["id"], self._shards))
+        if collection == "articles":
+            self._drop("feed")
+        # Publishing or unpublishing may change the number of shards
+        if event.get("publication_changed", True):
+            self._counted = 0.0
+
+    async def shards(self) -> int:
+        """Current number of shards, recounted after content changes."""
+        if self._shards is None or time.monotonic() - self._counted > sitemap_max_age():
+            published = 0
+            for collection in SITEMAP_COLLECTIONS:
+                published += await read_collection(collection).count_documents(
+                    {"status": "published"}
+                )
+            shards = shard_count(published)
+            if shards != self._shards:
+                # Every id moves to another shard
+                self.clear()
+                self._shards = shards
+            self._counted = time.monotonic()
+        return self._shards
+
+    async def get(self, name: Any) -> Rendered:
+        """Return the output ``name``, rendering it if stale."""
+        entry = self._entries.get(name)
+        if entry and time.monotonic() - entry.created < sitemap_max_age():
+            return entry
+        async with self._lock:
+            entry = self._entries.get(name)
+            if entry and time.monotonic() - entry.created < sitemap_max_age():
+                return entry
+            shards = await self.shards()
+            if name == "feed":
+                entry = await _render(iter_feed())
+            elif name == "index":
+                entry = await _render(iter_sitemap_index(shards))
+            else:
+                entry = await _render(iter_urlset(name, shards))
+            self._entries[name] = entry
+            self.renders += 1
+            return entry
+
+
+sitemap_cache = SitemapCache()
+event_bus.add_listener(sitemap_cache.handle_event)
@@ -0,0 +1,419 @@
+"""Static export of published pages and articles.
+
+Every published document is rendered to ``{path}/index.html`` below
+``STATIC_EXPORT_DIR``, with ``path`` its public URL (``public_path``), so
+the tree can be served by a web server or CDN without the API. A manifest
+maps each document to its output path and the SHA-256 of the rendered
+HTML; a file is only rewritten when that hash changes, and the outputs of
+documents that are unpublished, deleted or moved to another slug are
+removed. Of several documents with the same path only the first one
+exported is written; the others are skipped with a warning.
+
+Rendering, hashing and writing run on a thread pool. Files are written
+under a temporary name and renamed into place, so readers never see a
+partial page. The manifest is guarded by a file lock, which lets the CLI
+and every API worker export into the same directory. With
+``STATIC_EXPORT_ENABLED`` each content write is exported shortly after it
+happens; ``python -m backend.cli export-static`` exports everything.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import unquote
+from xml.sax.saxutils import escape
+
+from .db import db
+from .render import render_content
+from .sitemap import SITEMAP_COLLECTIONS, feed_title, public_path, site_url
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLLECTIONS = SITEMAP_COLLECTIONS
+DEFAULT_DIR = Path(__file__).resolve().parents[2] / "data" / "static"
+MANIFEST_NAME = ".manifest.json"
+LOCK_NAME = ".manifest.lock"
+PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "title": 1,
+    "slug": 1,
+    "status": 1,
+    "content": 1,
+    "content_html": 1,
+    "meta_description": 1,
+    "excerpt": 1,
+}
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="de">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title} | {site}</title>
+{head}</head>
+<body>
+<article>
+<h1>{title}</h1>
+{body}
+</article>
+</body>
+</html>
+"""
+
+
+def static_export_enabled() -> bool:
+    return os.getenv("STATIC_EXPORT_ENABLED", "").strip().lower() in {
+        "1",
+        "true",
+        "yes",
+        "on",
+    }
+
+
+def static_export_dir() -> Path:
+    return Path(os.getenv("STATIC_EXPORT_DIR") or DEFAULT_DIR)
+
+
+def static_export_workers() -> int:
+    return max(1, int(os.getenv("STATIC_EXPORT_WORKERS", "4")))
+
+
+def output_path(collection: str, slug: Optional[str]) -> Optional[str]:
+    """Relative file of a document's page; None if its URL is unsafe on disk."""
+    segments = [
+        unquote(segment)
+        for segment in public_path(collection, slug or "").strip("/").split("/")
+    ]
+    if not slug or any(
+        segment in ("", ".", "..") or "/" in segment or "\0" in segment
+        for segment in segments
+    ):
+        return None
+    return "/".join(segments + ["index.html"])
+
+
+def _attribute(value: str) -> str:
+    return escape(value, {'"': "&quot;"})
+
+
+def render_page(collection: str, doc: Dict[str, Any]) -> bytes:
+    """The HTML document published for ``doc``."""
+    head = []
+    description = doc.get("meta_description") or doc.get("excerpt")
+    if description:
+        head.append(f'<meta name="description" content="{_attribute(description)}">')
+    if site_url():
+        canonical = site_url() + public_path(collection, doc.get("slug"))
+        head.append(f'<link rel="canonical" href="{_attribute(canonical)}">')
+    body = doc.get("content_html")
+    if body is None:
+        body = render_content(doc.get("content") or "")
+    return PAGE_TEMPLATE.format(
+        title=escape(doc.get("title") or ""),
+        site=escape(feed_title()),
+        head="".join(line + "\n" for line in head),
+        body=body,
+    ).encode("utf-8")
+
+
+@dataclass
+class ExportStats:
+    written: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    skipped: int = 0
+
+    def add(self, other: "ExportStats") -> None:
+        for item in fields(self):
+            setattr(
+                self, item.name, getattr(self, item.name) + getattr(other, item.name)
+            )
+
+
+class Manifest:
+    """The locked manifest of an export directory; saved on ``close``."""
+
+    def __init__(self, root: Path) -> None:
+        import fcntl
+
+        self.root = root
+        root.mkdir(parents=True, exist_ok=True)
+        self._lock = open(root / LOCK_NAME, "a")
+        fcntl.flock(self._lock, fcntl.LOCK_EX)
+        try:
+            with open(root / MANIFEST_NAME, encoding="utf-8") as handle:
+                self.files: Dict[str, Dict[str, str]] = json.load(handle)["files"]
+        except FileNotFoundError:
+            self.files = {}
+        except (ValueError, KeyError):
+            logger.warning("Unreadable static export manifest; exporting everything")
+            self.files = {}
+        self.dirty = False
+
+    def close(self) -> None:
+        import fcntl
+
+        try:
+            if self.dirty:
+                data = json.dumps({"files": self.files}, sort_keys=True)
+                _write_file(self.root, MANIFEST_NAME, data.encode("utf-8"))
+        finally:
+            fcntl.flock(self._lock, fcntl.LOCK_UN)
+            self._lock.close()
+
+
+def _write_file(root: Path, path: str, body: bytes) -> None:
+    target = root / path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=target.parent, prefix=".export-")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(body)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, target)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _remove_file(root: Path, path: str) -> None:
+    target = root / path
+    target.unlink(missing_ok=True)
+    # Drop directories left empty, but never the export root
+    parent = target.parent
+    while parent != root and root in parent.parents:
+        try:
+            parent.rmdir()
+        except OSError:
+            break
+        parent = parent.parent
+
+
+def _render(item: Tuple[str, Dict[str, Any]]) -> Tuple[bytes, str]:
+    body = render_page(*item)
+    return body, hashlib.sha256(body).hexdigest()
+
+
+class StaticExporter:
+    """Export published content and keep the export in sync with writes."""
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        workers: Optional[int] = None,
+        retry_delay: float = 5.0,
+    ) -> None:
+        self.root = root
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self.stats = ExportStats()
+        self._pending: Set[Tuple[str, str]] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def directory(self) -> Path:
+        return self.root or static_export_dir()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _apply(
+        self,
+        manifest: Manifest,
+        docs: List[Tuple[str, Dict[str, Any]]],
+        removed: Iterable[str] = (),
+        force: bool = False,
+    ) -> ExportStats:
+        """Write the pages of ``docs`` that changed and remove ``removed`` keys."""
+        stats = ExportStats()
+        files = manifest.files
+        stale: List[str] = []
+        for key in removed:
+            entry = files.pop(key, None)
+            if entry:
+                stale.append(entry["path"])
+                stats.removed += 1
+        # Slugs are not unique; the first document exported to a path keeps
+        # it, so a page never survives because another one shares its path
+        owners = {entry["path"]: key for key, entry in files.items()}
+        targets = []
+        for collection, doc in docs:
+            key = f"{collection}:{doc['id']}"
+            path = output_path(collection, doc.get("slug"))
+            if path is None:
+                logger.warning("Not exporting %s: unsafe slug %r", key, doc.get("slug"))
+            elif owners.get(path, key) != key:
+                logger.warning(
+                    "Not exporting %s: %s belongs to %s", key, path, owners[path]
+                )
+            else:
+                entry = files.get(key)
+                if entry and entry["path"] != path:
+                    owners.pop(entry["path"], None)
+                owners[path] = key
+                targets.append((key, path, (collection, doc)))
+                continue
+            stats.skipped += 1
+            if key in files:
+                stale.append(files.pop(key)["path"])
+                owners.pop(stale[-1], None)
+                stats.removed += 1
+        writes: List[Tuple[str, bytes]] = []
+        with ThreadPoolExecutor(self.workers or static_export_workers()) as pool:
+            rendered = pool.map(_render, [item for _, _, item in targets])
+            for (key, path, _), (body, digest) in zip(targets, rendered):
+                entry = files.get(key)
+                if entry and entry["path"] != path:
+                    stale.append(entry["path"])
+                elif (
+                    not force
+                    and entry
+                    and entry["hash"] == digest
+                    and (manifest.root / path).exists()
+                ):
+                    stats.unchanged += 1
+                    continue
+                files[key] = {"path": path, "hash": digest}
+                writes.append((path, body))
+            for path in set(stale):
+                _remove_file(manifest.root, path)
+            list(pool.map(lambda item: _write_file(manifest.root, *item), writes))
+        stats.written = len(writes)
+        manifest.dirty = manifest.dirty or bool(writes or stale)
+        return stats
+
+    async def _open(self) -> Manifest:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, Manifest, self.directory)
+
+    async def export_all(
+        self, database: Any = None, batch_size: int = 500, force: bool = False
+    ) -> ExportStats:
+        """Export every published document and remove all other outputs."""
+        database = db if database is None else database
+        loop = asyncio.get_running_loop()
+        stats = ExportStats()
+        manifest = await self._open()
+        try:
+            seen: Set[str] = set()
+            for collection in EXPORT_COLLECTIONS:
+                cursor = getattr(database, collection).find(
+                    {"status": "published"}, PROJECTION
+                )
+                batch: List[Tuple[str, Dict[str, Any]]] = []
+                async for doc in cursor.batch_size(batch_size):
+                    seen.add(f"{collection}:{doc['id']}")
+                    batch.append((collection, doc))
+                    if len(batch) >= batch_size:
+                        stats.add(
+                            await loop.run_in_executor(
+                                None, self._apply, manifest, batch, (), force
+                            )
+                        )
+                        batch = []
+                if batch:
+                    stats.add(
+                        await loop.run_in_executor(
+                            None, self._apply, manifest, batch, (), force
+                        )
+                    )
+            gone = set(manifest.files) - seen
+            stats.add(await loop.run_in_executor(None, self._apply, manifest, [], gone))
+        finally:
+            await loop.run_in_executor(None, manifest.close)
+        self.stats.add(stats)
+        return stats
+
+    async def export_documents(
+        self, keys: Iterable[Tuple[str, str]], database: Any = None
+    ) -> ExportStats:
+        """Re-export the given ``(collection, id)`` documents."""
+        database = db if database is None else database
+        docs: List[Tuple[str, Dict[str, Any]]] = []
+        gone: List[str] = []
+        for collection in EXPORT_COLLECTIONS:
+            ids = {doc_id for name, doc_id in keys if name == collection}
+            if not ids:
+                continue
+            found = await (
+                getattr(database, collection)
+                .find({"id": {"$in": list(ids)}}, PROJECTION)
+                .to_list(None)
+            )
+            published = [doc for doc in found if doc.get("status") == "published"]
+            docs += [(collection, doc) for doc in published]
+            gone += [
+                f"{collection}:{doc_id}"
+                for doc_id in ids - {doc["id"] for doc in published}
+            ]
+        loop = asyncio.get_running_loop()
+        manifest = await self._open()
+        try:
+            stats = await loop.run_in_executor(None, self._apply, manifest, docs, gone)
+        finally:
+            await loop.run_in_executor(None, manifest.close)
+        self.stats.add(stats)
+        return stats
+
+    def handle_event(self, event: Dict[str, Any]) -> None:
+        if event.get("collection") in EXPORT_COLLECTIONS and event.get("id"):
+            self._pending.add((event["collection"], event["id"]))
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def _take_pending(self) -> List[Tuple[str, str]]:
+        pending, self._pending = list(self._pending), set()
+        return pending
+
+    async def run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            pending = self._take_pending()
+            try:
+                await self.export_documents(pending)
+            except Exception:
+                logger.exception(
+                    "Static export failed, retrying in %.0fs", self.retry_delay
+                )
+                self._pending.update(pending)
+                await asyncio.sleep(self.retry_delay)
+                self._wakeup.set()
+
+    def start(self) -> None:
+        from .events import event_bus
+
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        event_bus.add_listener(self.handle_event)
+        self._task = asyncio.get_running_loop().create_task(self.run())
+        logger.info("Static export into %s started", self.directory)
+
+    async def stop(self) -> None:
+        from .events import event_bus
+
+        event_bus.remove_listener(self.handle_event)
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._pending:
+            await self.export_documents(self._take_pending())
+
+
+static_exporter = StaticExporter()
@@ -0,0 +1,385 @@
+"""Streaming import of statute corpora into the content collections.
+
+Sources are read incrementally so memory stays flat regardless of file size:
+gesetze-im-internet.de XML (``<dokumente><norm>…``, also inside the
+``xml.zip`` archives offered for download) and JSON Lines with one norm per
+line using the same field names as the parsed XML (``doknr``, ``jurabk``,
+``langue``, ``enbez``, ``titel``, ``text``).
+
+Every law becomes a parent page and each of its norms a child document. Ids
+are derived from ``doknr``, so re-running an import updates documents in
+place and a checkpoint per source file lets an interrupted run continue.
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional
+from xml.etree import ElementTree
+
+from ..utils import slugify
+from .duplicates import (
+    FINGERPRINT_COLLECTION,
+    ensure_fingerprint_indexes,
+    fingerprint_operations,
+)
+from .render import content_hash, rendered_fields
+from .revisions import REVISION_COLLECTION, TRACKED_FIELDS, build_revision
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_COLLECTION = "import_checkpoints"
+ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "https://amtlich.ai/statutes")
+DUPLICATE_KEY = 11000
+
+
+@dataclass
+class ImportStats:
+    norms: int = 0
+    written: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    already_imported: bool = False
+
+    @property
+    def documents(self) -> int:
+        return self.written + self.unchanged
+
+    @property
+    def rate(self) -> float:
+        """Documents written or confirmed per second."""
+        return self.documents / self.seconds if self.seconds else 0.0
+
+
+def _text(element: Optional[ElementTree.Element]) -> str:
+    if element is None:
+        return ""
+    return " ".join("".join(element.itertext()).split())
+
+
+def _norm_from_xml(norm: ElementTree.Element) -> Dict[str, Any]:
+    meta = norm.find("metadaten")
+    body = norm.find("textdaten/text/Content")
+    paragraphs = [] if body is None else [_text(p) for p in body.iter("P")]
+    heading = meta.find("gliederungseinheit") if meta is not None else None
+    return {
+        "doknr": norm.get("doknr"),
+        "jurabk": _text(meta.find("jurabk")) if meta is not None else "",
+        "langue": _text(meta.find("langue")) if meta is not None else "",
+        "enbez": _text(meta.find("enbez")) if meta is not None else "",
+        "titel": _text(meta.find("titel")) if meta is not None else "",
+        "gliederung": (
+            " ".join(
+                filter(
+                    None,
+                    (
+                        _text(heading.find("gliederungsbez")),
+                        _text(heading.find("gliederungstitel")),
+                    ),
+                )
+            )
+            if heading is not None
+            else ""
+        ),
+        "text": "\n\n".join(p for p in paragraphs if p),
+    }
+
+
+def iter_xml_norms(stream: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    """Yield the ``<norm>`` elements of a gesetze-im-internet XML file."""
+    root = None
+    for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            continue
+        if element.tag == "norm":
+            yield _norm_from_xml(element)
+            # Drop the parsed norm so the tree never grows past one element
+            root.clear()
+
+
+def iter_jsonl_norms(stream: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_norms(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield the norms of ``path`` based on its extension."""
+    suffix = path.suffix.lower()
+    if suffix == ".zip":
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.lower().endswith(".xml"):
+                    with archive.open(name) as stream:
+                        yield from iter_xml_norms(stream)
+        return
+    with open(path, "rb") as stream:
+        if suffix in (".jsonl", ".ndjson", ".json"):
+            yield from iter_jsonl_norms(stream)
+        else:
+            yield from iter_xml_norms(stream)
+
+
+class NormMapper:
+    """Map parsed norms of one source to content documents.
+
+    Keeps the id of the current law page and the current section heading
+    while the norms of a law are streamed in order.
+    """
+
+    def __init__(self) -> None:
+        self.law_id: Optional[str] = None
+        self.law_abbr = ""
+        self.section = ""
+
+    def map(self, norm: Dict[str, Any]) -> List[Dict[str, Any]]:
+        abbr = norm.get("jurabk") or self.law_abbr
+        if abbr != self.law_abbr:
+            self.law_abbr, self.law_id, self.section = abbr, None, ""
+        enbez = norm.get("enbez") or ""
+        if norm.get("gliederung") and not enbez:
+            self.section = norm["gliederung"]
+            return []
+        docs = []
+        if self.law_id is None:
+            # The first norm of a law carries its long title; the law page
+            # becomes the parent of all following norms
+            self.law_id = str(uuid.uuid5(ID_NAMESPACE, f"law:{abbr}"))
+            docs.append(
+                {
+                    "id": self.law_id,
+                    "title": norm.get("langue") or abbr,
+                    "slug": slugify(abbr),
+                    "content": "" if enbez else norm.get("text", ""),
+                    "parent_id": None,
+                }
+            )
+            if not enbez:
+                return docs
+        # Norms without a number (preamble, annexes) are named by their title
+        label = enbez or norm.get("titel") or ""
+        if not label or not norm.get("text"):
+            return docs
+        title = " ".join(filter(None, (label, enbez and norm.get("titel"), abbr)))
+        docs.append(
+            {
+                "id": str(uuid.uuid5(ID_NAMESPACE, norm.get("doknr") or title)),
+                "title": title,
+                "slug": slugify(" ".join(f"{abbr} {label}".replace("§", "").split())),
+                "content": norm["text"],
+                "parent_id": self.law_id,
+                "meta_description": self.section or None,
+            }
+        )
+        return docs
+
+
+def _import_hash(doc: Dict[str, Any]) -> str:
+    return content_hash(json.dumps(doc, sort_keys=True))
+
+
+def _upsert(doc: Dict[str, Any], digest: str, status: str, author_id: str):
+    from pymongo import UpdateOne
+
+    now = datetime.utcnow()
+    # Documents changed since the hashes were read do not match; their
+    # upsert then hits the unique id index and is counted as unchanged.
+    return UpdateOne(
+        {"id": doc["id"], "import_hash": {"$ne": digest}},
+        {
+            "$set": {
+                **doc,
+                **rendered_fields(doc["content"]),
+                "import_hash": digest,
+                "updated_at": now,
+            },
+            "$inc": {"version": 1},
+            "$setOnInsert": {
+                "status": status,
+                "author_id": author_id,
+                "created_at": now,
+            },
+        },
+        upsert=True,
+    )
+
+
+async def _changed(collection, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The documents of ``docs`` whose import hash differs from the stored one."""
+    stored = {
+        doc["id"]: doc.get("import_hash")
+        async for doc in collection.find(
+            {"id": {"$in": [doc["id"] for doc in docs]}},
+            {"_id": 0, "id": 1, "import_hash": 1},
+        )
+    }
+    return [doc for doc in docs if stored.get(doc["id"]) != _import_hash(doc)]
+
+
+async def _write(
+    collection, docs: List[Dict[str, Any]], status: str, author_id: str
+) -> List[Dict[str, Any]]:
+    """Upsert ``docs``; return the ones that were written."""
+    from pymongo.errors import BulkWriteError
+
+    operations = [_upsert(doc, _import_hash(doc), status, author_id) for doc in docs]
+    try:
+        await collection.bulk_write(operations, ordered=False)
+        return docs
+    except BulkWriteError as exc:
+        errors = exc.details["writeErrors"]
+        if any(e["code"] != DUPLICATE_KEY for e in errors):
+            raise
+    failed = {error["index"] for error in errors}
+    return [doc for index, doc in enumerate(docs) if index not in failed]
+
+
+async def _record_revisions(database, collection: str, ids: List[str]) -> None:
+    """Store the imported state of ``ids`` as snapshot revisions.
+
+    Every import bumps ``version``; without a revision for it the history
+    would have a gap that later deltas cannot be applied across.
+    """
+    from pymongo.errors import BulkWriteError
+
+    if collection not in TRACKED_FIELDS or not ids:
+        return
+    projection = {name: 1 for name in TRACKED_FIELDS[collection]}
+    docs = await (
+        database[collection]
+        .find(
+            {"id": {"$in": ids}},
+            {**projection, "_id": 0, "id": 1, "version": 1, "author_id": 1},
+        )
+        .to_list(None)
+    )
+    revisions = [
+        build_revision(collection, doc, None, None, doc.get("author_id"))
+        for doc in docs
+    ]
+    try:
+        await database[REVISION_COLLECTION].insert_many(revisions, ordered=False)
+    except BulkWriteError as exc:
+        if any(e["code"] != DUPLICATE_KEY for e in exc.details["writeErrors"]):
+            raise
+
+
+def _source_key(path: Path) -> Dict[str, Any]:
+    """Identify a source file; a changed file starts from the beginning."""
+    stat = path.stat()
+    return {"_id": str(path.resolve()), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+async def import_file(
+    database,
+    path: Path,
+    collection: str = "pages",
+    status: str = "draft",
+    author_id: str = "import",
+    batch_size: int = 1000,
+    resume: bool = True,
+) -> ImportStats:
+    """Import ``path`` into ``collection`` with unordered bulk upserts.
+
+    After each batch the number of processed norms is stored in
+    ``import_checkpoints``; with ``resume`` a later run skips that many norms
+    (or the whole file once completed) as long as the file is unchanged.
+    """
+    target = database[collection]
+    checkpoints = database[CHECKPOINT_COLLECTION]
+    await target.create_index("id", unique=True)
+    await ensure_fingerprint_indexes(database)
+
+    source = _source_key(path)
+    position = 0
+    if resume:
+        saved = await checkpoints.find_one(source)
+        if saved is not None:
+            if saved.get("completed"):
+                return ImportStats(skipped=saved["position"], already_imported=True)
+            position = saved["position"]
+
+    stats = ImportStats(skipped=position)
+    mapper = NormMapper()
+    started = time.perf_counter()
+    processed = 0
+    batch: List[Any] = []
+
+    async def flush(completed: bool = False) -> None:
+        if batch:
+            changed = await _changed(target, batch)
+            stats.unchanged += len(batch) - len(changed)
+            if changed:
+                written = await _write(target, changed, status, author_id)
+                stats.written += len(written)
+                stats.unchanged += len(changed) - len(written)
+                await _record_revisions(
+                    database, collection, [doc["id"] for doc in written]
+                )
+                # Unchanged norms keep the fingerprint of their stored body
+                fingerprints = fingerprint_operations(collection, written)
+                if fingerprints:
+                    await database[FINGERPRINT_COLLECTION].bulk_write(
+                        fingerprints, ordered=False
+                    )
+            batch.clear()
+        await checkpoints.update_one(
+            {"_id": source["_id"]},
+            {
+                "$set": {
+                    "size": source["size"],
+                    "mtime": source["mtime"],
+                    "position": processed,
+                    "completed": completed,
+                    "collection": collection,
+                    "updated_at": datetime.utcnow(),
+                }
+            },
+            upsert=True,
+        )
+
+    for norm in iter_norms(path):
+        processed += 1
+        # Skipped norms are still mapped so the parent law id is known
+        docs = mapper.map(norm)
+        if processed <= position:
+            continue
+        stats.norms += 1
+        batch.extend(docs)
+        if len(batch) >= batch_size:
+            await flush()
+    await flush(completed=True)
+    stats.seconds = time.perf_counter() - started
+    logger.info(
+        "Imported %s: %s documents, %.0f docs/s",
+        path.name,
+        stats.documents,
+        stats.rate,
+    )
+    return stats
+
+
+def expand_sources(paths: List[Path]) -> List[Path]:
+    """Return the importable files in ``paths``, walking directories."""
+    suffixes = {".xml", ".zip", ".jsonl", ".ndjson", ".json"}
+    files: List[Path] = []
+    for path in paths:
+        if path.is_dir():
+            for root, _dirs, names in os.walk(path):
+                files.extend(
+                    Path(root) / name
+                    for name in sorted(names)
+                    if Path(name).suffix.lower() in suffixes
+                )
+        else:
+            files.append(path)
+    return files
@@ -0,0 +1,58 @@
+"""In-process cache for the results of side-effect-free tools.
+
+Tools opt in by setting ``cache_ttl`` (seconds). Entries are keyed by tool
+name, caller role and the canonical JSON of the arguments, kept in LRU order
+and dropped on every content change event, so a cached result is at most
+``cache_ttl`` old even when changes of other workers are not broadcast.
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ..models import User
+from .events import event_bus
+
+
+def tool_cache_size() -> int:
+    return int(os.getenv("TOOL_CACHE_SIZE", "1024"))
+
+
+class ToolResultCache:
+    def __init__(self, max_entries: Optional[int] = None) -> None:
+        self.max_entries = max_entries or tool_cache_size()
+        # key -> (expiry on the monotonic clock, result)
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(name: str, args: Dict[str, Any], user: User) -> Tuple[str, str, str]:
+        return name, str(user.role), json.dumps(args, sort_keys=True, default=str)
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Tuple[str, str, str], data: Dict[str, Any], ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, event: Optional[Dict[str, Any]] = None) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+tool_result_cache = ToolResultCache()
+event_bus.add_listener(tool_result_cache.invalidate)
@@ -0,0 +1,231 @@
+"""Names and MCP metadata of the built-in tools.
+
+Kept apart from the implementations in ``tools`` so the registry can list
+and describe every tool without importing them; an implementation is only
+imported when its tool is first dispatched or warmed up.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Union
+
+from ..models import UserRole
+
+STRING = {"type": "string"}
+STATUS = {
+    "type": "string",
+    "enum": ["draft", "scheduled", "published", "archived"],
+}
+# Required with status "scheduled"
+PUBLISHED_AT = {"type": "string", "format": "date-time"}
+PAGE_FIELDS = {
+    "title": STRING,
+    "slug": STRING,
+    "content": STRING,
+    "meta_description": STRING,
+    "parent_id": STRING,
+    "status": STATUS,
+    "published_at": PUBLISHED_AT,
+}
+DOCUMENT_ARGS = {
+    "collection": {"type": "string", "enum": ["pages", "articles"]},
+    "id": STRING,
+}
+MAX_CONTEXT_CHUNKS = 20
+MAX_DUPLICATES = 100
+
+
+@dataclass
+class ToolSpec:
+    """A tool known by name before its implementation is loaded.
+
+    ``target`` is a ``"module:attribute"`` reference (as in entry points) or
+    a callable returning the tool. ``description`` and ``input_schema`` are
+    advertised in ``tools/list``; when ``description`` is None they are read
+    from the tool once it is loaded. Tools with ``warm_up`` set are loaded
+    and warmed at startup.
+    """
+
+    name: str
+    target: Union[str, Callable[[], Any]]
+    description: Optional[str] = None
+    input_schema: Dict[str, Any] = field(default_factory=lambda: {"type": "object"})
+    warm_up: bool = False
+
+
+def _builtin(name: str, attribute: str, **metadata: Any) -> ToolSpec:
+    return ToolSpec(name, f"backend.services.tools:{attribute}", **metadata)
+
+
+BUILTIN_TOOLS = [
+    _builtin(
+        "createPage",
+        "CreatePageTool",
+        description="Create a new page.",
+        input_schema={
+            "type": "object",
+            "properties": PAGE_FIELDS,
+            "required": ["title"],
+        },
+        warm_up=True,
+    ),
+    _builtin(
+        "createArticle",
+        "CreateArticleTool",
+        description="Create a new article or blog post.",
+        input_schema={
+            "type": "object",
+            "properties": {
+                "title": STRING,
+                "slug": STRING,
+                "content": STRING,
+                "excerpt": STRING,
+                "featured_image": STRING,
+                "category_id": STRING,
+                "tags": {"type": "array", "items": STRING},
+                "status": STATUS,
+                "published_at": PUBLISHED_AT,
+            },
+            "required": ["title"],
+        },
+    ),
+    _builtin(
+        "updatePage",
+        "UpdatePageTool",
+        description=(
+            "Update an existing page. Pass the last read version to fail instead "
+            "of overwriting concurrent changes."
+        ),
+        input_schema={
+            "type": "object",
+            "properties": {
+                "page_id": STRING,
+                "version": {"type": "integer"},
+                **PAGE_FIELDS,
+            },
+            "required": ["page_id"],
+        },
+    ),
+    _builtin(
+        "createUser",
+        "CreateUserTool",
+        description="Create a user (admins only).",
+        input_schema={
+            "type": "object",
+            "properties": {
+                "firebase_uid": STRING,
+                "email": STRING,
+                "name": STRING,
+                "role": {"type": "string", "enum": [role.value for role in UserRole]},
+            },
+            "required": ["firebase_uid", "email", "name"],
+        },
+    ),
+    _builtin(
+        "listRevisions",
+        "ListRevisionsTool",
+        description="List the stored versions of a page or article.",
+        input_schema={
+            "type": "object",
+            "properties": DOCUMENT_ARGS,
+            "required": ["id"],
+        },
+    ),
+    _builtin(
+        "restoreRevision",
+        "RestoreRevisionTool",
+        description=(
+            "Restore an earlier version of a page or article as a new version."
+        ),
+        input_schema={
+            "type": "object",
+            "properties": {**DOCUMENT_ARGS, "version": {"type": "integer"}},
+            "required": ["id", "version"],
+        },
+    ),
+    _builtin(
+        "getSections",
+        "GetSectionsTool",
+        description=(
+            "Read selected sections of a long page or article, or list its "
+            "section keys when no sections are given."
+        ),
+        input_schema={
+            "type": "object",
+            "properties": {
+                **DOCUMENT_ARGS,
+                "sections": {"type": "array", "items": STRING},
+            },
+            "required": ["id"],
+        },
+    ),
+    _builtin(
+        "updateSection",
+        "UpdateSectionTool",
+        description=(
+            "Replace one section of a page or article, including its heading "
+            "line. Pass the last read version to fail instead of overwriting "
+            "changes."
+        ),
+        input_schema={
+            "type": "object",
+            "properties": {
+                **DOCUMENT_ARGS,
+                "key": STRING,
+                "content": STRING,
+                "version": {"type": "integer"},
+            },
+            "required": ["id", "key", "content"],
+        },
+    ),
+    _builtin(
+        "retrieveContext",
+        "RetrieveContextTool",
+        description=(
+            "Find the passages of pages and articles most relevant to a query "
+            "(semantic search over the local vector index)."
+        ),
+        input_schema={
+            "type": "object",
+            "properties": {
+                "query": STRING,
+                "k": {"type": "integer", "minimum": 1, "maximum": MAX_CONTEXT_CHUNKS},
+            },
+            "required": ["query"],
+        },
+    ),
+    _builtin(
+        "findDuplicates",
+        "FindDuplicatesTool",
+        description=(
+            "Find near-duplicates of a stored page or article (by id) or of a "
+            "draft text (by content) before creating it."
+        ),
+        input_schema={
+            "type": "object",
+            "properties": {
+                **DOCUMENT_ARGS,
+                "content": STRING,
+                "threshold": {"type": "number", "exclusiveMinimum": 0, "maximum": 1},
+                "limit": {"type": "integer", "minimum": 1, "maximum": MAX_DUPLICATES},
+            },
+        },
+        warm_up=True,
+    ),
+    _builtin(
+        "generateText",
+        "GenerateTextTool",
+        description=(
+            "Generate text for a prompt with the configured AI service. With "
+            "context, relevant CMS passages are retrieved and sent along."
+        ),
+        input_schema={
+            "type": "object",
+            "properties": {
+                "prompt": STRING,
+                "context": {"type": "boolean"},
+                "context_k": {"type": "integer", "minimum": 1},
+            },
+            "required": ["prompt"],
+        },
+    ),
+]
@@ -1,51 +1,61 @@
-from abc import ABC, abstractmethod
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from fastapi import HTTPException
-
-from ..errors import ErrorResponse
-from ..models import Article, Page, User, UserRole
+from ..errors import http_error
+from ..models import Article, Page, PageUpdate, User, UserRole
+from ..utils import slugify
 from .ai import AIService, AIServiceError
-from .db import db
-
-
-class Tool(ABC):
-    @abstractmethod
-    def get_name(self) -> str:
-        pass
-
-    @abstractmethod
-    async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
-        pass
+from .content import (
+    get_section_index,
+    insert_document,
+    read_sections,
+    restore_revision,
+    update_document,
+    update_section,
+)
+from .duplicates import duplicates_of, find_similar, signature
+from .registry import Tool, tool_registry  # noqa: F401 - re-exported
+from .render import offload, render_content
+from .revisions import TRACKED_FIELDS, list_revisions
+from .tool_specs import MAX_CONTEXT_CHUNKS, MAX_DUPLICATES
+from .vectors import context_indexer
+
+# Names, descriptions and input schemas of these tools are declared in
+# ``tool_specs``; the registry imports this module on first use.
+
+# Exercises the Markdown renderer and MinHash tables on warm-up
+WARM_UP_TEXT = "## § 1 Warm-up\n\nDieser Text bereitet Renderer und Signaturen vor."
 
 
 class CreatePageTool(Tool):
     def get_name(self) -> str:
         return "createPage"
 
+    async def warm_up(self) -> None:
+        render_content(WARM_UP_TEXT)
+        signature(WARM_UP_TEXT)
+
     async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
         if user.role not in [UserRole.ADMIN, UserRole.EDITOR, UserRole.AUTHOR]:
-            raise HTTPException(
-                status_code=403,
-                detail=ErrorResponse(
-                    message="Insufficient permissions", code="insufficient_role"
-                ).dict(),
-            )
+            raise http_error(403, "Insufficient permissions", "insufficient_role")
 
         page_data = {
             "title": args.get("title"),
-            "slug": args.get("slug", args.get("title", "").lower().replace(" ", "-")),
+            "slug": args.get("slug", slugify(args.get("title", ""))),
             "content": args.get("content", ""),
             "meta_description": args.get("meta_description"),
             "parent_id": args.get("parent_id"),
             "author_id": user.id,
             "status": args.get("status", "draft"),
+            "published_at": args.get("published_at"),
         }
 
         page = Page(**page_data)
-        await db.pages.insert_one(page.dict())
-        return {"page_id": page.id, "message": "Page created successfully"}
+        doc = await insert_document("pages", page.dict())
+        return {
+            "page_id": page.id,
+            "message": "Page created successfully",
+            "duplicates": doc.get("possible_duplicates", []),
+        }
 
 
 class CreateArticleTool(Tool):
@@ -54,16 +64,11 @@ class CreateArticleTool(Tool):
 
     async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
         if user.role not in [UserRole.ADMIN, UserRole.EDITOR, UserRole.AUTHOR]:
-            raise HTTPException(
-                status_code=403,
-                detail=ErrorResponse(
-                    message="Insufficient permissions", code="insufficient_role"
-                ).dict(),
-            )
+            raise http_error(403, "Insufficient permissions", "insufficient_role")
 
         article_data = {
             "title": args.get("title"),
-            "slug": args.get("slug", args.get("title", "").lower().replace(" ", "-")),
+            "slug": args.get("slug", slugify(args.get("title", ""))),
             "content": args.get("content", ""),
             "excerpt": args.get("excerpt"),
             "featured_image": args.get("featured_image"),
@@ -71,11 +76,16 @@ class CreateArticleTool(Tool):
             "category_id": args.get("category_id"),
             "tags": args.get("tags", []),
             "status": args.get("status", "draft"),
+            "published_at": args.get("published_at"),
         }
 
         article = Article(**article_data)
-        await db.articles.insert_one(article.dict())
-        return {"article_id": article.id, "message": "Article created successfully"}
+        doc = await insert_document("articles", article.dict())
+        return {
+            "article_id": article.id,
+            "message": "Article created successfully",
+            "duplicates": doc.get("possible_duplicates", []),
+        }
 
 
 class UpdatePageTool(Tool):
@@ -85,40 +95,114 @@ class UpdatePageTool(Tool):
     async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
         page_id = args.get("page_id")
         if not page_id:
-            raise HTTPException(
-                status_code=400,
-                detail=ErrorResponse(
-                    message="page_id is required", code="missing_page_id"
-                ).dict(),
-            )
+            raise http_error(400, "page_id is required", "missing_page_id")
+
+        fields = {k: v for k, v in args.items() if k != "page_id"}
+        update_data = PageUpdate(**fields).dict(exclude_none=True)
+        expected_version = update_data.pop("version", None)
+        page_doc = await update_document(
+            "pages", page_id, update_data, user, expected_version, label="Page"
+        )
+        return {
+            "message": "Page updated successfully",
+            "page_id": page_id,
+            "version": page_doc["version"],
+        }
 
-        page_doc = await db.pages.find_one({"id": page_id})
-        if not page_doc:
-            raise HTTPException(
-                status_code=404,
-                detail=ErrorResponse(
-                    message="Page not found", code="page_not_found"
-                ).dict(),
-            )
 
-        if (
-            user.role not in [UserRole.ADMIN, UserRole.EDITOR]
-            and page_doc.get("author_id") != user.id
-        ):
-            raise HTTPException(
-                status_code=403,
-                detail=ErrorResponse(
-                    message="Insufficient permissions", code="insufficient_role"
-                ).dict(),
-            )
+def _document_target(args: Dict[str, Any]) -> Tuple[str, str]:
+    collection = args.get("collection", "pages")
+    doc_id = args.get("id")
+    if collection not in TRACKED_FIELDS or not doc_id:
+        raise http_error(
+            400,
+            "collection (pages or articles) and id are required",
+            "invalid_document_target",
+        )
+    return collection, doc_id
+
+
+class ListRevisionsTool(Tool):
+    cache_ttl = 60
 
-        update_data = {
-            k: v for k, v in args.items() if k != "page_id" and v is not None
+    def get_name(self) -> str:
+        return "listRevisions"
+
+    async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
+        collection, doc_id = _document_target(args)
+        revisions = await list_revisions(collection, doc_id)
+        return {
+            "revisions": [
+                {**revision, "created_at": revision["created_at"].isoformat()}
+                for revision in revisions
+            ]
         }
-        update_data["updated_at"] = datetime.utcnow()
 
-        await db.pages.update_one({"id": page_id}, {"$set": update_data})
-        return {"message": "Page updated successfully"}
+
+class RestoreRevisionTool(Tool):
+    def get_name(self) -> str:
+        return "restoreRevision"
+
+    async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
+        if user.role not in [UserRole.ADMIN, UserRole.EDITOR, UserRole.AUTHOR]:
+            raise http_error(403, "Insufficient permissions", "insufficient_role")
+        collection, doc_id = _document_target(args)
+        version = args.get("version")
+        if not isinstance(version, int):
+            raise http_error(400, "version is required", "missing_version")
+        doc = await restore_revision(
+            collection, doc_id, version, user, label=collection[:-1].capitalize()
+        )
+        return {
+            "message": f"Version {version} restored",
+            "id": doc_id,
+            "version": doc["version"],
+        }
+
+
+class GetSectionsTool(Tool):
+    cache_ttl = 60
+
+    def get_name(self) -> str:
+        return "getSections"
+
+    async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
+        collection, doc_id = _document_target(args)
+        label = collection[:-1].capitalize()
+        keys = args.get("sections") or []
+        if not keys:
+            return {
+                "id": doc_id,
+                "sections": await get_section_index(collection, doc_id, label),
+            }
+        doc = await read_sections(collection, doc_id, keys, label)
+        return {"id": doc_id, "version": doc["version"], "content": doc["content"]}
+
+
+class UpdateSectionTool(Tool):
+    def get_name(self) -> str:
+        return "updateSection"
+
+    async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
+        if user.role not in [UserRole.ADMIN, UserRole.EDITOR, UserRole.AUTHOR]:
+            raise http_error(403, "Insufficient permissions", "insufficient_role")
+        collection, doc_id = _document_target(args)
+        if not args.get("key") or not isinstance(args.get("content"), str):
+            raise http_error(400, "key and content are required", "missing_section")
+        doc = await update_section(
+            collection,
+            doc_id,
+            args["key"],
+            args["content"],
+            user,
+            args.get("version"),
+            label=collection[:-1].capitalize(),
+        )
+        return {
+            "message": "Section updated successfully",
+            "id": doc_id,
+            "version": doc["version"],
+        }
 
 
 class CreateUserTool(Tool):
@@ -127,12 +211,7 @@ class CreateUserTool(Tool):
 
     async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
         if user.role != UserRole.ADMIN:
-            raise HTTPException(
-                status_code=403,
-                detail=ErrorResponse(
-                    message="Only admins can create users", code="insufficient_role"
-                ).dict(),
-            )
+            raise http_error(403, "Only admins can create users", "insufficient_role")
 
         user_data = {
             "firebase_uid": args.get("firebase_uid"),
@@ -142,15 +221,116 @@ class CreateUserTool(Tool):
         }
 
         new_user = User(**user_data)
-        await db.users.insert_one(new_user.dict())
+        await insert_document("users", new_user.dict())
         return {"user_id": new_user.id, "message": "User created successfully"}
 
 
+async def _retrieve(query: str, k: Any) -> List[Dict[str, Any]]:
+    if context_indexer.index is None:
+        raise http_error(503, "Vector index is not enabled", "vector_index_disabled")
+    if not isinstance(k, int) or k < 1:
+        k = 5
+    return await context_indexer.search(query, min(k, MAX_CONTEXT_CHUNKS))
+
+
+def _with_context(prompt: str, chunks: List[Dict[str, Any]]) -> str:
+    excerpts = "\n\n".join(
+        f"[{number}] {chunk['title']}"
+        + (f" ({chunk['section']})" if chunk["section"] else "")
+        + f"\n{chunk['text']}"
+        for number, chunk in enumerate(chunks, start=1)
+    )
+    return (
+        "Answer using the following excerpts from the CMS where relevant and "
+        f"cite them by number.\n\n{excerpts}\n\n{prompt}"
+    )
+
+
+def _source(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "collection": chunk["collection"],
+        "id": chunk["id"],
+        "section": chunk["section"],
+        "score": chunk["score"],
+    }
+
+
+class RetrieveContextTool(Tool):
+    cache_ttl = 30
+
+    def get_name(self) -> str:
+        return "retrieveContext"
+
+    async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
+        query = args.get("query")
+        if not query:
+            raise http_error(400, "query is required", "missing_query")
+        chunks = await _retrieve(query, args.get("k", 5))
+        return {
+            "results": [
+                {**_source(chunk), "title": chunk["title"], "text": chunk["text"]}
+                for chunk in chunks
+            ]
+        }
+
+
+def _duplicate_args(args: Dict[str, Any]) -> Tuple[Optional[float], int]:
+    threshold = args.get("threshold")
+    if threshold is not None and (
+        isinstance(threshold, bool)
+        or not isinstance(threshold, (int, float))
+        or not 0 < threshold <= 1
+    ):
+        raise http_error(
+            400, "threshold must be a number above 0 and at most 1", "invalid_threshold"
+        )
+    limit = args.get("limit", 10)
+    if (
+        isinstance(limit, bool)
+        or not isinstance(limit, int)
+        or not 1 <= limit <= MAX_DUPLICATES
+    ):
+        raise http_error(
+            400, f"limit must be an integer from 1 to {MAX_DUPLICATES}", "invalid_limit"
+        )
+    return threshold, limit
+
+
+class FindDuplicatesTool(Tool):
+    cache_ttl = 30
+
+    def get_name(self) -> str:
+        return "findDuplicates"
+
+    async def warm_up(self) -> None:
+        signature(WARM_UP_TEXT)
+
+    async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
+        threshold, limit = _duplicate_args(args)
+        if args.get("content") is not None:
+            # A draft has no id yet; only the collection is validated
+            collection, _ = _document_target({"id": "draft", **args})
+            sig = await offload(signature, args["content"])
+            duplicates = (
+                []
+                if sig is None
+                else await find_similar(collection, sig, threshold, limit=limit)
+            )
+        else:
+            collection, doc_id = _document_target(args)
+            duplicates = await duplicates_of(collection, doc_id, threshold, limit)
+            if duplicates is None:
+                raise http_error(
+                    404, "No fingerprint for this document", "fingerprint_not_found"
+                )
+        return {"collection": collection, "duplicates": duplicates}
+
+
 class GenerateTextTool(Tool):
     """Example tool using an external AI service."""
 
-    def __init__(self, ai_service: AIService) -> None:
-        self.ai_service = ai_service
+    def __init__(self, ai_service: Optional[AIService] = None) -> None:
+        self.ai_service = ai_service or AIService()
 
     def get_name(self) -> str:
         return "generateText"
@@ -158,42 +338,17 @@ class GenerateTextTool(Tool):
     async def execute(self, args: Dict[str, Any], user: User) -> Dict[str, Any]:
         prompt = args.get("prompt")
         if not prompt:
-            raise HTTPException(
-                status_code=400,
-                detail=ErrorResponse(
-                    message="prompt is required", code="missing_prompt"
-                ).dict(),
-            )
+            raise http_error(400, "prompt is required", "missing_prompt")
 
+        chunks = []
+        if args.get("context"):
+            chunks = await _retrieve(prompt, args.get("context_k", 5))
+            prompt = _with_context(prompt, chunks)
         try:
             result = await self.ai_service.post("/generate", {"prompt": prompt})
-            return {"text": result.get("text", "")}
         except AIServiceError as exc:
-            raise HTTPException(
-                status_code=502,
-                detail=ErrorResponse(message=str(exc), code="ai_service_error").dict(),
-            )
-
-
-class ToolRegistry:
-    def __init__(self) -> None:
-        self.tools: Dict[str, Tool] = {}
-
-    def register(self, tool: Tool) -> None:
-        self.tools[tool.get_name()] = tool
-
-    def get_tool(self, name: str) -> Optional[Tool]:
-        return self.tools.get(name)
-
-    def list_tools(self) -> List[str]:
-        return list(self.tools.keys())
-
-
-# Initialize registry with default tools
-tool_registry = ToolRegistry()
-tool_registry.register(CreatePageTool())
-tool_registry.register(CreateArticleTool())
-tool_registry.register(UpdatePageTool())
-tool_registry.register(CreateUserTool())
-ai_service = AIService()
-tool_registry.register(GenerateTextTool(ai_service))
+            raise http_error(502, str(exc), "ai_service_error")
+        response = {"text": result.get("text", "")}
+        if args.get("context"):
+            response["sources"] = [_source(chunk) for chunk in chunks]
+        return response
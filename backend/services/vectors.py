@@ -0,0 +1,540 @@
+"""Chunking, embeddings and a local vector index for content retrieval.
+
+Pages and articles are split into chunks along their sections, embedded in
+batches and kept in an in-process NumPy index searched by cosine similarity.
+The index follows content writes through the event bus and is persisted as
+a ``.npy`` matrix that is memory-mapped on startup, so a restart neither
+re-embeds the corpus nor copies it into the heap.
+
+Every save writes matrix and metadata into a new directory under
+``versions/`` and then replaces the ``CURRENT`` pointer file, so a reader
+always sees a matching pair, and workers sharing ``VECTOR_INDEX_DIR`` never
+write into each other's files.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .ai import AIService, AIServiceError
+from .db import db
+from .render import RENDERED_COLLECTIONS
+from .sections import section_index
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1200
+CHUNK_OVERLAP = 200
+STUB_DIMENSIONS = 256
+DEFAULT_DIR = Path(__file__).resolve().parents[2] / "data" / "vector_index"
+POINTER = "CURRENT"
+# Versions of other workers are left alone until they are this old
+STALE_VERSION_SECONDS = 3600
+
+
+def vector_index_enabled() -> bool:
+    return os.getenv("VECTOR_INDEX_ENABLED", "").strip().lower() in {
+        "1",
+        "true",
+        "yes",
+        "on",
+    }
+
+
+def vector_index_dir() -> Path:
+    return Path(os.getenv("VECTOR_INDEX_DIR") or DEFAULT_DIR)
+
+
+def embedding_batch_size() -> int:
+    return max(1, int(os.getenv("EMBEDDING_BATCH_SIZE", "64")))
+
+
+def _split(text: str) -> List[str]:
+    """Split ``text`` at paragraph breaks into chunks of about CHUNK_SIZE."""
+    chunks: List[str] = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > CHUNK_SIZE:
+            chunks.append(current)
+            current = ""
+        while len(paragraph) > CHUNK_SIZE:
+            chunks.append(paragraph[:CHUNK_SIZE])
+            paragraph = paragraph[CHUNK_SIZE - CHUNK_OVERLAP :]
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_document(collection: str, doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return the chunks of a content document with their metadata."""
+    content = doc.get("content") or ""
+    sections = doc.get("sections") or section_index(content)
+    spans = [
+        (s["key"], s["title"], content[s["offset"] : s["offset"] + s["length"]])
+        for s in sections
+    ] or [(None, "", content)]
+    return [
+        {
+            "collection": collection,
+            "id": doc["id"],
+            "version": doc.get("version"),
+            "title": doc.get("title", ""),
+            "section": key,
+            "text": text,
+        }
+        for key, _title, span in spans
+        for text in _split(span)
+    ]
+
+
+def embedding_input(chunk: Dict[str, Any]) -> str:
+    # The document title gives short chunks the context they lack on their own
+    return f"{chunk['title']}\n{chunk['text']}"
+
+
+def _normalise(matrix):
+    import numpy as np
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+
+class StubEmbedder:
+    """Deterministic hashing embedder for tests and offline development.
+
+    Words are hashed into a fixed number of signed buckets, so texts sharing
+    vocabulary end up close to each other without any model.
+    """
+
+    name = "stub"
+
+    def __init__(self, dimensions: int = STUB_DIMENSIONS) -> None:
+        self.dimensions = dimensions
+
+    async def embed(self, texts: List[str]):
+        import numpy as np
+
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                digest = zlib.crc32(token.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                matrix[row, digest % self.dimensions] += sign
+        return _normalise(matrix)
+
+
+class AIEmbedder:
+    """Fetch embeddings from the configured AI service in batches.
+
+    Accepts ``{"embeddings": [[...], ...]}`` as well as the OpenAI-style
+    ``{"data": [{"embedding": [...]}, ...]}`` response.
+    """
+
+    name = "ai"
+
+    def __init__(self, service: AIService, batch_size: int) -> None:
+        self.service = service
+        self.batch_size = batch_size
+
+    async def embed(self, texts: List[str]):
+        import numpy as np
+
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start : start + self.batch_size]
+            result = await self.service.post("/embeddings", {"input": batch})
+            rows = result.get("embeddings") or [
+                item["embedding"] for item in result.get("data", [])
+            ]
+            if len(rows) != len(batch):
+                raise AIServiceError(
+                    f"Expected {len(batch)} embeddings, got {len(rows)}"
+                )
+            vectors.extend(rows)
+        return _normalise(np.asarray(vectors, dtype=np.float32))
+
+
+def get_embedder():
+    """Return the embedder selected by EMBEDDING_PROVIDER (``ai`` or ``stub``).
+
+    Without an explicit choice the AI service is used when AI_BASE_URL is set.
+    """
+    provider = os.getenv("EMBEDDING_PROVIDER", "").strip().lower()
+    if provider == "stub" or (not provider and not os.getenv("AI_BASE_URL")):
+        return StubEmbedder()
+    return AIEmbedder(AIService(), embedding_batch_size())
+
+
+class VectorIndex:
+    """Cosine top-k index over unit vectors with per-document updates.
+
+    Rows loaded from disk stay in a read-only memory map; rows added since
+    the last save live in a growable in-memory block. Replacing a document
+    only marks its old rows dead, ``save`` compacts both parts into a new
+    file. Chunk metadata (including the text) is kept alongside each row.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        import numpy as np
+
+        self.path = path
+        self.dimensions: Optional[int] = None
+        self.embedder: Optional[str] = None
+        self._base = np.zeros((0, 0), dtype=np.float32)
+        self._added = np.zeros((0, 0), dtype=np.float32)
+        self._added_count = 0
+        self._meta: List[Dict[str, Any]] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._rows: Dict[str, List[int]] = {}
+        if path is not None:
+            loaded = self._read()
+            if loaded is not None:
+                self._install(loaded)
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    @staticmethod
+    def key(collection: str, doc_id: str) -> str:
+        return f"{collection}:{doc_id}"
+
+    def _current(self) -> Optional[Path]:
+        """Directory of the current version; the index root for old layouts."""
+        try:
+            name = (self.path / POINTER).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return self.path if (self.path / "vectors.npy").exists() else None
+        return self.path / "versions" / name
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        """Load the current version from disk; None if there is none yet."""
+        import numpy as np
+
+        for _ in range(3):
+            directory = self._current()
+            if directory is None:
+                return None
+            try:
+                with open(directory / "meta.json", encoding="utf-8") as fh:
+                    state = json.load(fh)
+                # Empty files cannot be memory-mapped
+                base = (
+                    np.load(directory / "vectors.npy", mmap_mode="r")
+                    if state["chunks"]
+                    else np.zeros((0, state["dimensions"] or 0), dtype=np.float32)
+                )
+            except FileNotFoundError:
+                # Pruned by another worker after a newer save; read the pointer again
+                continue
+            rows: Dict[str, List[int]] = {}
+            for row, meta in enumerate(state["chunks"]):
+                rows.setdefault(self.key(meta["collection"], meta["id"]), []).append(
+                    row
+                )
+            return {"state": state, "base": base, "rows": rows}
+        raise FileNotFoundError(f"Vector index in {self.path} keeps changing")
+
+    def _install(self, loaded: Dict[str, Any]) -> None:
+        import numpy as np
+
+        state = loaded["state"]
+        self.dimensions = state["dimensions"]
+        self.embedder = state.get("embedder")
+        self._meta = state["chunks"]
+        self._base = loaded["base"]
+        self._alive = np.ones(len(self._meta), dtype=bool)
+        self._rows = loaded["rows"]
+
+    def remove(self, key: str) -> None:
+        for row in self._rows.pop(key, []):
+            self._alive[row] = False
+
+    def upsert(self, key: str, vectors, chunks: List[Dict[str, Any]]) -> None:
+        """Replace the rows of document ``key`` with ``vectors``."""
+        import numpy as np
+
+        self.remove(key)
+        if not chunks:
+            return
+        if self.dimensions is None:
+            self.dimensions = vectors.shape[1]
+        if vectors.shape[1] != self.dimensions:
+            raise ValueError(
+                f"Embedding has {vectors.shape[1]} dimensions, index "
+                f"{self.dimensions}; rebuild the index after changing models"
+            )
+        needed = self._added_count + len(chunks)
+        if needed > self._added.shape[0]:
+            capacity = max(needed, 2 * self._added.shape[0], 64)
+            grown = np.zeros((capacity, self.dimensions), dtype=np.float32)
+            if self._added_count:
+                grown[: self._added_count] = self._added[: self._added_count]
+            self._added = grown
+        self._added[self._added_count : needed] = vectors
+        self._added_count = needed
+        first = len(self._meta)
+        self._meta.extend(chunks)
+        self._alive = np.concatenate([self._alive, np.ones(len(chunks), dtype=bool)])
+        self._rows[key] = list(range(first, first + len(chunks)))
+
+    def search(self, vector, k: int = 5) -> List[Tuple[float, Dict[str, Any]]]:
+        """Return the ``k`` best ``(score, chunk)`` pairs for a unit vector."""
+        import numpy as np
+
+        if not len(self) or k <= 0:
+            return []
+        parts = [self._base @ vector] if len(self._base) else []
+        if self._added_count:
+            parts.append(self._added[: self._added_count] @ vector)
+        scores = np.concatenate(parts)
+        scores[~self._alive] = -np.inf
+        k = min(k, len(self))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(float(scores[row]), self._meta[row]) for row in best]
+
+    def _compacted(self):
+        import numpy as np
+
+        parts = []
+        if len(self._base):
+            parts.append(np.asarray(self._base))
+        if self._added_count:
+            parts.append(self._added[: self._added_count])
+        matrix = (
+            np.concatenate(parts)[self._alive]
+            if parts
+            else np.zeros((0, self.dimensions or 0), dtype=np.float32)
+        )
+        meta = [m for m, alive in zip(self._meta, self._alive) if alive]
+        return matrix, meta
+
+    def _write(self, matrix, meta: List[Dict[str, Any]]) -> None:
+        import numpy as np
+
+        versions = self.path / "versions"
+        name = f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        directory = versions / name
+        directory.mkdir(parents=True)
+        with open(directory / "vectors.npy", "wb") as fh:
+            np.save(fh, matrix)
+        with open(directory / "meta.json", "w", encoding="utf-8") as fh:
+            json.dump(
+                {
+                    "dimensions": self.dimensions,
+                    "embedder": self.embedder,
+                    "chunks": meta,
+                },
+                fh,
+                ensure_ascii=False,
+            )
+        # Both files become visible together with the pointer
+        pointer = self.path / f"{POINTER}.{name}.tmp"
+        pointer.write_text(name, encoding="utf-8")
+        os.replace(pointer, self.path / POINTER)
+        self._prune(versions, name)
+
+    @staticmethod
+    def _prune(versions: Path, keep: str) -> None:
+        """Remove this process's older versions and long-abandoned ones."""
+        own = f"-{os.getpid()}-"
+        cutoff = time.time() - STALE_VERSION_SECONDS
+        for directory in versions.iterdir():
+            if directory.name == keep:
+                continue
+            try:
+                stale = own in directory.name or directory.stat().st_mtime < cutoff
+            except FileNotFoundError:
+                continue
+            if stale:
+                # Readers that mapped the files keep them until they let go
+                shutil.rmtree(directory, ignore_errors=True)
+
+    async def save(self) -> None:
+        """Compact the index into a new version and memory-map the result."""
+        if self.path is None:
+            return
+        matrix, meta = await asyncio.to_thread(self._compacted)
+        await asyncio.to_thread(self._write, matrix, meta)
+        loaded = await asyncio.to_thread(self._read)
+        self._added = self._added[:0]
+        self._added_count = 0
+        self._install(loaded)
+
+
+class ContextIndexer:
+    """Keep a ``VectorIndex`` in sync with content writes.
+
+    The event listener only records which documents changed; a background
+    task re-reads them, embeds their chunks in batches and updates the
+    index, saving it at most every ``save_interval`` seconds.
+    """
+
+    def __init__(self, save_interval: float = 30.0, retry_delay: float = 5.0) -> None:
+        self.save_interval = save_interval
+        self.retry_delay = retry_delay
+        self.index: Optional[VectorIndex] = None
+        self.embedder: Any = None
+        self._pending: Set[Tuple[str, str]] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._saved_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def setup(self, path: Optional[Path] = None, embedder: Any = None) -> None:
+        self.embedder = embedder or get_embedder()
+        self.index = VectorIndex(path)
+        if self.index.embedder not in (None, self.embedder.name):
+            logger.warning(
+                "Vector index was built with %s embeddings, now using %s; "
+                "run `python -m backend.cli reindex-vectors`",
+                self.index.embedder,
+                self.embedder.name,
+            )
+        self.index.embedder = self.embedder.name
+
+    def start(self) -> None:
+        from .events import event_bus
+
+        if self.running:
+            return
+        if self.index is None:
+            self.setup(vector_index_dir())
+        self._wakeup = asyncio.Event()
+        event_bus.add_listener(self.handle_event)
+        self._task = asyncio.get_running_loop().create_task(self.run())
+        logger.info("Vector indexer started with %s documents", len(self.index))
+
+    async def stop(self) -> None:
+        from .events import event_bus
+
+        event_bus.remove_listener(self.handle_event)
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._pending:
+            await self.refresh(self._take_pending())
+        if self._dirty:
+            await self.index.save()
+
+    def handle_event(self, event: Dict[str, Any]) -> None:
+        if event.get("collection") in RENDERED_COLLECTIONS and event.get("id"):
+            self._pending.add((event["collection"], event["id"]))
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def _take_pending(self) -> List[Tuple[str, str]]:
+        pending, self._pending = list(self._pending), set()
+        return pending
+
+    async def run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            pending = self._take_pending()
+            try:
+                await self.refresh(pending)
+            except Exception:
+                logger.exception(
+                    "Vector index update failed, retrying in %.0fs", self.retry_delay
+                )
+                self._pending.update(pending)
+                await asyncio.sleep(self.retry_delay)
+                self._wakeup.set()
+                continue
+            if self._dirty and time.monotonic() - self._saved_at > self.save_interval:
+                try:
+                    await self.index.save()
+                except Exception:  # pragma: no cover - saved again with the next update
+                    logger.exception("Vector index save failed")
+                    continue
+                self._dirty = False
+                self._saved_at = time.monotonic()
+
+    async def index_documents(
+        self, collection: str, docs: Iterable[Dict[str, Any]]
+    ) -> int:
+        """Embed ``docs`` in batches and replace their rows; return chunk count."""
+        docs = list(docs)
+        chunks = [chunk_document(collection, doc) for doc in docs]
+        flat = [chunk for doc_chunks in chunks for chunk in doc_chunks]
+        vectors = await self.embedder.embed([embedding_input(c) for c in flat])
+        position = 0
+        for doc, doc_chunks in zip(docs, chunks):
+            self.index.upsert(
+                VectorIndex.key(collection, doc["id"]),
+                vectors[position : position + len(doc_chunks)],
+                doc_chunks,
+            )
+            position += len(doc_chunks)
+        self._dirty = True
+        return len(flat)
+
+    async def refresh(self, keys: List[Tuple[str, str]]) -> None:
+        """Re-read and re-index changed documents; drop deleted ones."""
+        for collection in RENDERED_COLLECTIONS:
+            ids = {doc_id for name, doc_id in keys if name == collection}
+            if not ids:
+                continue
+            docs = await (
+                getattr(db, collection).find({"id": {"$in": list(ids)}}).to_list(None)
+            )
+            for doc_id in ids - {doc["id"] for doc in docs}:
+                self.index.remove(VectorIndex.key(collection, doc_id))
+                self._dirty = True
+            if docs:
+                await self.index_documents(collection, docs)
+
+    async def rebuild(self, database, path: Optional[Path], batch_size: int) -> int:
+        """Embed all pages and articles into a new index saved at ``path``."""
+        if self.embedder is None:
+            self.embedder = get_embedder()
+        self.index = VectorIndex()
+        self.index.path = path
+        self.index.embedder = self.embedder.name
+        total = 0
+        for collection in RENDERED_COLLECTIONS:
+            batch: List[Dict[str, Any]] = []
+            cursor = database[collection].find(
+                {}, {"_id": 0, "id": 1, "title": 1, "content": 1, "sections": 1}
+            )
+            async for doc in cursor:
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    total += await self.index_documents(collection, batch)
+                    batch = []
+            if batch:
+                total += await self.index_documents(collection, batch)
+        await self.index.save()
+        return total
+
+    async def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        vector = (await self.embedder.embed([query]))[0]
+        return [
+            {**chunk, "score": round(score, 4)}
+            for score, chunk in self.index.search(vector, k)
+        ]
+
+
+context_indexer = ContextIndexer()
@@ -0,0 +1,13 @@
+from datetime import datetime, timezone
+
+
+def slugify(title: str) -> str:
+    """Derive the URL slug used for pages and articles from a title."""
+    return title.lower().replace(" ", "-")
+
+
+def as_utc(value: datetime) -> datetime:
+    """Naive UTC, as written by the application and returned by pymongo."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
@@ -0,0 +1,151 @@
+"""Benchmark for MinHash/LSH near-duplicate detection.
+
+Generates a corpus of synthetic paragraphs in which a share of documents are
+lightly edited copies of others, fingerprints all of them and answers
+queries through the band buckets (the in-memory equivalent of the multikey
+``bands`` index). Reports signature throughput, query latency compared with
+scanning every signature, and precision/recall against exact Jaccard::
+
+    python -m benchmarks.duplicates --documents 100000 --output duplicates.json
+"""
+
+import argparse
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from backend.services.duplicates import (
+    band_keys,
+    duplicate_threshold,
+    shingles,
+    signature,
+    similarity,
+)
+from benchmarks.revisions import WORDS
+
+VOCABULARY = (
+    WORDS
+    + (
+        "Landkreis Gemeinde Satzung Bürger Amt Verfahren Auskunft Nachweis "
+        "Genehmigung Erlaubnis Zustellung Vollzug Aufsicht Haushalt Beschluss"
+    ).split()
+)
+
+
+def make_document(rng: random.Random) -> List[str]:
+    return [rng.choice(VOCABULARY) for _ in range(rng.randint(80, 200))]
+
+
+def mutate(rng: random.Random, words: List[str], edits: int) -> List[str]:
+    words = list(words)
+    for _ in range(edits):
+        words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+    return words
+
+
+def jaccard(first: str, second: str) -> float:
+    a, b = shingles(first), shingles(second)
+    return len(a & b) / len(a | b)
+
+
+def run_benchmark(
+    documents: int, duplicate_share: float, queries: int, seed: int
+) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    threshold = duplicate_threshold()
+    texts: List[str] = []
+    for _ in range(documents):
+        if texts and rng.random() < duplicate_share:
+            original = texts[rng.randrange(len(texts))].split(" ")
+            texts.append(" ".join(mutate(rng, original, rng.randint(1, 3))))
+        else:
+            texts.append(" ".join(make_document(rng)))
+
+    started = time.perf_counter()
+    signatures = [signature(text) for text in texts]
+    signature_seconds = time.perf_counter() - started
+
+    buckets: Dict[int, List[int]] = defaultdict(list)
+    started = time.perf_counter()
+    for number, sig in enumerate(signatures):
+        for key in band_keys(sig):
+            buckets[key].append(number)
+    band_seconds = time.perf_counter() - started
+    matrix = np.stack(signatures)
+
+    sample = rng.sample(range(documents), min(queries, documents))
+    lsh_seconds = scan_seconds = 0.0
+    candidates = true_positives = false_negatives = reported = 0
+    for number in sample:
+        sig = signatures[number]
+        started = time.perf_counter()
+        found = {
+            other for key in band_keys(sig) for other in buckets[key] if other != number
+        }
+        candidates += len(found)
+        matches = {
+            other for other in found if similarity(sig, signatures[other]) >= threshold
+        }
+        lsh_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        scores = (matrix == sig).mean(axis=1)
+        scores[number] = 0
+        exhaustive = set(np.flatnonzero(scores >= threshold).tolist())
+        scan_seconds += time.perf_counter() - started
+
+        # Ground truth: exact shingle Jaccard of the pairs the scan surfaces
+        # plus everything LSH reported
+        truth = {
+            other
+            for other in exhaustive | matches
+            if jaccard(texts[number], texts[other]) >= threshold
+        }
+        reported += len(matches)
+        true_positives += len(matches & truth)
+        false_negatives += len(truth - matches)
+
+    count = len(sample)
+    relevant = true_positives + false_negatives
+    return {
+        "documents": documents,
+        "threshold": threshold,
+        "signatures_per_second": round(documents / signature_seconds),
+        "band_index_seconds": round(band_seconds, 2),
+        "queries": count,
+        "candidates_per_query": round(candidates / count, 2),
+        "lsh_query_ms": round(lsh_seconds / count * 1000, 3),
+        "full_scan_query_ms": round(scan_seconds / count * 1000, 3),
+        "precision": round(true_positives / reported, 3) if reported else 1.0,
+        "recall": round(true_positives / relevant, 3) if relevant else 1.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100_000)
+    parser.add_argument(
+        "--duplicate-share", type=float, default=0.1, help="Share of edited copies"
+    )
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        args.documents, args.duplicate_share, args.queries, args.seed
+    )
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
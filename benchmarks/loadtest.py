@@ -0,0 +1,431 @@
+"""HTTP load test for the hot API endpoints.
+
+Starts the FastAPI app with a stubbed Firebase verifier and a stub AI server,
+backed either by a local MongoDB (``--mongo-url``) or an in-memory stand-in,
+drives every scenario with a fixed concurrency and reports throughput and
+latency percentiles as JSON so that results of two commits can be compared::
+
+    python -m benchmarks.loadtest --requests 2000 --concurrency 32 \\
+        --output results.json --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+import uvicorn
+
+for _name, _value in {
+    "MONGO_URL": "mongodb://localhost:27017",
+    "DB_NAME": "amtlich_loadtest",
+    "FIREBASE_SERVICE_ACCOUNT": "{}",
+    "ALLOWED_ORIGINS": "http://localhost",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+LOADTEST_UID = "loadtest-admin"
+
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "dispatch_generate": {
+        "method": "POST",
+        "path": "/api/mcp/dispatch",
+        "json": {"tool": "generateText", "args": {"prompt": "Benchmark prompt"}},
+    },
+    "dispatch_create_page": {
+        "method": "POST",
+        "path": "/api/mcp/dispatch",
+        "json": {
+            "tool": "createPage",
+            "args": {"title": "Load Test Page", "content": "Lorem ipsum " * 40},
+        },
+    },
+    "pages": {"method": "GET", "path": "/api/pages"},
+    "dashboard_stats": {"method": "GET", "path": "/api/dashboard/stats"},
+}
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _ai_stub(scope, receive, send) -> None:
+    """Minimal ASGI app answering every request like the AI text endpoint."""
+    if scope["type"] != "http":
+        return
+    body = json.dumps({"text": "Stubbed AI response"}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class ServerThread:
+    """Run an ASGI app with uvicorn in a background thread."""
+
+    def __init__(self, app, port: Optional[int] = None) -> None:
+        self.port = port or _free_port()
+        config = uvicorn.Config(
+            app,
+            host="127.0.0.1",
+            port=self.port,
+            log_level="warning",
+            access_log=False,
+        )
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "ServerThread":
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError("Server did not start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def _install_database(database) -> Dict[Any, Any]:
+    """Point every loaded backend module at ``database``; return the originals."""
+    replaced = {}
+    for name, module in list(sys.modules.items()):
+        current = getattr(module, "db", None)
+        if (
+            name.startswith("backend")
+            and current is not None
+            and not isinstance(current, types.ModuleType)
+        ):
+            replaced[module] = current
+            module.db = database
+    return replaced
+
+
+@contextmanager
+def prepared_backend(mongo_url: Optional[str], ai_url: str) -> Iterator[Any]:
+    """Yield the app wired to the benchmark database and stubs.
+
+    All patches are reverted on exit so the helper can be reused from tests.
+    """
+    from firebase_admin import auth as firebase_auth
+
+    from backend.server import app
+    from backend.services.tools import tool_registry
+
+    if mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(mongo_url)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+
+        client = AsyncMongoMockClient()
+    database = client[os.environ["DB_NAME"]]
+
+    original_verify = firebase_auth.verify_id_token
+    firebase_auth.verify_id_token = lambda token, *a, **k: {"uid": token}
+    generate = tool_registry.get_tool("generateText")
+    if generate:
+        original_ai = (generate.ai_service.base_url, generate.ai_service.api_key)
+        generate.ai_service.base_url = ai_url
+        generate.ai_service.api_key = "loadtest"
+    replaced = _install_database(database)
+    try:
+        yield app, database
+    finally:
+        for module, original in replaced.items():
+            module.db = original
+        if generate:
+            generate.ai_service.base_url, generate.ai_service.api_key = original_ai
+        firebase_auth.verify_id_token = original_verify
+        client.close()
+
+
+def seed_documents(pages: int) -> Dict[str, List[Dict[str, Any]]]:
+    """Return the fixed benchmark dataset keyed by collection."""
+    from backend.models import Page, User, UserRole
+
+    admin = User(
+        firebase_uid=LOADTEST_UID,
+        email="loadtest@example.com",
+        name="Load Test",
+        role=UserRole.ADMIN,
+    )
+    docs = [
+        Page(
+            title=f"Seed Page {i}",
+            slug=f"seed-page-{i}",
+            content="Lorem ipsum dolor sit amet. " * 20,
+            author_id=admin.id,
+            status="published" if i % 2 else "draft",
+        ).dict()
+        for i in range(pages)
+    ]
+    return {"users": [admin.dict()], "pages": docs, "articles": []}
+
+
+def seed(mongo_url: Optional[str], database, pages: int) -> None:
+    """Reset the benchmark collections and insert the fixed dataset.
+
+    A real MongoDB is seeded through a synchronous client so that the Motor
+    client is only ever bound to the event loop serving the requests.
+    """
+    dataset = seed_documents(pages)
+    if mongo_url:
+        from pymongo import MongoClient
+
+        with MongoClient(mongo_url) as sync_client:
+            target = sync_client[os.environ["DB_NAME"]]
+            for name, docs in dataset.items():
+                target[name].delete_many({})
+                if docs:
+                    target[name].insert_many(docs)
+        return
+
+    async def _seed() -> None:
+        for name, docs in dataset.items():
+            await database[name].delete_many({})
+            if docs:
+                await database[name].insert_many(docs)
+
+    asyncio.run(_seed())
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Dict[str, Any],
+    requests: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    """Issue ``requests`` calls with ``concurrency`` workers and summarise them."""
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(
+                    scenario["method"], scenario["path"], json=scenario.get("json")
+                )
+                ok = response.status_code < 400
+                if ok and scenario["path"] == "/api/mcp/dispatch":
+                    ok = response.json().get("success", False)
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    millis = [value * 1000 for value in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(millis), 2) if millis else 0.0,
+            "p50": round(_percentile(millis, 0.50), 2),
+            "p95": round(_percentile(millis, 0.95), 2),
+            "p99": round(_percentile(millis, 0.99), 2),
+            "max": round(max(millis), 2) if millis else 0.0,
+        },
+    }
+
+
+async def drive(
+    base_url: Optional[str],
+    app,
+    scenarios: List[str],
+    requests: int,
+    concurrency: int,
+    warmup: int,
+) -> Dict[str, Any]:
+    headers = {"Authorization": f"Bearer {LOADTEST_UID}"}
+    if base_url:
+        limits = httpx.Limits(max_connections=concurrency)
+        client = httpx.AsyncClient(
+            base_url=base_url, headers=headers, limits=limits, timeout=30
+        )
+    else:
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(
+            transport=transport, base_url="http://loadtest", headers=headers
+        )
+    results = {}
+    async with client:
+        for name in scenarios:
+            if warmup:
+                await run_scenario(client, SCENARIOS[name], warmup, concurrency)
+            results[name] = await run_scenario(
+                client, SCENARIOS[name], requests, concurrency
+            )
+    return results
+
+
+def run_load_test(
+    scenarios: Optional[List[str]] = None,
+    requests: int = 1000,
+    concurrency: int = 16,
+    warmup: int = 50,
+    seed_pages: int = 200,
+    mongo_url: Optional[str] = None,
+    in_process: bool = False,
+) -> Dict[str, Any]:
+    """Run the load test and return the machine-readable report."""
+    scenarios = scenarios or list(SCENARIOS)
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    with ServerThread(_ai_stub) as ai_server:
+        with prepared_backend(mongo_url, ai_server.url) as (app, database):
+            if in_process:
+                seed(mongo_url, database, seed_pages)
+                results = asyncio.run(
+                    drive(None, app, scenarios, requests, concurrency, warmup)
+                )
+            else:
+                with ServerThread(app) as api_server:
+                    seed(mongo_url, database, seed_pages)
+                    results = asyncio.run(
+                        drive(
+                            api_server.url,
+                            app,
+                            scenarios,
+                            requests,
+                            concurrency,
+                            warmup,
+                        )
+                    )
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "database": "mongodb" if mongo_url else "in-memory",
+            "transport": "asgi" if in_process else "http",
+            "requests": requests,
+            "concurrency": concurrency,
+            "seed_pages": seed_pages,
+        },
+        "endpoints": results,
+    }
+
+
+def _change(current: float, previous: float) -> str:
+    # A baseline endpoint that failed every request has no rate to compare to
+    if not previous:
+        return "n/a"
+    return f"{current / previous - 1:+.1%}"
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Describe throughput and p99 changes relative to ``baseline``."""
+    lines = []
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous:
+            continue
+        rps_change = _change(current["throughput_rps"], previous["throughput_rps"])
+        p99_change = _change(
+            current["latency_ms"]["p99"], previous["latency_ms"]["p99"]
+        )
+        lines.append(f"{name}: throughput {rps_change}, p99 latency {p99_change}")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed-pages", type=int, default=200)
+    parser.add_argument(
+        "--mongo-url", help="Use a real MongoDB instead of the in-memory stand-in"
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Call the app through ASGI instead of a local HTTP server",
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(
+        scenarios=args.scenario,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        warmup=args.warmup,
+        seed_pages=args.seed_pages,
+        mongo_url=args.mongo_url,
+        in_process=args.in_process,
+    )
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as fh:
+            for line in compare(report, json.load(fh)):
+                print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Calibrated microbenchmark harness.
+
+Each benchmark is timed as the best of several rounds with the garbage
+collector disabled and divided by the time of a fixed pure-Python calibration
+workload measured right before and after it. The resulting ratio is compared
+with ``baselines.json``, which keeps the check largely independent of the
+machine and of noisy neighbours. A benchmark fails when it is
+slower than its baseline by more than ``MICROBENCH_TOLERANCE`` (default
+1.75), so doubling the cost of a hot path fails loudly.
+
+Refresh the stored baselines after an intentional change with::
+
+    pytest benchmarks/micro --update-baselines
+"""
+
+import asyncio
+import gc
+import json
+import os
+import platform
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchdb")
+os.environ.setdefault("FIREBASE_SERVICE_ACCOUNT", "{}")
+os.environ.setdefault("ALLOWED_ORIGINS", "http://testserver")
+
+BASELINE_FILE = Path(__file__).with_name("baselines.json")
+ROUNDS = 7
+MIN_ROUND_TIME = 0.02
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--update-baselines",
+        action="store_true",
+        help="Store the measured ratios as the new microbenchmark baselines",
+    )
+
+
+def _calibration_workload() -> None:
+    items = [{"id": str(i), "title": f"Title {i}"} for i in range(200)]
+    "-".join(item["title"].lower() for item in items)
+    sorted(items, key=lambda item: item["id"])
+
+
+def _best_of(func: Callable[[], Any], rounds: int = ROUNDS) -> float:
+    """Return the best per-call time of ``func`` in seconds."""
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _time_rounds(func, rounds)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _time_rounds(func: Callable[[], Any], rounds: int) -> float:
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_ROUND_TIME:
+            break
+        loops *= 2
+    best = elapsed / loops
+    for _ in range(rounds - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, (time.perf_counter() - started) / loops)
+    return best
+
+
+class Bench:
+    """Callable fixture mirroring the ``benchmark(func, *args)`` style."""
+
+    def __init__(self, name: str, results: Dict) -> None:
+        self.name = name
+        self.results = results
+
+    def __call__(self, func: Callable, *args, **kwargs) -> Any:
+        result = func(*args, **kwargs)
+        self._measure(lambda: func(*args, **kwargs))
+        return result
+
+    def run_async(self, func: Callable, *args, batch: int = 200, **kwargs) -> Any:
+        """Benchmark a coroutine function, awaiting it ``batch`` times per call."""
+        loop = asyncio.new_event_loop()
+        try:
+            result = loop.run_until_complete(func(*args, **kwargs))
+
+            async def _batch() -> None:
+                for _ in range(batch):
+                    await func(*args, **kwargs)
+
+            self._measure(lambda: loop.run_until_complete(_batch()), per_call=batch)
+        finally:
+            loop.close()
+        return result
+
+    def _measure(self, func: Callable[[], Any], per_call: int = 1) -> None:
+        before = _best_of(_calibration_workload)
+        seconds = _best_of(func) / per_call
+        calibration = min(before, _best_of(_calibration_workload))
+        self.results[self.name] = {
+            "ratio": seconds / calibration,
+            "us_per_call": seconds * 1e6,
+            "calibration_us": calibration * 1e6,
+        }
+
+
+@pytest.fixture(scope="session")
+def baselines(request):
+    stored = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+    results: Dict[str, Dict[str, float]] = {}
+    yield stored.get("benchmarks", {}), results
+    if request.config.getoption("--update-baselines") and results:
+        merged = {**stored.get("benchmarks", {}), **results}
+        payload = {
+            "machine": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+            },
+            "benchmarks": {
+                name: {key: round(value, 4) for key, value in entry.items()}
+                for name, entry in sorted(merged.items())
+            },
+        }
+        BASELINE_FILE.write_text(json.dumps(payload, indent=2) + "\n")
+
+
+@pytest.fixture
+def bench(request, baselines):
+    stored, results = baselines
+    name = request.node.name
+    fixture = Bench(name, results)
+    yield fixture
+    if request.config.getoption("--update-baselines") or name not in results:
+        return
+    baseline = stored.get(name)
+    if baseline is None:
+        pytest.fail(f"No baseline for {name}; run with --update-baselines")
+    tolerance = float(os.getenv("MICROBENCH_TOLERANCE", "1.75"))
+    ratio = results[name]["ratio"] / baseline["ratio"]
+    if ratio > tolerance:
+        pytest.fail(
+            f"{name} is {ratio:.2f}x slower than its baseline "
+            f"({results[name]['us_per_call']:.2f}us per call, "
+            f"allowed {tolerance:.2f}x)"
+        )
@@ -0,0 +1,59 @@
+"""Fixed, deterministic inputs for the microbenchmarks."""
+
+from datetime import datetime
+
+FIXED_TIME = datetime(2025, 1, 1, 12, 0, 0)
+
+USER_DOC = {
+    "id": "bench-user",
+    "firebase_uid": "bench-uid",
+    "email": "bench@example.com",
+    "name": "Bench User",
+    "role": "admin",
+    "created_at": FIXED_TIME,
+    "updated_at": FIXED_TIME,
+    "is_active": True,
+}
+
+PAGE_DOC = {
+    "id": "bench-page",
+    "title": "Verwaltungsvorschrift zur Durchführung des Gesetzes",
+    "slug": "verwaltungsvorschrift-zur-durchfuehrung-des-gesetzes",
+    "content": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 40,
+    "meta_description": "Eine Seite für Benchmarks",
+    "parent_id": None,
+    "author_id": "bench-user",
+    "status": "published",
+    "created_at": FIXED_TIME,
+    "updated_at": FIXED_TIME,
+    "published_at": FIXED_TIME,
+}
+
+ARTICLE_DOC = {
+    "id": "bench-article",
+    "title": "Neue Regelungen zur digitalen Verwaltung",
+    "slug": "neue-regelungen-zur-digitalen-verwaltung",
+    "content": "Sed ut perspiciatis unde omnis iste natus error sit. " * 40,
+    "excerpt": "Kurzfassung",
+    "featured_image": None,
+    "author_id": "bench-user",
+    "category_id": "verwaltung",
+    "tags": ["digital", "verwaltung", "recht"],
+    "status": "draft",
+    "created_at": FIXED_TIME,
+    "updated_at": FIXED_TIME,
+    "published_at": None,
+}
+
+TITLES = [f"Paragraph {i} Absatz {i % 7} der Satzung über Gebühren" for i in range(100)]
+
+PAGE_LIST = [
+    {**PAGE_DOC, "id": f"bench-page-{i}", "slug": f"bench-page-{i}"} for i in range(50)
+]
+
+CREATE_PAGE_ARGS = {
+    "title": "Benchmark Seite",
+    "content": PAGE_DOC["content"],
+    "meta_description": "Meta",
+    "status": "draft",
+}
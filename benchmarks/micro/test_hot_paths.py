@@ -0,0 +1,161 @@
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from backend.models import Article, Page, ToolCall, ToolResponse, User
+from backend.routes import api as api_routes
+from backend.services import content as content_module
+from backend.services import duplicates as duplicates_module
+from backend.services import revisions as revisions_module
+from backend.services.duplicates import signature
+from backend.services.render import render_content, rendered_fields
+from backend.services.tools import CreatePageTool, tool_registry
+from backend.utils import slugify
+
+from .datasets import (
+    ARTICLE_DOC,
+    CREATE_PAGE_ARGS,
+    PAGE_DOC,
+    PAGE_LIST,
+    TITLES,
+    USER_DOC,
+)
+
+
+class NullCursor:
+    async def to_list(self, length):
+        return []
+
+
+class NullCollection:
+    async def insert_one(self, doc):
+        return None
+
+    async def bulk_write(self, operations):
+        return None
+
+    def find(self, *args, **kwargs):
+        return NullCursor()
+
+
+class NullDB:
+    pages = NullCollection()
+    articles = NullCollection()
+    users = NullCollection()
+    revisions = NullCollection()
+    fingerprints = NullCollection()
+
+
+@pytest.fixture
+def null_db(monkeypatch):
+    monkeypatch.setattr(content_module, "db", NullDB())
+    monkeypatch.setattr(revisions_module, "db", NullDB())
+    monkeypatch.setattr(duplicates_module, "db", NullDB())
+
+
+@pytest.fixture
+def prerendered(monkeypatch):
+    """Serve stored render output and signature instead of computing them.
+
+    Both have their own benchmarks (test_render_content, test_signature);
+    with them in place the write benchmarks would only repeat their cost
+    and hide their own.
+    """
+    fields = rendered_fields(CREATE_PAGE_ARGS["content"])
+    sig = signature(CREATE_PAGE_ARGS["content"])
+    monkeypatch.setattr(content_module, "rendered_fields", lambda source: fields)
+    monkeypatch.setattr(content_module, "signature", lambda text: sig)
+
+
+@pytest.fixture
+def user():
+    return User(**USER_DOC)
+
+
+def test_registry_lookup(bench):
+    names = tool_registry.list_tools() * 20
+
+    def lookup():
+        return [tool_registry.get_tool(name) for name in names]
+
+    assert all(bench(lookup))
+
+
+def test_registry_list_tools(bench):
+    def list_tools():
+        return [tool_registry.list_tools() for _ in range(20)]
+
+    assert "createPage" in bench(list_tools)[0]
+
+
+def test_create_page_tool_execute(bench, null_db, prerendered, user):
+    result = bench.run_async(CreatePageTool().execute, CREATE_PAGE_ARGS, user)
+    assert "page_id" in result
+
+
+def test_dispatch_tool(bench, null_db, prerendered, user):
+    call = ToolCall(tool="createPage", args=CREATE_PAGE_ARGS)
+    response = bench.run_async(api_routes.dispatch_tool, call, user)
+    assert response.success is True
+
+
+def test_render_content(bench):
+    html = bench(render_content, PAGE_DOC["content"])
+    assert html.startswith("<p>")
+
+
+def test_signature(bench):
+    sig = bench(signature, PAGE_DOC["content"])
+    assert sig is not None
+
+
+def test_page_construction(bench):
+    assert bench(Page, **PAGE_DOC).id == PAGE_DOC["id"]
+
+
+def test_article_construction(bench):
+    assert bench(Article, **ARTICLE_DOC).tags == ARTICLE_DOC["tags"]
+
+
+def test_user_construction(bench):
+    assert bench(User, **USER_DOC).email == USER_DOC["email"]
+
+
+def test_page_dict(bench):
+    page = Page(**PAGE_DOC)
+    assert bench(page.dict)["slug"] == PAGE_DOC["slug"]
+
+
+def test_article_dict(bench):
+    article = Article(**ARTICLE_DOC)
+    assert bench(article.dict)["tags"] == ARTICLE_DOC["tags"]
+
+
+def test_user_dict(bench):
+    user = User(**USER_DOC)
+    assert bench(user.dict)["role"] == USER_DOC["role"]
+
+
+def test_slugify(bench):
+    def run():
+        return [slugify(title) for title in TITLES]
+
+    assert bench(run)[0] == "paragraph-0-absatz-0-der-satzung-über-gebühren"
+
+
+def test_page_list_response_encoding(bench):
+    pages = [Page(**doc) for doc in PAGE_LIST]
+
+    def encode():
+        return JSONResponse(jsonable_encoder(pages)).body
+
+    assert bench(encode).startswith(b"[")
+
+
+def test_tool_response_encoding(bench):
+    response = ToolResponse(success=True, data={"page_id": "p1", "message": "ok"})
+
+    def encode():
+        return JSONResponse(jsonable_encoder(response)).body
+
+    assert b'"success":true' in bench(encode)
@@ -0,0 +1,124 @@
+"""Storage benchmark for the delta-compressed revision history.
+
+Builds a synthetic statute of roughly 200 KB, applies a series of small
+paragraph edits and compares the BSON size of full copies per version with
+the stored snapshots and deltas. Also reports how long reconstructing the
+newest version takes::
+
+    python -m benchmarks.revisions --edits 200 --output revisions.json
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import bson
+
+from backend.services.revisions import (
+    apply_delta,
+    build_revision,
+    decode_snapshot,
+    snapshot_interval,
+)
+
+WORDS = (
+    "Behörde Antrag Frist Bescheid Verwaltungsakt Zuständigkeit Landesrecht "
+    "Verordnung Anhörung Widerspruch Gebühr Ermessen Absatz Satz Nummer"
+).split()
+
+
+def make_statute(rng: random.Random, size: int) -> List[str]:
+    paragraphs = []
+    total = 0
+    number = 1
+    while total < size:
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 90)))
+        line = f"§ {number} ({rng.randint(1, 5)}) {text}.\n"
+        paragraphs.append(line)
+        total += len(line.encode("utf-8"))
+        number += 1
+    return paragraphs
+
+
+def edit(rng: random.Random, paragraphs: List[str]) -> List[str]:
+    paragraphs = list(paragraphs)
+    for _ in range(rng.randint(1, 3)):
+        index = rng.randrange(len(paragraphs))
+        words = paragraphs[index].rstrip(".\n").split(" ")
+        words[rng.randrange(2, len(words))] = rng.choice(WORDS)
+        paragraphs[index] = " ".join(words) + ".\n"
+    return paragraphs
+
+
+def reconstruct(chain: List[Dict[str, Any]]) -> str:
+    content = ""
+    for revision in chain:
+        if revision["kind"] == "snapshot":
+            content = decode_snapshot(revision["data"])
+        else:
+            content = apply_delta(content, revision["delta"])
+    return content
+
+
+def run_benchmark(edits: int, size: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    paragraphs = make_statute(rng, size)
+    doc = {"id": "law", "title": "Gesetz", "content": "".join(paragraphs)}
+    doc["version"] = 1
+    revisions = [build_revision("pages", doc, None, None, "bench")]
+    full_bytes = len(bson.encode({**doc, "created_at": revisions[0]["created_at"]}))
+    versions = [doc["content"]]
+
+    for _ in range(edits):
+        paragraphs = edit(rng, paragraphs)
+        after = {**doc, "content": "".join(paragraphs), "version": doc["version"] + 1}
+        revision = build_revision(
+            "pages", after, doc, revisions[-1]["snapshot_version"], "bench"
+        )
+        revisions.append(revision)
+        full_bytes += len(bson.encode({**after, "created_at": revision["created_at"]}))
+        versions.append(after["content"])
+        doc = after
+
+    stored_bytes = sum(len(bson.encode(revision)) for revision in revisions)
+    last = revisions[-1]
+    chain = [r for r in revisions if r["version"] >= last["snapshot_version"]]
+    started = time.perf_counter()
+    rounds = 20
+    for _ in range(rounds):
+        content = reconstruct(chain)
+    reconstruct_ms = (time.perf_counter() - started) / rounds * 1000
+    assert content == versions[-1]
+
+    return {
+        "document_bytes": len(versions[-1].encode("utf-8")),
+        "versions": len(revisions),
+        "snapshot_interval": snapshot_interval(),
+        "snapshots": sum(r["kind"] == "snapshot" for r in revisions),
+        "full_copy_bytes": full_bytes,
+        "stored_bytes": stored_bytes,
+        "savings_ratio": round(full_bytes / stored_bytes, 2),
+        "reconstruct_latest_ms": round(reconstruct_ms, 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument("--size", type=int, default=200_000, help="Bytes per law")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    output = json.dumps(run_benchmark(args.edits, args.size, args.seed), indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
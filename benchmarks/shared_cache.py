@@ -0,0 +1,164 @@
+"""Benchmark for the shared-memory cache against per-process dict caches.
+
+Measures single-process get/set latency of ``LocalCache`` and
+``SharedMemoryCache``, then runs several worker processes that read keys
+with a Zipf-like popularity. Every miss counts as a database fetch followed
+by a ``set``. Both variants get the same memory per host (``--slots``
+entries): per-process caches split it between the workers, each of which
+fetches and stores every hot key itself; the shared cache holds one copy
+and one fetch serves all workers on the host::
+
+    python -m benchmarks.shared_cache --workers 8 --output shared_cache.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from backend.services.cache import LocalCache, SharedMemoryCache
+
+SLOT_BYTES = 2048
+VALUE = b"x" * 1024
+
+
+def _latency(cache: Any, operations: int) -> Dict[str, float]:
+    keys = [f"pages:{number}" for number in range(operations)]
+    started = time.perf_counter()
+    for key in keys:
+        cache.set(key, VALUE, 60)
+    set_us = (time.perf_counter() - started) / operations * 1e6
+    started = time.perf_counter()
+    for key in keys:
+        cache.get(key)
+    hit_us = (time.perf_counter() - started) / operations * 1e6
+    started = time.perf_counter()
+    for key in keys:
+        cache.get(key + ":missing")
+    miss_us = (time.perf_counter() - started) / operations * 1e6
+    return {
+        "set_us": round(set_us, 2),
+        "get_hit_us": round(hit_us, 2),
+        "get_miss_us": round(miss_us, 2),
+    }
+
+
+def _zipf_keys(rng: random.Random, keys: int, requests: int, skew: float) -> List[str]:
+    weights = [1 / (rank + 1) ** skew for rank in range(keys)]
+    return [f"pages:{n}" for n in rng.choices(range(keys), weights, k=requests)]
+
+
+def _worker(
+    mode: str,
+    path: str,
+    slots: int,
+    keys: int,
+    requests: int,
+    skew: float,
+    seed: int,
+    results: Any,
+) -> None:
+    if mode == "shared":
+        cache: Any = SharedMemoryCache(Path(path), slots, SLOT_BYTES)
+    else:
+        cache = LocalCache(slots, SLOT_BYTES)
+    stream = _zipf_keys(random.Random(seed), keys, requests, skew)
+    fetches = 0
+    started = time.perf_counter()
+    for key in stream:
+        if cache.get(key) is None:
+            fetches += 1
+            cache.set(key, VALUE, 300)
+    results.put((fetches, time.perf_counter() - started))
+
+
+def _workload(
+    mode: str, workers: int, slots: int, keys: int, requests: int, skew: float
+) -> Dict[str, Any]:
+    path = Path(tempfile.mkdtemp()) / "benchmark.cache"
+    if mode == "local":
+        slots //= workers
+    else:
+        # Created once up front, as the first worker of a server would
+        SharedMemoryCache(path, slots, SLOT_BYTES).close()
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=_worker,
+            args=(mode, str(path), slots, keys, requests, skew, seed, results),
+        )
+        for seed in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    if path.exists():
+        os.unlink(path)
+    os.rmdir(path.parent)
+
+    fetches = sum(outcome[0] for outcome in outcomes)
+    elapsed = max(outcome[1] for outcome in outcomes)
+    return {
+        "entries_per_cache": slots,
+        "database_fetches": fetches,
+        "hit_rate": round(1 - fetches / (workers * requests), 4),
+        "requests_per_second": round(workers * requests / elapsed),
+    }
+
+
+def run_benchmark(
+    workers: int, slots: int, keys: int, requests: int, skew: float
+) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        shared = SharedMemoryCache(Path(directory) / "latency.cache", 65536, SLOT_BYTES)
+        latency = {
+            "local": _latency(LocalCache(65536, SLOT_BYTES), 20_000),
+            "shared": _latency(shared, 20_000),
+        }
+        shared.close()
+    return {
+        "workers": workers,
+        "slots": slots,
+        "cache_memory_mb": round(slots * SLOT_BYTES / 2**20, 1),
+        "keys": keys,
+        "requests_per_worker": requests,
+        "zipf_skew": skew,
+        "latency": latency,
+        "workload": {
+            mode: _workload(mode, workers, slots, keys, requests, skew)
+            for mode in ("local", "shared")
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--slots", type=int, default=4096, help="Entries per host")
+    parser.add_argument("--keys", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=50_000, help="Per worker")
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        args.workers, args.slots, args.keys, args.requests, args.skew
+    )
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
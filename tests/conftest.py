@@ -4,6 +4,7 @@ from unittest.mock import AsyncMock
 
 import pytest
 from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
 
 # Ensure environment variables so server initializes
 os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
@@ -11,21 +12,59 @@ os.environ.setdefault("DB_NAME", "testdb")
 os.environ.setdefault("FIREBASE_SERVICE_ACCOUNT", "{}")
 os.environ.setdefault("ALLOWED_ORIGINS", "http://testserver")
 
-from backend.models import UserRole  # noqa: E402
+from backend.models import User, UserRole  # noqa: E402
 from backend.server import app  # noqa: E402
 from backend.services import db as db_module  # noqa: E402
 
 
+def matches(doc, query):
+    def match(value, condition):
+        if isinstance(condition, dict) and "$ne" in condition:
+            return value != condition["$ne"]
+        return value == condition
+
+    return all(match(doc.get(key), value) for key, value in query.items())
+
+
+def project(doc, projection):
+    """Apply the projections used by the app, including ``$substrCP``."""
+    if not projection:
+        return doc
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    computed = {k: v for k, v in fields.items() if isinstance(v, dict)}
+    plain = {k: v for k, v in fields.items() if k not in computed}
+    if plain and not any(plain.values()):
+        result = {k: v for k, v in doc.items() if k not in plain}
+    else:
+        result = {k: doc[k] for k in plain if k in doc}
+    for name, expression in computed.items():
+        source, start, length = expression["$substrCP"]
+        result[name] = doc[source[1:]][start : start + length]
+    return result
+
+
 class FakeCollection:
     def __init__(self):
         self.storage = {}
 
-    async def find_one(self, query):
+    async def find_one(self, query, projection=None):
         if "firebase_uid" in query:
-            return self.storage.get(query["firebase_uid"])
-        if "id" in query:
-            return self.storage.get(query["id"])
-        return None
+            doc = self.storage.get(query["firebase_uid"])
+        elif "id" in query:
+            doc = self.storage.get(query["id"])
+        else:
+            return None
+        return project(doc, projection) if doc and matches(doc, query) else None
+
+    async def find_one_and_update(self, query, update, return_document=False):
+        doc = await self.find_one(query)
+        if not doc:
+            return None
+        before = dict(doc)
+        doc.update(update.get("$set", {}))
+        for key, amount in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + amount
+        return dict(doc) if return_document else before
 
     async def insert_one(self, doc):
         key = doc.get("firebase_uid") or doc.get("id")
@@ -50,6 +89,13 @@ class FakeCollection:
             return AsyncMock(deleted_count=1)
         return AsyncMock(deleted_count=0)
 
+    async def find_one_and_delete(self, query, projection=None):
+        doc = await self.find_one(query)
+        if not doc:
+            return None
+        await self.delete_one(query)
+        return project(doc, projection)
+
     def find(self):
         class Cursor:
             def __init__(self, docs):
@@ -67,6 +113,11 @@ class FakeDB:
         self.pages = FakeCollection()
         self.articles = FakeCollection()
         self.categories = FakeCollection()
+        # Revision history needs real query semantics (ranges, sorting)
+        self.revisions = AsyncMongoMockClient()["testdb"].revisions
+        self.fingerprints = AsyncMongoMockClient()["testdb"].fingerprints
+        self.idempotency_keys = AsyncMongoMockClient()["testdb"].idempotency_keys
+        self.facet_counts = AsyncMongoMockClient()["testdb"].facet_counts
 
 
 @pytest.fixture(autouse=True)
@@ -75,10 +126,23 @@ def fake_db(monkeypatch):
     monkeypatch.setattr(db_module, "db", db)
     from backend import auth
     from backend.routes import api as api_routes
+    from backend.services import content, duplicates, facets, idempotency, revisions
+    from backend.services.cache import reset_cache
+    from backend.services.sitemap import sitemap_cache
+    from backend.services.tool_cache import tool_result_cache
 
     monkeypatch.setattr(auth, "db", db)
     monkeypatch.setattr(api_routes, "db", db)
+    monkeypatch.setattr(content, "db", db)
+    monkeypatch.setattr(revisions, "db", db)
+    monkeypatch.setattr(duplicates, "db", db)
+    monkeypatch.setattr(idempotency, "db", db)
+    monkeypatch.setattr(facets, "db", db)
+    tool_result_cache.invalidate()
+    sitemap_cache.clear()
+    reset_cache()
     yield db
+    reset_cache()
 
 
 @pytest.fixture
@@ -110,3 +174,34 @@ def seed_user(fake_db):
     }
     fake_db.users.storage[user_doc["firebase_uid"]] = user_doc
     return user_doc
+
+
+@pytest.fixture
+def make_user():
+    """Build a ``User`` with ``role`` for tests that bypass authentication."""
+
+    def make(role=UserRole.EDITOR):
+        return User(
+            id="u1",
+            firebase_uid="f1",
+            email="a@example.com",
+            name="User",
+            role=role,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        )
+
+    return make
+
+
+@pytest.fixture
+def mock_mongo(monkeypatch):
+    """Point ``db`` of each given module at one fresh mongomock database."""
+
+    def patch(*modules):
+        database = AsyncMongoMockClient()["testdb"]
+        for module in modules:
+            monkeypatch.setattr(module, "db", database)
+        return database
+
+    return patch
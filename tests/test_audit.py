@@ -0,0 +1,219 @@
+import asyncio
+import os
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+from backend.models import ToolCall, ToolResponse, UserRole
+from backend.services import audit, mcp
+from backend.services.audit import AuditLog, args_digest, audit_entry
+
+
+class DownCollection:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def insert_many(self, entries, ordered=True):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        raise AutoReconnect("primary unavailable")
+
+
+class DownDatabase:
+    def __init__(self, delay=0.0):
+        self.audit_log = DownCollection(delay)
+
+
+@pytest.fixture
+def database(mock_mongo, monkeypatch, tmp_path):
+    monkeypatch.setenv("AUDIT_SPILL_PATH", str(tmp_path / "spill.jsonl"))
+    return mock_mongo(audit)
+
+
+def _entry(user, tool="listPages"):
+    return audit_entry(
+        ToolCall(tool=tool, args={}), user, ToolResponse(success=True), 0.001
+    )
+
+
+def test_args_digest_ignores_key_order():
+    assert args_digest({"a": 1, "b": [1, 2]}) == args_digest({"b": [1, 2], "a": 1})
+    assert args_digest({"a": 1}) != args_digest({"a": 2})
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_are_recorded_in_batches(database, monkeypatch, make_user):
+    user = make_user(UserRole.EDITOR)
+    monkeypatch.setenv("AUDIT_BATCH_SIZE", "2")
+    monkeypatch.setenv("AUDIT_FLUSH_SECONDS", "60")
+    log = AuditLog()
+    monkeypatch.setattr(mcp, "audit_log", log)
+    log.start()
+    try:
+        call = ToolCall(tool="noSuchTool", args={"slug": "impressum"})
+        response = await mcp.execute_tool_call(call, user)
+        assert not response.success
+        # Below the batch size nothing is written yet
+        await asyncio.sleep(0.01)
+        assert await database.audit_log.count_documents({}) == 0
+        await mcp.execute_tool_call(call, user)
+        await asyncio.sleep(0.01)
+        assert await database.audit_log.count_documents({}) == 2
+        await mcp.execute_tool_call(call, user)
+    finally:
+        await log.stop()
+
+    entries = await database.audit_log.find().to_list(None)
+    assert len(entries) == 3
+    entry = entries[0]
+    assert (entry["user_id"], entry["role"], entry["tool"]) == (
+        "u1",
+        "editor",
+        "noSuchTool",
+    )
+    assert entry["args_sha256"] == args_digest({"slug": "impressum"})
+    assert entry["success"] is False and entry["error"]
+    assert entry["duration_ms"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_failed_writes_spill_and_replay(
+    database, monkeypatch, tmp_path, make_user
+):
+    user = make_user(UserRole.EDITOR)
+    log = AuditLog()
+    log.start()
+    try:
+        monkeypatch.setattr(audit, "db", DownDatabase())
+        entries = [_entry(user) for _ in range(3)]
+        for entry in entries:
+            log.record(entry)
+        assert await log.flush() == 0
+        assert log.spilled == 3
+        assert len((tmp_path / "spill.jsonl").read_text().splitlines()) == 3
+
+        # The next successful write moves the spilled entries over; one of
+        # them already reached the database and is not stored twice
+        monkeypatch.setattr(audit, "db", database)
+        await database.audit_log.insert_one(dict(entries[0]))
+        log.record(_entry(user))
+        assert await log.flush() == 1
+    finally:
+        await log.stop()
+    assert log.replayed == 3
+    assert await database.audit_log.count_documents({}) == 4
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_backlog_spills_while_database_is_slow(
+    database, monkeypatch, tmp_path, make_user
+):
+    user = make_user(UserRole.EDITOR)
+    monkeypatch.setenv("AUDIT_BATCH_SIZE", "2")
+    monkeypatch.setenv("AUDIT_MAX_BUFFER", "3")
+    slow = DownDatabase(delay=0.1)
+    monkeypatch.setattr(audit, "db", slow)
+    log = AuditLog()
+    log.start()
+    try:
+        log.record(_entry(user))
+        log.record(_entry(user))
+        await asyncio.sleep(0.01)
+        # Recording never blocks; the buffer goes to disk instead of growing
+        for _ in range(3):
+            log.record(_entry(user))
+        await asyncio.sleep(0.01)
+        assert log.spilled == 3 and not log._buffer
+        monkeypatch.setattr(audit, "db", database)
+    finally:
+        await log.stop()
+    # Shutdown interrupts the slow write and drains everything once the
+    # database answers again
+    assert slow.audit_log.calls == 1
+    assert await database.audit_log.count_documents({}) == 5
+    assert log.replayed == 3
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_raising_and_cancelled_calls_are_recorded(
+    database, monkeypatch, make_user
+):
+    user = make_user(UserRole.EDITOR)
+    started = asyncio.Event()
+
+    async def fake_execute(tool_call, user):
+        if tool_call.tool == "broken":
+            raise RuntimeError("boom")
+        started.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(mcp, "_execute", fake_execute)
+    log = AuditLog()
+    monkeypatch.setattr(mcp, "audit_log", log)
+    log.start()
+    try:
+        with pytest.raises(RuntimeError):
+            await mcp.execute_tool_call(ToolCall(tool="broken", args={}), user)
+        task = asyncio.create_task(
+            mcp.execute_tool_call(ToolCall(tool="slow", args={}), user)
+        )
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    finally:
+        await log.stop()
+
+    entries = await database.audit_log.find().to_list(None)
+    outcomes = {entry["tool"]: entry["outcome"] for entry in entries}
+    assert outcomes == {"broken": "exception", "slow": "cancelled"}
+    assert not any(entry["success"] for entry in entries)
+
+
+def test_append_after_claim_goes_to_a_new_file(tmp_path, make_user):
+    user = make_user(UserRole.EDITOR)
+    path = tmp_path / "spill.jsonl"
+    claimed = tmp_path / "claimed.jsonl"
+    audit._append_lines(path, [_entry(user, "first")])
+    # A writer that opened the file before the claim must not follow it
+    stale = open(path, "a", encoding="utf-8")
+    try:
+        assert audit._claim(path, claimed)
+        with audit._locked_spill(path, "a") as handle:
+            handle.write("{}\n")
+            assert os.fstat(handle.fileno()).st_ino != os.fstat(stale.fileno()).st_ino
+    finally:
+        stale.close()
+
+    assert [entry["tool"] for entry in audit._read_lines(claimed)] == ["first"]
+    assert path.read_text() == "{}\n"
+    assert not audit._claim(tmp_path / "missing.jsonl", claimed)
+
+
+@pytest.mark.asyncio
+async def test_entries_recorded_after_stop_are_spilled(database, tmp_path, make_user):
+    user = make_user(UserRole.EDITOR)
+    log = AuditLog()
+    assert not log.recording
+    log.start()
+    await log.stop()
+    # A call still finishing after shutdown of the audit log
+    assert log.recording
+    log.record(_entry(user, "late"))
+    assert log.spilled == 1
+
+    restarted = AuditLog()
+    restarted.start()
+    try:
+        restarted.record(_entry(user))
+        await restarted.flush()
+    finally:
+        await restarted.stop()
+    tools = sorted(
+        entry["tool"] for entry in await database.audit_log.find().to_list(None)
+    )
+    assert tools == ["late", "listPages"]
+    assert list(tmp_path.iterdir()) == []
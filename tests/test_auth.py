@@ -63,3 +63,26 @@ def test_register_user_requires_admin(client, fake_db, monkeypatch):
     assert response.status_code == 403
     data = response.json()
     assert data["error"]["message"] == "Insufficient permissions"
+
+
+def test_role_change_applies_on_next_request(
+    client, mock_firebase, seed_user, monkeypatch
+):
+    import asyncio
+
+    from backend.services.events import change_to_event, event_bus
+
+    monkeypatch.setenv("CACHE_BACKEND", "local")
+    headers = {"Authorization": "Bearer faketoken"}
+    assert client.get("/api/auth/me", headers=headers).json()["role"] == "admin"
+    seed_user["role"] = UserRole.VIEWER.value
+    # Served from the cache until the change reaches this worker
+    assert client.get("/api/auth/me", headers=headers).json()["role"] == "admin"
+
+    change = {
+        "ns": {"coll": "users"},
+        "operationType": "update",
+        "fullDocument": {"id": seed_user["id"], "firebase_uid": "testuid"},
+    }
+    asyncio.run(event_bus.publish(change_to_event(change)))
+    assert client.get("/api/auth/me", headers=headers).json()["role"] == "viewer"
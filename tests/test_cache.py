@@ -0,0 +1,168 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from backend.services.cache import (
+    WAYS,
+    CacheBackend,
+    LocalCache,
+    SharedMemoryCache,
+    get_cache,
+)
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+HEADERS = {"Authorization": "Bearer faketoken"}
+
+
+@pytest.fixture
+def shared(tmp_path):
+    cache = SharedMemoryCache(tmp_path / "test.cache", 64, 256)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def shared_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_BACKEND", "shared")
+    monkeypatch.setenv("CACHE_PATH", str(tmp_path / "app.cache"))
+    monkeypatch.setenv("CACHE_SLOTS", "64")
+    return get_cache()
+
+
+def test_shared_cache_set_get_delete(shared):
+    assert shared.get("a") is None
+    assert shared.set("a", b"one", 60)
+    assert shared.set("a", b"two", 60)
+    assert shared.get("a") == b"two"
+    shared.delete("a")
+    assert shared.get("a") is None
+    assert (shared.hits, shared.misses) == (1, 2)
+
+    assert shared.set_json("doc", {"id": "p1", "tags": ["x"]}, 60)
+    assert shared.get_json("doc") == {"id": "p1", "tags": ["x"]}
+    shared.clear()
+    assert shared.get_json("doc") is None
+
+
+def test_shared_cache_expiry_and_size_limit(shared):
+    shared.set("short", b"value", 0.01)
+    time.sleep(0.02)
+    assert shared.get("short") is None
+    assert not shared.set("big", b"x" * shared.max_value, 60)
+    assert shared.get("big") is None
+
+
+def test_shared_cache_evicts_least_recently_read(shared):
+    # A single set, so every key competes for the same WAYS slots
+    cache = SharedMemoryCache(shared.path.with_name("one-set.cache"), WAYS, 256)
+    for number in range(WAYS):
+        cache.set(f"key{number}", b"v", 60)
+    for number in range(1, WAYS):
+        assert cache.get(f"key{number}") == b"v"
+    cache.set("new", b"v", 60)
+    assert cache.get("key0") is None
+    assert all(cache.get(f"key{number}") == b"v" for number in range(1, WAYS))
+    assert cache.get("new") == b"v"
+    cache.close()
+
+
+def test_shared_cache_is_visible_across_processes(shared):
+    shared.set("from-parent", b"hello", 60)
+    script = (
+        "import sys; from backend.services.cache import SharedMemoryCache; "
+        "cache = SharedMemoryCache(sys.argv[1], 64, 256); "
+        "print(cache.get('from-parent').decode()); "
+        "cache.set('from-child', b'world', 60)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script, str(shared.path)],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "hello"
+    assert shared.get("from-child") == b"world"
+
+
+def test_local_cache_is_bounded():
+    cache = LocalCache(2, 256)
+    for key in ("a", "b", "c"):
+        cache.set(key, b"v", 60)
+    assert cache.get("a") is None
+    assert cache.get("c") == b"v"
+
+
+def test_shared_cache_refuses_foreign_files(tmp_path):
+    target = tmp_path / "target.cache"
+    target.write_bytes(b"")
+    link = tmp_path / "link.cache"
+    link.symlink_to(target)
+    with pytest.raises(OSError):
+        SharedMemoryCache(link, 64, 256)
+
+    # Readable or writable by others, as a file planted in /dev/shm would be
+    planted = tmp_path / "planted.cache"
+    planted.write_bytes(b"")
+    planted.chmod(0o666)
+    with pytest.raises(OSError):
+        SharedMemoryCache(planted, 64, 256)
+
+
+def test_cache_is_disabled_by_default():
+    cache = get_cache()
+    assert type(cache) is CacheBackend
+    assert not cache.set("a", b"v", 60)
+    assert cache.get("a") is None
+
+
+def test_token_and_user_are_cached(
+    client, shared_backend, seed_user, fake_db, monkeypatch
+):
+    from firebase_admin import auth as firebase_auth
+
+    calls = []
+
+    def fake_verify(token):
+        calls.append(token)
+        return {"uid": "testuid", "exp": time.time() + 3600}
+
+    monkeypatch.setattr(firebase_auth, "verify_id_token", fake_verify)
+    for _ in range(3):
+        response = client.get("/api/auth/me", headers=HEADERS)
+        assert response.status_code == 200
+        assert response.json()["id"] == seed_user["id"]
+    assert calls == ["faketoken"]
+
+    # Later requests no longer need the database either
+    fake_db.users.storage.clear()
+    assert client.get("/api/auth/me", headers=HEADERS).status_code == 200
+
+
+def test_content_reads_are_cached_until_updated(
+    client, shared_backend, mock_firebase, seed_user, fake_db
+):
+    response = client.post("/api/pages", json={"title": "Home"}, headers=HEADERS)
+    page_id = response.json()["id"]
+    assert client.get(f"/api/pages/{page_id}", headers=HEADERS).status_code == 200
+    assert shared_backend.get_json(f"pages:{page_id}")["title"] == "Home"
+
+    fake_db.pages.storage[page_id]["title"] = "Changed behind the cache"
+    cached = client.get(f"/api/pages/{page_id}", headers=HEADERS).json()
+    assert cached["title"] == "Home"
+    assert cached["created_at"] == response.json()["created_at"]
+
+    client.put(f"/api/pages/{page_id}", json={"title": "About"}, headers=HEADERS)
+    assert shared_backend.get_json(f"pages:{page_id}") is None
+    fresh = client.get(f"/api/pages/{page_id}", headers=HEADERS).json()
+    assert fresh["title"] == "About"
+
+    # Documents too large for a slot are not even serialised
+    large = client.post(
+        "/api/pages", json={"title": "Satzung", "content": "x" * 8192}, headers=HEADERS
+    ).json()
+    assert client.get(f"/api/pages/{large['id']}", headers=HEADERS).status_code == 200
+    assert shared_backend.get_json(f"pages:{large['id']}") is None
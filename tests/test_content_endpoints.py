@@ -234,3 +234,87 @@ def test_create_article_denied_for_viewer(client, fake_db, monkeypatch):
     assert response.status_code == 403
     data = response.json()
     assert data["error"]["message"] == "Insufficient permissions"
+
+
+def test_update_page_increments_version(client, fake_db, mock_firebase, seed_user):
+    page_doc = {
+        "id": "page3",
+        "title": "Old",
+        "slug": "old",
+        "content": "c",
+        "author_id": seed_user["id"],
+        "status": "draft",
+        "version": 3,
+        "created_at": datetime.datetime.utcnow(),
+        "updated_at": datetime.datetime.utcnow(),
+    }
+    fake_db.pages.storage[page_doc["id"]] = page_doc
+
+    headers = {"Authorization": "Bearer faketoken"}
+    response = client.put(
+        f"/api/pages/{page_doc['id']}",
+        json={"content": "new", "version": 3},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["version"] == 4
+    assert data["content"] == "new"
+    assert data["slug"] == "old"
+
+
+def test_update_page_with_stale_version_conflicts(
+    client, fake_db, mock_firebase, seed_user
+):
+    page_doc = {
+        "id": "page4",
+        "title": "Old",
+        "slug": "old",
+        "content": "c",
+        "author_id": seed_user["id"],
+        "status": "draft",
+        "version": 5,
+        "created_at": datetime.datetime.utcnow(),
+        "updated_at": datetime.datetime.utcnow(),
+    }
+    fake_db.pages.storage[page_doc["id"]] = page_doc
+
+    headers = {"Authorization": "Bearer faketoken"}
+    response = client.put(
+        f"/api/pages/{page_doc['id']}",
+        json={"content": "lost update", "version": 4},
+        headers=headers,
+    )
+    assert response.status_code == 409
+    error = response.json()["error"]
+    assert error["code"] == "version_conflict"
+    assert error["current_version"] == 5
+    assert fake_db.pages.storage[page_doc["id"]]["content"] == "c"
+
+
+def test_update_page_tool_reports_conflict(client, fake_db, mock_firebase, seed_user):
+    page_doc = {
+        "id": "page5",
+        "title": "Old",
+        "slug": "old",
+        "content": "c",
+        "author_id": seed_user["id"],
+        "status": "draft",
+        "version": 2,
+        "created_at": datetime.datetime.utcnow(),
+        "updated_at": datetime.datetime.utcnow(),
+    }
+    fake_db.pages.storage[page_doc["id"]] = page_doc
+
+    headers = {"Authorization": "Bearer faketoken"}
+    payload = {
+        "tool": "updatePage",
+        "args": {"page_id": "page5", "content": "agent edit", "version": 2},
+    }
+    response = client.post("/api/mcp/dispatch", json=payload, headers=headers)
+    assert response.json()["data"]["version"] == 3
+
+    response = client.post("/api/mcp/dispatch", json=payload, headers=headers)
+    data = response.json()
+    assert data["success"] is False
+    assert data["error"] == "Tool execution failed (version_conflict)"
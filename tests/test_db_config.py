@@ -0,0 +1,60 @@
+from unittest.mock import MagicMock
+
+import pytest
+from pymongo.read_preferences import SecondaryPreferred
+
+from backend.services import db as db_module
+
+
+def test_client_options_from_environment(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "50")
+    monkeypatch.setenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zstd,zlib")
+
+    options = db_module.client_options()
+
+    assert options == {
+        "maxPoolSize": 50,
+        "serverSelectionTimeoutMS": 2000,
+        "compressors": "zstd,zlib",
+    }
+
+
+def test_client_options_rejects_invalid_numbers(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "many")
+    with pytest.raises(RuntimeError):
+        db_module.client_options()
+
+
+def test_listing_reads_default_to_primary(monkeypatch):
+    monkeypatch.delenv("MONGO_LIST_READ_PREFERENCE", raising=False)
+    assert db_module.listing_read_preference() is None
+
+
+def test_listing_reads_use_bounded_staleness(monkeypatch):
+    monkeypatch.setenv("MONGO_LIST_READ_PREFERENCE", "secondaryPreferred")
+    monkeypatch.setenv("MONGO_MAX_STALENESS_SECONDS", "120")
+
+    preference = db_module.listing_read_preference()
+
+    assert isinstance(preference, SecondaryPreferred)
+    assert preference.max_staleness == 120
+
+
+def test_listing_reads_reject_too_small_staleness(monkeypatch):
+    monkeypatch.setenv("MONGO_LIST_READ_PREFERENCE", "secondaryPreferred")
+    monkeypatch.setenv("MONGO_MAX_STALENESS_SECONDS", "10")
+    with pytest.raises(RuntimeError):
+        db_module.listing_read_preference()
+
+
+def test_read_collection_routes_listing_reads(monkeypatch):
+    preference = SecondaryPreferred(max_staleness=90)
+    pages = MagicMock()
+    monkeypatch.setattr(db_module, "db", MagicMock(pages=pages))
+    monkeypatch.setattr(db_module, "_listing_read_preference", preference)
+
+    collection = db_module.read_collection("pages")
+
+    pages.with_options.assert_called_once_with(read_preference=preference)
+    assert collection is pages.with_options.return_value
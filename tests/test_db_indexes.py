@@ -27,3 +27,17 @@ async def test_ensure_indexes(monkeypatch):
 
     articles.create_index.assert_any_call("id", unique=True)
     articles.create_index.assert_any_call("slug")
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_drops_unique_media_hash(monkeypatch):
+    from mongomock_motor import AsyncMongoMockClient
+
+    database = AsyncMongoMockClient()["indextest"]
+    await database.media.create_index("sha256", unique=True)
+    monkeypatch.setattr(db_module, "db", database)
+
+    await db_module.ensure_indexes()
+
+    indexes = await database.media.index_information()
+    assert not indexes["sha256_1"].get("unique")
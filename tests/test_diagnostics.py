@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.diagnostics import LoopLagMonitor
+
+
+def blocking_call():
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_reports_blocking_stack():
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.1, log_interval=0)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        blocking_call()
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    stats = monitor.stats()
+    assert stats["blocking_events"] == 1
+    assert stats["max_lag_ms"] >= 250
+    event = stats["recent_events"][0]
+    assert any("blocking_call" in line for line in event["stack"])
+
+
+def test_loop_diagnostics_endpoint(client, mock_firebase, seed_user):
+    headers = {"Authorization": "Bearer faketoken"}
+    response = client.get("/api/diagnostics/loop", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["enabled"] is False
+    assert "p99_lag_ms" in data
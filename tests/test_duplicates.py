@@ -0,0 +1,88 @@
+from backend.services.duplicates import band_keys, signature, similarity
+
+HEADERS = {"Authorization": "Bearer faketoken"}
+ORDINANCE = (
+    "Die Gemeinde erhebt für die Benutzung der öffentlichen Einrichtungen "
+    "Gebühren nach Maßgabe dieser Satzung. Gebührenpflichtig ist, wer die "
+    "Einrichtung in Anspruch nimmt oder den Antrag auf Benutzung stellt. "
+    "Die Gebühr entsteht mit der Inanspruchnahme und wird einen Monat nach "
+    "Bekanntgabe des Bescheides fällig."
+)
+EDITED = ORDINANCE.replace("fällig", "zahlbar")
+UNRELATED = (
+    "Der Wochenmarkt findet jeden Samstag auf dem Rathausplatz statt. "
+    "Standplätze werden durch das Ordnungsamt vergeben und sind bis zum "
+    "Donnerstag der Vorwoche zu beantragen."
+)
+
+
+def create(client, content, title="Satzung"):
+    return client.post(
+        "/api/pages", json={"title": title, "content": content}, headers=HEADERS
+    )
+
+
+def test_signatures_estimate_similarity():
+    original, edited, other = (signature(t) for t in (ORDINANCE, EDITED, UNRELATED))
+    assert similarity(original, edited) > 0.8
+    assert similarity(original, other) < 0.2
+    assert len(set(band_keys(original)) & set(band_keys(edited))) > 0
+    assert signature("Zu kurz") is None
+
+
+def test_create_warns_or_rejects_near_duplicates(
+    client, mock_firebase, seed_user, fake_db, monkeypatch
+):
+    first = create(client, ORDINANCE).json()
+    assert "x-possible-duplicates" not in create(client, UNRELATED).headers
+
+    warned = create(client, EDITED)
+    assert warned.status_code == 200
+    assert warned.headers["X-Possible-Duplicates"] == first["id"]
+    assert "possible_duplicates" not in fake_db.pages.storage[warned.json()["id"]]
+
+    monkeypatch.setenv("DUPLICATE_MODE", "reject")
+    rejected = create(client, ORDINANCE + " Sie ist sofort fällig.")
+    assert rejected.status_code == 409
+    error = rejected.json()["error"]
+    assert error["code"] == "duplicate_content"
+    assert {match["id"] for match in error["duplicates"]} == {
+        first["id"],
+        warned.json()["id"],
+    }
+
+    monkeypatch.setenv("DUPLICATE_MODE", "off")
+    assert create(client, ORDINANCE).status_code == 200
+
+
+def test_find_duplicates_tool(client, mock_firebase, seed_user, fake_db):
+    def dispatch(args):
+        return client.post(
+            "/api/mcp/dispatch",
+            json={"tool": "findDuplicates", "args": args},
+            headers=HEADERS,
+        ).json()
+
+    first = create(client, ORDINANCE).json()
+    second = create(client, EDITED).json()
+
+    found = dispatch({"id": first["id"]})["data"]["duplicates"]
+    assert [match["id"] for match in found] == [second["id"]]
+    assert found[0]["similarity"] > 0.8
+
+    drafted = dispatch({"content": EDITED, "threshold": 0.95})["data"]
+    assert [match["id"] for match in drafted["duplicates"]] == [second["id"]]
+    for bad in ({"threshold": "0.9"}, {"threshold": 0}, {"threshold": 1.5}):
+        response = dispatch({"content": EDITED, **bad})
+        assert response["error"] == "Tool execution failed (invalid_threshold)"
+    for bad in ({"limit": "5"}, {"limit": 0}, {"limit": 10**6}, {"limit": True}):
+        response = dispatch({"id": first["id"], **bad})
+        assert response["error"] == "Tool execution failed (invalid_limit)"
+
+    # Changing the body replaces the fingerprint; deleting removes it
+    client.put(
+        f"/api/pages/{second['id']}", json={"content": UNRELATED}, headers=HEADERS
+    )
+    assert dispatch({"id": first["id"]})["data"]["duplicates"] == []
+    client.delete(f"/api/pages/{first['id']}", headers=HEADERS)
+    assert dispatch({"id": first["id"]})["success"] is False
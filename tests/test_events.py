@@ -0,0 +1,250 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from backend.models import UserRole
+from backend.services import events as events_module
+from backend.services.events import ChangeStreamWatcher, EventBus, sse_stream
+
+
+class FakeChangeStream:
+    def __init__(self, changes):
+        self.changes = list(changes)
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.changes:
+            raise StopAsyncIteration
+        change = self.changes.pop(0)
+        self.resume_token = change["_id"]
+        return change
+
+
+class FakeTokens:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs[query["_id"]] = {"_id": query["_id"], **update["$set"]}
+
+
+class FakeWatchDB:
+    def __init__(self, changes):
+        self.changes = changes
+        self.change_stream_tokens = FakeTokens()
+        self.watch_calls = []
+
+    def watch(self, pipeline, **kwargs):
+        self.watch_calls.append(kwargs)
+        return FakeChangeStream(self.changes)
+
+
+class FakeCommandDB:
+    def __init__(self, existing):
+        self.existing = set(existing)
+        self.pre_images = {}
+
+    async def command(self, command):
+        from pymongo.errors import OperationFailure
+
+        if command["collMod"] not in self.existing:
+            raise OperationFailure("ns does not exist", code=26)
+        self.pre_images[command["collMod"]] = command["changeStreamPreAndPostImages"]
+
+    async def create_collection(self, name, **options):
+        self.existing.add(name)
+        self.pre_images[name] = options["changeStreamPreAndPostImages"]
+
+
+def make_change(token, coll, op, doc_id):
+    return {
+        "_id": {"_data": token},
+        "ns": {"db": "testdb", "coll": coll},
+        "operationType": op,
+        "fullDocument": {"id": doc_id, "version": 2},
+    }
+
+
+@pytest.mark.asyncio
+async def test_event_bus_fans_out_and_replays():
+    bus = EventBus(queue_size=10)
+    seen = []
+    bus.add_listener(seen.append)
+
+    first = await bus.publish({"collection": "pages", "id": "p1"})
+    await bus.publish({"collection": "pages", "id": "p2"})
+    with bus.subscription(first["event_id"]) as queue:
+        await bus.publish({"collection": "pages", "id": "p3"})
+        received = [queue.get_nowait(), queue.get_nowait()]
+
+    assert [event["id"] for event in seen] == ["p1", "p2", "p3"]
+    assert [event["id"] for event in received] == ["p2", "p3"]
+    assert first["seq"] == 1
+
+    # Local ids of another worker are not mistaken for this one's
+    other = EventBus()
+    await other.publish({"collection": "pages", "id": "p4"})
+    with other.subscription(first["event_id"]) as queue:
+        assert queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_change_stream_events_resume_on_any_worker():
+    changes = [make_change(f"t{n}", "pages", "update", f"p{n}") for n in (1, 2)]
+    workers = [EventBus(), EventBus()]
+    for bus in workers:
+        for change in changes:
+            await bus.publish(events_module.change_to_event(change))
+
+    with workers[1].subscription("t1") as queue:
+        assert queue.get_nowait()["event_id"] == "t2"
+        assert queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_watcher_publishes_and_resumes_from_stored_token(monkeypatch):
+    fake = FakeWatchDB(
+        [
+            make_change("t1", "pages", "update", "p1"),
+            make_change("t2", "articles", "insert", "a1"),
+        ]
+    )
+    monkeypatch.setattr(events_module, "db", fake)
+    bus = EventBus()
+    seen = []
+    bus.add_listener(seen.append)
+
+    watcher = ChangeStreamWatcher(bus, checkpoint_interval=0)
+    await watcher.watch_once()
+    assert [(e["collection"], e["operation"], e["id"]) for e in seen] == [
+        ("pages", "update", "p1"),
+        ("articles", "insert", "a1"),
+    ]
+    assert [e["event_id"] for e in seen] == ["t1", "t2"]
+    assert fake.change_stream_tokens.docs["content"]["token"] == {"_data": "t2"}
+
+    restarted = ChangeStreamWatcher(bus)
+    await restarted.watch_once()
+    assert fake.watch_calls[-1]["resume_after"] == {"_data": "t2"}
+
+
+@pytest.mark.asyncio
+async def test_pre_images_are_enabled_for_watched_collections(monkeypatch):
+    fake = FakeCommandDB(existing=["pages", "users"])
+    monkeypatch.setattr(events_module, "db", fake)
+    await events_module.enable_pre_images(("pages", "articles", "users"))
+    assert fake.pre_images == {
+        name: {"enabled": True} for name in ("pages", "articles", "users")
+    }
+
+
+def test_delete_event_carries_id_from_pre_image():
+    change = {
+        "ns": {"db": "testdb", "coll": "pages"},
+        "operationType": "delete",
+        "fullDocumentBeforeChange": {"id": "p1"},
+    }
+    assert events_module.change_to_event(change)["id"] == "p1"
+
+
+def test_events_tell_whether_publication_changed():
+    def changed(operation, **fields):
+        change = {"ns": {"coll": "pages"}, "operationType": operation, **fields}
+        return events_module.change_to_event(change)["publication_changed"]
+
+    draft, published = {"status": "draft"}, {"status": "published"}
+    assert not changed("insert", fullDocument=draft)
+    assert changed("insert", fullDocument=published)
+    assert not changed("update", fullDocument=draft, fullDocumentBeforeChange=draft)
+    assert changed("update", fullDocument=published, fullDocumentBeforeChange=draft)
+    assert not changed("update", updateDescription={"updatedFields": {}})
+    assert changed("update", updateDescription={"updatedFields": published})
+    assert not changed("delete", fullDocumentBeforeChange=draft)
+    assert changed("delete")
+
+
+def test_event_stream_accepts_query_token(client, mock_firebase, seed_user):
+    from backend.auth import get_stream_user
+
+    response = client.get("/api/events")
+    assert response.status_code == 401
+    assert response.json()["error"]["code"] == "not_authenticated"
+
+    class FakeRequest:
+        class state:
+            pass
+
+    user = asyncio.run(get_stream_user(FakeRequest(), None, "faketoken"))
+    assert user.id == "user1"
+
+
+def test_content_writes_publish_local_events(client, mock_firebase, seed_user):
+    seen = []
+    events_module.event_bus.add_listener(seen.append)
+    try:
+        headers = {"Authorization": "Bearer faketoken"}
+        payload = {"title": "Live", "content": "Body"}
+        response = client.post("/api/pages", json=payload, headers=headers)
+    finally:
+        events_module.event_bus.remove_listener(seen.append)
+
+    assert response.status_code == 200
+    assert seen[-1]["collection"] == "pages"
+    assert seen[-1]["operation"] == "insert"
+    assert seen[-1]["id"] == response.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_hides_user_events_from_non_admins(make_user):
+    bus = EventBus()
+    stream = sse_stream(make_user(UserRole.EDITOR), bus=bus, keepalive=0.01)
+
+    assert await stream.__anext__() == ": keepalive\n\n"
+    await bus.publish({"collection": "users", "id": "u2"})
+    event = await bus.publish({"collection": "pages", "id": "p1"})
+    message = await stream.__anext__()
+    await stream.aclose()
+
+    assert message.startswith(f"id: {event['event_id']}\nevent: change\n")
+    assert '"id": "p1"' in message
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    not os.getenv("MONGO_REPLICA_SET_URL"),
+    reason="needs a replica set, e.g. mongod --replSet rs0 (MONGO_REPLICA_SET_URL)",
+)
+async def test_change_stream_against_replica_set(monkeypatch):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ["MONGO_REPLICA_SET_URL"])
+    database = client[f"amtlich_events_{uuid.uuid4().hex[:8]}"]
+    monkeypatch.setattr(events_module, "db", database)
+    bus = EventBus()
+    received = asyncio.Queue()
+    bus.add_listener(received.put_nowait)
+    watcher = ChangeStreamWatcher(bus, checkpoint_interval=0)
+    watcher.start()
+    try:
+        await asyncio.sleep(0.5)
+        await database.pages.insert_one({"id": "p1", "version": 1})
+        event = await asyncio.wait_for(received.get(), 10)
+        assert (event["collection"], event["id"]) == ("pages", "p1")
+    finally:
+        await watcher.stop()
+        await client.drop_database(database.name)
+        client.close()
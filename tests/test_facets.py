@@ -0,0 +1,119 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+from typer.testing import CliRunner
+
+from backend import cli
+from backend.services.facets import FACET_COLLECTION, facet_delta
+
+HEADERS = {"Authorization": "Bearer faketoken"}
+
+
+def _create(client, title, **fields):
+    response = client.post(
+        "/api/articles",
+        json={"title": title, "content": title, **fields},
+        headers=HEADERS,
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_facet_delta_counts_only_changes():
+    before = {"tags": ["a", "b", "b"], "status": "draft", "author_id": "u1"}
+    after = {"tags": ["b", "c"], "status": "published", "author_id": "u1"}
+    assert facet_delta("articles", before, after) == {
+        ("tags", "a"): -1,
+        ("tags", "c"): 1,
+        ("status", "draft"): -1,
+        ("status", "published"): 1,
+    }
+    assert facet_delta("articles", None, {"tags": []}) == {}
+
+
+def test_facet_counts_follow_article_writes(client, mock_firebase, seed_user):
+    first = _create(client, "Eins", tags=["bau", "recht"], category_id="c1")
+    _create(client, "Zwei", tags=["recht"], category_id="c1")
+    third = _create(client, "Drei", tags=["recht", "steuern"])
+
+    tags = client.get("/api/facets/articles/tags", headers=HEADERS).json()
+    assert tags == [
+        {"value": "recht", "count": 3},
+        {"value": "bau", "count": 1},
+        {"value": "steuern", "count": 1},
+    ]
+
+    client.put(
+        f"/api/articles/{first}",
+        json={"tags": ["steuern"], "status": "published"},
+        headers=HEADERS,
+    )
+    client.delete(f"/api/articles/{third}", headers=HEADERS)
+
+    facets = client.get("/api/facets/articles?limit=5", headers=HEADERS).json()
+    assert facets["tags"] == [
+        {"value": "recht", "count": 1},
+        {"value": "steuern", "count": 1},
+    ]
+    assert facets["category"] == [{"value": "c1", "count": 2}]
+    assert facets["status"] == [
+        {"value": "draft", "count": 1},
+        {"value": "published", "count": 1},
+    ]
+    assert facets["author"] == [{"value": seed_user["id"], "count": 2}]
+
+    response = client.get("/api/facets/articles/unknown", headers=HEADERS)
+    assert response.status_code == 422
+
+
+def test_check_and_rebuild_facets(monkeypatch):
+    database = AsyncMongoMockClient()["facetdb"]
+    asyncio.run(
+        database.articles.insert_many(
+            [
+                {"id": "a1", "tags": ["x", "y"], "status": "draft", "author_id": "u"},
+                {"id": "a2", "tags": ["x"], "status": "draft", "author_id": "u"},
+            ]
+        )
+    )
+    asyncio.run(
+        database[FACET_COLLECTION].insert_many(
+            [
+                {
+                    "_id": "articles:tags:x",
+                    "collection": "articles",
+                    "facet": "tags",
+                    "value": "x",
+                    "count": 5,
+                },
+                {
+                    "_id": "articles:tags:gone",
+                    "collection": "articles",
+                    "facet": "tags",
+                    "value": "gone",
+                    "count": 1,
+                },
+            ]
+        )
+    )
+    monkeypatch.setattr(cli, "get_database", lambda: database)
+    runner = CliRunner()
+
+    result = runner.invoke(cli.app, ["check-facets"])
+    assert result.exit_code == 1
+    assert "articles tags=x: stored 5, actual 2" in result.output
+    assert "5 facet counters differ" in result.output
+
+    result = runner.invoke(cli.app, ["rebuild-facets"])
+    assert result.exit_code == 0, result.output
+    assert "Corrected 5 facet counters" in result.output
+    counters = asyncio.run(database[FACET_COLLECTION].find().to_list(None))
+    assert {(c["facet"], c["value"]): c["count"] for c in counters} == {
+        ("tags", "x"): 2,
+        ("tags", "y"): 1,
+        ("status", "draft"): 2,
+        ("author", "u"): 2,
+    }
+
+    result = runner.invoke(cli.app, ["check-facets"])
+    assert result.exit_code == 0, result.output
@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.models import ToolCall, UserRole
+from backend.services.events import event_bus
+from backend.services.idempotency import request_hash
+from backend.services.mcp import execute_tool_call
+from backend.services.tool_cache import tool_result_cache
+from backend.services.tools import Tool, tool_registry
+
+HEADERS = {"Authorization": "Bearer faketoken"}
+
+
+class CountingTool(Tool):
+    cache_ttl = 60
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_name(self) -> str:
+        return "countingTool"
+
+    async def execute(self, args, user):
+        self.calls += 1
+        await asyncio.sleep(args.get("delay", 0))
+        return {"calls": self.calls}
+
+
+@pytest.fixture
+def counting_tool():
+    tool = CountingTool()
+    tool_registry.register(tool)
+    yield tool
+    tool_registry.tools.pop(tool.get_name(), None)
+
+
+def test_retried_create_replays_first_response(
+    client, mock_firebase, seed_user, fake_db
+):
+    payload = {"tool": "createPage", "args": {"title": "Antrag"}}
+    headers = {**HEADERS, "Idempotency-Key": "create-antrag-1"}
+    first = client.post("/api/mcp/dispatch", json=payload, headers=headers).json()
+    retry = client.post("/api/mcp/dispatch", json=payload, headers=headers).json()
+    assert first["success"] is True
+    assert retry == first
+    assert len(fake_db.pages.storage) == 1
+
+    reused = client.post(
+        "/api/mcp/dispatch",
+        json={"tool": "createPage", "args": {"title": "Anderer Antrag"}},
+        headers=headers,
+    ).json()
+    assert reused["success"] is False
+    assert "idempotency_key_reused" in reused["error"]
+
+    # Without a key every call runs
+    client.post("/api/mcp/dispatch", json=payload, headers=HEADERS)
+    assert len(fake_db.pages.storage) == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_the_first(
+    fake_db, counting_tool, make_user
+):
+    user = make_user(UserRole.ADMIN)
+    call = ToolCall(tool="countingTool", args={"delay": 0.05}, idempotency_key="k")
+    responses = await asyncio.gather(*(execute_tool_call(call, user) for _ in range(5)))
+    assert counting_tool.calls == 1
+    assert all(response.data == {"calls": 1} for response in responses)
+
+
+@pytest.mark.asyncio
+async def test_expired_lock_of_a_dead_worker_is_taken_over(
+    fake_db, counting_tool, make_user
+):
+    user = make_user(UserRole.ADMIN)
+    call = ToolCall(tool="countingTool", args={"x": 1}, idempotency_key="k")
+    await fake_db.idempotency_keys.insert_one(
+        {
+            "_id": "u1:k",
+            "request_hash": request_hash(call),
+            "state": "pending",
+            "locked_until": datetime.utcnow() - timedelta(seconds=1),
+        }
+    )
+    response = await execute_tool_call(call, user)
+    assert response.data == {"calls": 1}
+    stored = await fake_db.idempotency_keys.find_one({"_id": "u1:k"})
+    assert stored["state"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_result_cache_until_content_changes(fake_db, counting_tool, make_user):
+    user = make_user(UserRole.ADMIN)
+    call = ToolCall(tool="countingTool", args={"q": "Gebühr"})
+    assert (await execute_tool_call(call, user)).data == {"calls": 1}
+    assert (await execute_tool_call(call, user)).data == {"calls": 1}
+    other = ToolCall(tool="countingTool", args={"q": "Frist"})
+    assert (await execute_tool_call(other, user)).data == {"calls": 2}
+
+    await event_bus.publish({"collection": "pages", "operation": "update"})
+    assert len(tool_result_cache) == 0
+    assert (await execute_tool_call(call, user)).data == {"calls": 3}
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+LAZY_MODULES = ("firebase_admin", "httpx", "motor")
+
+
+def _import_server() -> tuple:
+    """Import the app in a fresh interpreter; return (milliseconds, loaded)."""
+    script = (
+        "import sys, backend.server; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=ROOT_DIR,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    line = next(
+        line
+        for line in result.stderr.splitlines()
+        if line.rstrip().endswith("| backend.server")
+    )
+    cumulative_us = int(line.split("|")[1])
+    return cumulative_us / 1000, result.stdout.strip()
+
+
+def test_server_import_is_lazy_and_within_budget():
+    budget_ms = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1200"))
+    runs = [_import_server() for _ in range(3)]
+
+    assert runs[0][1] == "", f"eagerly imported: {runs[0][1]}"
+    best_ms = min(ms for ms, _ in runs)
+    assert best_ms <= budget_ms, f"import took {best_ms:.0f}ms > {budget_ms:.0f}ms"
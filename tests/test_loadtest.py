@@ -0,0 +1,24 @@
+from benchmarks.loadtest import SCENARIOS, compare, run_load_test
+
+
+def test_load_test_reports_percentiles_per_endpoint():
+    report = run_load_test(
+        requests=5, concurrency=2, warmup=0, seed_pages=3, in_process=True
+    )
+
+    assert set(report["endpoints"]) == set(SCENARIOS)
+    for result in report["endpoints"].values():
+        assert result["requests"] == 5
+        assert result["errors"] == 0
+        assert set(result["latency_ms"]) == {"mean", "p50", "p95", "p99", "max"}
+    assert report["meta"]["database"] == "in-memory"
+
+    lines = compare(report, report)
+    assert lines[0].endswith("throughput +0.0%, p99 latency +0.0%")
+
+
+def test_compare_skips_empty_baseline():
+    current = {"throughput_rps": 100.0, "latency_ms": {"p99": 5.0}}
+    failed = {"throughput_rps": 0.0, "latency_ms": {"p99": 0.0}}
+    lines = compare({"endpoints": {"pages": current}}, {"endpoints": {"pages": failed}})
+    assert lines == ["pages: throughput n/a, p99 latency n/a"]
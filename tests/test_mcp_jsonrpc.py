@@ -0,0 +1,88 @@
+import io
+import json
+
+import pytest
+
+from backend.mcp_stdio import StdioServer
+from backend.models import User
+
+HEADERS = {"Authorization": "Bearer faketoken"}
+
+
+def rpc(method, request_id=None, **params):
+    message = {"jsonrpc": "2.0", "method": method, "params": params}
+    if request_id is not None:
+        message["id"] = request_id
+    return message
+
+
+def test_initialize_and_list_tools(client, mock_firebase, seed_user):
+    response = client.post(
+        "/api/mcp",
+        json=rpc("initialize", 1, protocolVersion="2024-11-05"),
+        headers=HEADERS,
+    )
+    assert response.status_code == 200
+    result = response.json()["result"]
+    assert result["protocolVersion"] == "2024-11-05"
+    assert "tools" in result["capabilities"]
+
+    response = client.post("/api/mcp", json=rpc("tools/list", 2), headers=HEADERS)
+    tools = {tool["name"]: tool for tool in response.json()["result"]["tools"]}
+    assert tools["createPage"]["inputSchema"]["required"] == ["title"]
+    assert tools["generateText"]["description"]
+
+
+def test_batch_with_notification_and_errors(client, mock_firebase, seed_user):
+    batch = [
+        rpc("notifications/initialized"),
+        rpc("tools/call", "a", name="createPage", arguments={"title": "Batch"}),
+        rpc("tools/call", "b", name="updatePage", arguments={"page_id": "nope"}),
+        rpc("unknown", "c"),
+        {"jsonrpc": "2.0", "id": "d"},
+    ]
+    response = client.post("/api/mcp", json=batch, headers=HEADERS)
+    assert response.status_code == 200
+    by_id = {item["id"]: item for item in response.json()}
+
+    assert set(by_id) == {"a", "b", "c", "d"}
+    created = by_id["a"]["result"]
+    assert created["isError"] is False
+    assert created["structuredContent"]["message"] == "Page created successfully"
+    assert by_id["b"]["result"]["isError"] is True
+    assert by_id["b"]["result"]["content"][0]["text"] == (
+        "Tool execution failed (page_not_found)"
+    )
+    assert by_id["c"]["error"]["code"] == -32601
+    assert by_id["d"]["error"]["code"] == -32600
+
+
+def test_notifications_only_and_parse_error(client, mock_firebase, seed_user):
+    response = client.post(
+        "/api/mcp", json=rpc("notifications/initialized"), headers=HEADERS
+    )
+    assert response.status_code == 202
+
+    response = client.post("/api/mcp", content=b"{not json", headers=HEADERS)
+    assert response.json()["error"]["code"] == -32700
+
+
+def test_requires_authentication(client):
+    response = client.post("/api/mcp", json=rpc("ping", 1))
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_stdio_server_answers_each_line(seed_user):
+    lines = [
+        json.dumps(rpc("ping", 1)),
+        "",
+        json.dumps(rpc("notifications/initialized")),
+        json.dumps(rpc("tools/list", 2)),
+    ]
+    output = io.StringIO()
+    server = StdioServer(User(**seed_user), io.StringIO("\n".join(lines)), output)
+    await server.serve()
+
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert sorted(response["id"] for response in responses) == [1, 2]
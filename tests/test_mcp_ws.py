@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from backend.services.mcp import WS_AUTH_FAILED
+from backend.services.tools import Tool, tool_registry
+
+
+class SleepTool(Tool):
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    def get_name(self) -> str:
+        return "sleepTool"
+
+    async def execute(self, args, user):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(args.get("delay", 0))
+        finally:
+            self.running -= 1
+        return {"tag": args.get("tag")}
+
+
+@pytest.fixture
+def sleep_tool():
+    tool = SleepTool()
+    tool_registry.register(tool)
+    yield tool
+    tool_registry.tools.pop(tool.get_name(), None)
+
+
+def test_ws_rejects_missing_auth(client, mock_firebase, seed_user):
+    with client.websocket_connect("/api/mcp/ws") as ws:
+        ws.send_json({"tool": "createPage", "args": {}})
+        with pytest.raises(WebSocketDisconnect) as exc:
+            ws.receive_json()
+    assert exc.value.code == WS_AUTH_FAILED
+
+
+def test_ws_pipelines_calls_out_of_order(client, mock_firebase, seed_user, sleep_tool):
+    with client.websocket_connect("/api/mcp/ws") as ws:
+        ws.send_json({"type": "auth", "token": "faketoken"})
+        ready = ws.receive_json()
+        assert ready["type"] == "ready"
+        assert ready["user_id"] == seed_user["id"]
+
+        ws.send_json({"id": "slow", "tool": "sleepTool", "args": {"delay": 0.3}})
+        ws.send_json({"id": "fast", "tool": "sleepTool", "args": {"tag": "f"}})
+        ws.send_json({"id": "bad", "args": {}})
+        ws.send_json({"id": 4, "tool": "missing", "args": {}})
+        responses = [ws.receive_json() for _ in range(4)]
+
+    assert responses[-1] == {
+        "id": "slow",
+        "success": True,
+        "data": {"tag": None},
+        "error": None,
+    }
+    by_id = {response["id"]: response for response in responses}
+    assert by_id["fast"]["data"] == {"tag": "f"}
+    assert by_id["bad"] == {"id": "bad", "success": False, "error": "Invalid tool call"}
+    assert by_id[4]["error"] == "Tool 'missing' not found"
+
+
+def test_ws_caps_concurrent_calls(
+    client, mock_firebase, seed_user, sleep_tool, monkeypatch
+):
+    monkeypatch.setenv("MCP_WS_MAX_CONCURRENCY", "2")
+    with client.websocket_connect("/api/mcp/ws") as ws:
+        ws.send_json({"type": "auth", "token": "faketoken"})
+        assert ws.receive_json()["max_concurrency"] == 2
+        for index in range(6):
+            ws.send_json({"id": index, "tool": "sleepTool", "args": {"delay": 0.02}})
+        responses = [ws.receive_json() for _ in range(6)]
+
+    assert sorted(response["id"] for response in responses) == list(range(6))
+    assert all(response["success"] for response in responses)
+    assert sleep_tool.peak == 2
@@ -0,0 +1,325 @@
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from backend.models import UserRole
+from backend.services import derivatives as derivatives_module
+from backend.services import media as media_module
+from backend.services.media import parse_range, store_upload
+
+HEADERS = {"Authorization": "Bearer faketoken"}
+BOUNDARY = "testboundary"
+
+
+class FakeGridIn:
+    def __init__(self, bucket, filename):
+        self.bucket = bucket
+        self._id = ObjectId()
+        self.filename = filename
+        self.writes = []
+        self.aborted = False
+
+    async def write(self, data):
+        self.writes.append(data)
+
+    async def close(self):
+        self.bucket.files[self._id] = b"".join(self.writes)
+
+    async def abort(self):
+        self.aborted = True
+
+
+class FakeGridOut:
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def seek(self, position):
+        self.position = position
+
+    async def read(self, size):
+        chunk = self.data[self.position : self.position + size]
+        self.position += len(chunk)
+        return chunk
+
+
+class FakeBucket:
+    def __init__(self):
+        self.files = {}
+        self.uploads = []
+
+    def open_upload_stream(self, filename, metadata=None):
+        grid_in = FakeGridIn(self, filename)
+        self.uploads.append(grid_in)
+        return grid_in
+
+    async def open_download_stream(self, file_id):
+        return FakeGridOut(self.files[file_id])
+
+    async def delete(self, file_id):
+        del self.files[file_id]
+
+
+class FakeMediaCollection:
+    def __init__(self):
+        self.storage = {}
+
+    async def find_one(self, query):
+        for doc in self.storage.values():
+            if all(doc.get(key) == value for key, value in query.items()):
+                return doc
+        return None
+
+    async def insert_one(self, doc):
+        self.storage[doc["id"]] = doc
+
+    async def delete_one(self, query):
+        self.storage.pop(query["id"], None)
+
+    async def update_one(self, query, update):
+        doc = self.storage.get(query["id"])
+        field = next(key for key in query if key.startswith("derivatives."))
+        name = field.split(".", 1)[1]
+        if doc is None or name in doc.get("derivatives", {}):
+            return SimpleNamespace(modified_count=0)
+        doc.setdefault("derivatives", {})[name] = update["$set"][field]
+        return SimpleNamespace(modified_count=1)
+
+
+@pytest.fixture
+def bucket(fake_db, monkeypatch):
+    bucket = FakeBucket()
+    fake_db.media = FakeMediaCollection()
+    fake_db.media_blobs = AsyncMongoMockClient()["testdb"].media_blobs
+    monkeypatch.setattr(media_module, "db", fake_db)
+    monkeypatch.setattr(media_module, "media_bucket", lambda: bucket)
+    monkeypatch.setattr(derivatives_module, "db", fake_db)
+    monkeypatch.setattr(derivatives_module, "get_executor", ThreadPoolExecutor)
+    return bucket
+
+
+def multipart(data, filename="bild.png", content_type="image/png"):
+    return (
+        (
+            f"--{BOUNDARY}\r\n"
+            'Content-Disposition: form-data; name="note"\r\n\r\n'
+            "ignored\r\n"
+            f"--{BOUNDARY}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        + data
+        + f"\r\n--{BOUNDARY}--\r\n".encode()
+    )
+
+
+async def chunked(body, size):
+    for offset in range(0, len(body), size):
+        yield body[offset : offset + size]
+
+
+def upload(client, data, **kwargs):
+    return client.post(
+        "/api/media",
+        content=multipart(data, **kwargs),
+        headers={
+            **HEADERS,
+            "Content-Type": f"multipart/form-data; boundary={BOUNDARY}",
+        },
+    )
+
+
+def png_bytes(width=800, height=600):
+    from PIL import Image
+
+    output = BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(output, format="PNG")
+    return output.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_store_upload_streams_chunks(fake_db, bucket, make_user):
+    data = bytes(range(256)) * 400
+    doc, duplicate = await store_upload(
+        chunked(multipart(data), 4096),
+        f"multipart/form-data; boundary={BOUNDARY}",
+        make_user(UserRole.AUTHOR),
+    )
+
+    assert duplicate is False
+    assert doc["sha256"] == hashlib.sha256(data).hexdigest()
+    assert doc["file_size"] == len(data)
+    grid_in = bucket.uploads[0]
+    assert len(grid_in.writes) > 20
+    assert max(len(chunk) for chunk in grid_in.writes) <= 4096
+    assert bucket.files[ObjectId(doc["storage_id"])] == data
+
+
+def test_identical_uploads_share_stored_content(
+    client, mock_firebase, seed_user, bucket
+):
+    first = upload(client, b"same bytes").json()
+    second = upload(client, b"same bytes", filename="kopie.png")
+
+    assert second.status_code == 201
+    second = second.json()
+    assert second["id"] != first["id"]
+    assert second["storage_id"] == first["storage_id"]
+    assert len(bucket.files) == 1
+    assert first["url"] == f"/api/media/{first['id']}/content"
+
+    # Deleting one of them leaves the content of the other in place
+    client.delete(f"/api/media/{first['id']}", headers=HEADERS)
+    assert client.get(second["url"]).content == b"same bytes"
+    client.delete(f"/api/media/{second['id']}", headers=HEADERS)
+    assert not bucket.files
+
+
+def test_upload_limit_aborts_stream(
+    client, mock_firebase, seed_user, bucket, monkeypatch
+):
+    monkeypatch.setenv("MEDIA_MAX_UPLOAD_BYTES", "10")
+    response = upload(client, b"x" * 11)
+
+    assert response.status_code == 413
+    assert response.json()["error"]["code"] == "file_too_large"
+    assert bucket.uploads[0].aborted
+    assert not bucket.files
+
+
+def test_download_supports_ranges_and_etags(client, mock_firebase, seed_user, bucket):
+    media = upload(client, b"0123456789").json()
+    url = media["url"]
+
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full.content == b"0123456789"
+    assert full.headers["etag"] == f'"{media["sha256"]}"'
+    assert full.headers["accept-ranges"] == "bytes"
+    assert full.headers["content-disposition"].startswith("inline")
+
+    partial = client.get(url, headers={"Range": "bytes=2-5"})
+    assert partial.status_code == 206
+    assert partial.content == b"2345"
+    assert partial.headers["content-range"] == "bytes 2-5/10"
+
+    suffix = client.get(url, headers={"Range": "bytes=-3"})
+    assert suffix.content == b"789"
+
+    stale = client.get(url, headers={"Range": "bytes=2-5", "If-Range": '"old"'})
+    assert stale.status_code == 200
+
+    cached = client.get(url, headers={"If-None-Match": full.headers["etag"]})
+    assert cached.status_code == 304
+
+    outside = client.get(url, headers={"Range": "bytes=10-"})
+    assert outside.status_code == 416
+    assert outside.headers["content-range"] == "bytes */10"
+
+
+def test_scriptable_uploads_are_served_as_attachment(
+    client, mock_firebase, seed_user, bucket
+):
+    media = upload(
+        client, b"<script></script>", filename="x.html", content_type="text/html"
+    ).json()
+    response = client.get(media["url"])
+    assert response.headers["content-disposition"].startswith("attachment")
+    assert response.headers["x-content-type-options"] == "nosniff"
+
+    svg = upload(
+        client, b"<svg onload='x()'/>", filename="x.svg", content_type="image/svg+xml"
+    ).json()
+    response = client.get(svg["url"])
+    assert response.headers["content-disposition"].startswith("attachment")
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-", 10) == (0, 9)
+    assert parse_range("bytes=5-100", 10) == (5, 9)
+    assert parse_range("bytes=-20", 10) == (0, 9)
+    assert parse_range("bytes=0-1,4-5", 10) is None
+    assert parse_range("items=0-1", 10) is None
+    assert parse_range("bytes=abc", 10) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=-0", 10)
+
+
+def test_upload_requires_file_field(client, mock_firebase, seed_user, bucket):
+    body = f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="x"\r\n\r\n1\r\n'
+    response = client.post(
+        "/api/media",
+        content=(body + f"--{BOUNDARY}--\r\n").encode(),
+        headers={
+            **HEADERS,
+            "Content-Type": f"multipart/form-data; boundary={BOUNDARY}",
+        },
+    )
+    assert response.status_code == 400
+    assert response.json()["error"]["code"] == "missing_file"
+
+
+def test_image_upload_creates_derivatives(client, mock_firebase, seed_user, bucket):
+    from PIL import Image
+
+    media = upload(client, png_bytes()).json()
+    # Upload schedules generation of all configured variants
+    stored = client.get(f"/api/media/{media['id']}", headers=HEADERS).json()
+    assert set(stored["derivatives"]) == {"thumb", "web"}
+
+    response = client.get(f"/api/media/{media['id']}/derivatives/thumb")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert "immutable" in response.headers["cache-control"]
+    assert Image.open(BytesIO(response.content)).size == (320, 240)
+
+    unknown = client.get(f"/api/media/{media['id']}/derivatives/huge")
+    assert unknown.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_missing_derivative_is_generated_once(
+    fake_db, bucket, monkeypatch, make_user
+):
+    body = multipart(png_bytes(), content_type="image/png")
+    doc, _ = await store_upload(
+        chunked(body, 65536),
+        f"multipart/form-data; boundary={BOUNDARY}",
+        make_user(UserRole.AUTHOR),
+    )
+    calls = []
+    render = derivatives_module.render_derivative
+
+    def counting_render(data, size, fmt):
+        calls.append(size)
+        return render(data, size, fmt)
+
+    monkeypatch.setattr(derivatives_module, "render_derivative", counting_render)
+
+    entries = await asyncio.gather(
+        *(derivatives_module.get_derivative(doc["id"], "thumb") for _ in range(5))
+    )
+
+    assert calls == [320]
+    assert len({entry["storage_id"] for entry in entries}) == 1
+    assert len(bucket.files) == 2
+
+
+def test_render_derivative_in_process_pool():
+    from PIL import Image
+
+    executor = derivatives_module.get_executor()
+    try:
+        output = executor.submit(
+            derivatives_module.render_derivative, png_bytes(2000, 1000), 500, "jpeg"
+        ).result(timeout=60)
+    finally:
+        derivatives_module.shutdown_executor()
+    image = Image.open(BytesIO(output))
+    assert (image.format, image.size) == ("JPEG", (500, 250))
@@ -0,0 +1,112 @@
+import subprocess
+import sys
+from importlib.metadata import EntryPoint
+from pathlib import Path
+
+import pytest
+
+from backend.services.registry import ToolRegistry
+from backend.services.tool_specs import ToolSpec
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+PLUGIN = """
+from backend.services.tool_specs import ToolSpec
+
+SPEC = ToolSpec(
+    "searchDocs",
+    "amtlich_search_impl:SearchTool",
+    description="Search documents.",
+    input_schema={"type": "object", "properties": {"q": {"type": "string"}}},
+    warm_up=True,
+)
+"""
+IMPLEMENTATION = """
+from backend.services.registry import Tool
+
+class SearchTool(Tool):
+    warmed = False
+
+    def get_name(self):
+        return "searchDocs"
+
+    async def warm_up(self):
+        SearchTool.warmed = True
+
+    async def execute(self, args, user):
+        return {"hits": []}
+"""
+
+
+@pytest.fixture
+def plugin(tmp_path, monkeypatch):
+    (tmp_path / "amtlich_search_spec.py").write_text(PLUGIN)
+    (tmp_path / "amtlich_search_impl.py").write_text(IMPLEMENTATION)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    entry_point = EntryPoint(
+        name="searchDocs",
+        value="amtlich_search_spec:SPEC",
+        group="amtlich.tools",
+    )
+    monkeypatch.setattr(
+        "importlib.metadata.entry_points",
+        lambda group: [entry_point] if group == "amtlich.tools" else [],
+    )
+    yield
+    for name in ("amtlich_search_spec", "amtlich_search_impl"):
+        sys.modules.pop(name, None)
+
+
+def test_listing_builtin_tools_imports_no_implementation():
+    script = (
+        "import sys; from backend.services.registry import tool_registry; "
+        "names = [d['name'] for d in tool_registry.describe_tools()]; "
+        "print(len(names), 'backend.services.tools' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    count, imported = result.stdout.split()
+    assert int(count) >= 11
+    assert imported == "False"
+
+
+@pytest.mark.asyncio
+async def test_entry_point_tools_load_on_first_use(plugin, monkeypatch):
+    registry = ToolRegistry()
+    descriptors = registry.describe_tools()
+    assert descriptors == [
+        {
+            "name": "searchDocs",
+            "description": "Search documents.",
+            "inputSchema": {"type": "object", "properties": {"q": {"type": "string"}}},
+        }
+    ]
+    assert "amtlich_search_impl" not in sys.modules
+
+    tool = registry.get_tool("searchDocs")
+    assert tool.description == "Search documents."
+    assert "load_ms" in registry.timings["searchDocs"]
+    assert await tool.execute({}, None) == {"hits": []}
+
+
+@pytest.mark.asyncio
+async def test_warm_up_follows_specs_and_tool_warmup(plugin, monkeypatch):
+    registry = ToolRegistry(
+        [ToolSpec("lazyTool", "amtlich_search_impl:SearchTool", description="")]
+    )
+    report = await registry.warm_up()
+    assert list(report) == ["searchDocs"]
+    assert set(report["searchDocs"]) == {"load_ms", "warm_up_ms"}
+    assert sys.modules["amtlich_search_impl"].SearchTool.warmed is True
+
+    monkeypatch.setenv("TOOL_WARMUP", "none")
+    assert await ToolRegistry().warm_up() == {}
+    monkeypatch.setenv("TOOL_WARMUP", "all")
+    registry = ToolRegistry(
+        [ToolSpec("lazyTool", "amtlich_search_impl:SearchTool", description="")]
+    )
+    assert set(await registry.warm_up()) == {"lazyTool", "searchDocs"}
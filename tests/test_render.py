@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+from mongomock_motor import AsyncMongoMockClient
+from typer.testing import CliRunner
+
+from backend import cli
+from backend.services.render import (
+    RENDERER_VERSION,
+    content_hash,
+    offload,
+    render_content,
+)
+
+HEADERS = {"Authorization": "Bearer faketoken"}
+
+
+def test_render_content_converts_markdown_and_sanitises():
+    html = render_content(
+        "# Titel\n\n*wichtig*\n\n<p onclick='x()'>Text</p><script>alert(1)</script>"
+    )
+    assert "<h1>Titel</h1>" in html
+    assert "<em>wichtig</em>" in html
+    assert "<p>Text</p>" in html
+    assert "onclick" not in html
+    assert "<script>" not in html
+
+
+def test_long_bodies_are_rendered_off_the_event_loop(monkeypatch):
+    monkeypatch.setenv("RENDER_THREAD_BYTES", "10")
+    loop_thread = threading.get_ident()
+
+    def thread_of(source):
+        return threading.get_ident()
+
+    async def run():
+        return await offload(thread_of, "kurz"), await offload(thread_of, "x" * 11)
+
+    short, long = asyncio.run(run())
+    assert short == loop_thread
+    assert long != loop_thread
+
+
+def test_writes_store_rendered_html(client, mock_firebase, seed_user, fake_db):
+    created = client.post(
+        "/api/pages", json={"title": "Start", "content": "**fett**"}, headers=HEADERS
+    ).json()
+    assert created["content_html"] == "<p><strong>fett</strong></p>\n"
+    assert created["content_hash"] == content_hash("**fett**")
+    assert created["render_version"] == RENDERER_VERSION
+
+    updated = client.put(
+        f"/api/pages/{created['id']}", json={"content": "_neu_"}, headers=HEADERS
+    ).json()
+    assert updated["content_html"] == "<p><em>neu</em></p>\n"
+    assert fake_db.pages.storage[created["id"]]["content_hash"] == content_hash("_neu_")
+
+
+def test_rerender_command_updates_stale_documents(monkeypatch):
+    database = AsyncMongoMockClient()["clitest"]
+    stale = {"id": "p1", "content": "# Alt", "version": 2}
+    current = {
+        "id": "p2",
+        "content": "x",
+        "version": 1,
+        "content_html": "keep",
+        "render_version": RENDERER_VERSION,
+    }
+    asyncio.run(database.pages.insert_many([stale, current]))
+    monkeypatch.setattr(cli, "get_database", lambda: database)
+
+    result = CliRunner().invoke(
+        cli.app, ["rerender", "--collection", "pages", "--workers", "1"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Re-rendered 1 documents" in result.output
+    docs = {doc["id"]: doc for doc in asyncio.run(database.pages.find().to_list(None))}
+    assert docs["p1"]["content_html"] == "<h1>Alt</h1>\n"
+    assert docs["p1"]["content_hash"] == content_hash("# Alt")
+    assert docs["p2"]["content_html"] == "keep"
@@ -0,0 +1,156 @@
+import asyncio
+import datetime
+
+from backend.services.revisions import apply_delta, make_delta
+
+HEADERS = {"Authorization": "Bearer faketoken"}
+
+
+def test_delta_round_trip():
+    old = "§ 1 Geltung\n§ 2 Begriffe\n§ 3 Zuständigkeit\n§ 4 Frist\n"
+    new = "§ 1 Geltung\n§ 2 Begriffe neu\n§ 3 Zuständigkeit\n§ 5 Gebühren\n"
+    delta = make_delta(old, new)
+    assert apply_delta(old, delta) == new
+    assert apply_delta(old, make_delta(old, old)) == old
+    assert apply_delta("", make_delta("", new)) == new
+
+
+def test_page_history_diff_and_restore(
+    client, mock_firebase, seed_user, fake_db, monkeypatch
+):
+    monkeypatch.setenv("REVISION_SNAPSHOT_INTERVAL", "2")
+    page = client.post(
+        "/api/pages",
+        json={"title": "Satzung", "content": "§ 1 alt\n§ 2 bleibt\n"},
+        headers=HEADERS,
+    ).json()
+    for body in ("§ 1 neu\n§ 2 bleibt\n", "§ 1 neu\n§ 2 bleibt\n§ 3 dazu\n"):
+        client.put(f"/api/pages/{page['id']}", json={"content": body}, headers=HEADERS)
+    client.put(f"/api/pages/{page['id']}", json={"title": "Neu"}, headers=HEADERS)
+
+    base = f"/api/pages/{page['id']}/revisions"
+    listing = client.get(base, headers=HEADERS).json()
+    assert [r["version"] for r in listing] == [4, 3, 2, 1]
+    assert [r["kind"] for r in listing] == ["delta", "snapshot", "delta", "snapshot"]
+
+    old = client.get(f"{base}/2", headers=HEADERS).json()
+    assert old["content"] == "§ 1 neu\n§ 2 bleibt\n"
+    assert old["title"] == "Satzung"
+
+    diff = client.get(
+        f"{base}/diff", params={"from_version": 1, "to_version": 4}, headers=HEADERS
+    ).json()
+    assert "-§ 1 alt\n" in diff["content_diff"]
+    assert "+§ 3 dazu\n" in diff["content_diff"]
+    assert diff["fields"]["title"] == {"from": "Satzung", "to": "Neu"}
+    assert "content" not in diff["fields"]
+
+    restored = client.post(f"{base}/1/restore", headers=HEADERS).json()
+    assert restored["version"] == 5
+    assert restored["content"] == "§ 1 alt\n§ 2 bleibt\n"
+    assert restored["title"] == "Satzung"
+    assert client.get(f"{base}/5", headers=HEADERS).json()["content"] == (
+        "§ 1 alt\n§ 2 bleibt\n"
+    )
+
+    missing = client.get(f"{base}/9", headers=HEADERS)
+    assert missing.status_code == 404
+    assert missing.json()["error"]["code"] == "revision_not_found"
+
+
+def test_legacy_document_gets_base_snapshot(client, mock_firebase, seed_user, fake_db):
+    fake_db.pages.storage["legacy"] = {
+        "id": "legacy",
+        "title": "Alt",
+        "slug": "alt",
+        "content": "vorher\n",
+        "status": "draft",
+        "author_id": "user1",
+        "version": 3,
+        "created_at": datetime.datetime.utcnow(),
+        "updated_at": datetime.datetime.utcnow(),
+    }
+    client.put("/api/pages/legacy", json={"content": "nachher\n"}, headers=HEADERS)
+
+    listing = client.get("/api/pages/legacy/revisions", headers=HEADERS).json()
+    assert [r["version"] for r in listing] == [4, 3]
+    old = client.get("/api/pages/legacy/revisions/3", headers=HEADERS).json()
+    assert old["content"] == "vorher\n"
+
+
+def test_version_gap_starts_new_snapshot(client, mock_firebase, seed_user, fake_db):
+    page = client.post(
+        "/api/pages", json={"title": "T", "content": "eins\n"}, headers=HEADERS
+    ).json()
+    # Changed without a revision, as by the statute importer
+    stored = fake_db.pages.storage[page["id"]]
+    stored.update(content="zwei\n", version=2)
+    client.put(f"/api/pages/{page['id']}", json={"content": "drei\n"}, headers=HEADERS)
+
+    base = f"/api/pages/{page['id']}/revisions"
+    listing = client.get(base, headers=HEADERS).json()
+    assert [(r["version"], r["kind"]) for r in listing] == [
+        (3, "delta"),
+        (2, "snapshot"),
+        (1, "snapshot"),
+    ]
+    for version, content in ((1, "eins\n"), (2, "zwei\n"), (3, "drei\n")):
+        assert (
+            client.get(f"{base}/{version}", headers=HEADERS).json()["content"]
+            == content
+        )
+
+    # A delta whose predecessor is missing is refused, not misapplied
+    asyncio.run(fake_db.revisions.delete_many({"doc_id": page["id"], "version": 2}))
+    broken = client.get(f"{base}/3", headers=HEADERS)
+    assert broken.status_code == 409
+    assert broken.json()["error"]["code"] == "revision_history_gap"
+
+
+def test_revision_tools(client, mock_firebase, seed_user, fake_db):
+    page = client.post(
+        "/api/pages", json={"title": "T", "content": "eins\n"}, headers=HEADERS
+    ).json()
+    client.put(f"/api/pages/{page['id']}", json={"content": "zwei\n"}, headers=HEADERS)
+
+    listed = client.post(
+        "/api/mcp/dispatch",
+        json={"tool": "listRevisions", "args": {"id": page["id"]}},
+        headers=HEADERS,
+    ).json()
+    assert [r["version"] for r in listed["data"]["revisions"]] == [2, 1]
+
+    restored = client.post(
+        "/api/mcp/dispatch",
+        json={"tool": "restoreRevision", "args": {"id": page["id"], "version": 1}},
+        headers=HEADERS,
+    ).json()
+    assert restored["data"]["version"] == 3
+    assert fake_db.pages.storage[page["id"]]["content"] == "eins\n"
+    assert asyncio.run(fake_db.revisions.count_documents({"doc_id": page["id"]})) == 3
+
+
+def test_restore_keeps_publication_state(client, mock_firebase, seed_user):
+    page = client.post(
+        "/api/pages",
+        json={
+            "title": "Satzung",
+            "content": "§ 1 alt\n",
+            "status": "scheduled",
+            "published_at": "2030-01-01T08:00:00+00:00",
+        },
+        headers=HEADERS,
+    ).json()
+    client.put(
+        f"/api/pages/{page['id']}",
+        json={"content": "§ 1 neu\n", "status": "draft", "published_at": None},
+        headers=HEADERS,
+    )
+
+    response = client.post(
+        f"/api/pages/{page['id']}/revisions/1/restore", headers=HEADERS
+    )
+    assert response.status_code == 200
+    restored = response.json()
+    assert restored["content"] == "§ 1 alt\n"
+    assert (restored["status"], restored["published_at"]) == ("draft", None)
@@ -0,0 +1,184 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.services import content, facets, revisions, scheduler
+from backend.services.scheduler import Lease, PublishScheduler
+
+HEADERS = {"Authorization": "Bearer faketoken"}
+
+
+@pytest.fixture
+def database(mock_mongo):
+    return mock_mongo(content, facets, revisions, scheduler)
+
+
+async def _scheduled(database, collection, doc_id, due):
+    await database[collection].insert_one(
+        {
+            "id": doc_id,
+            "title": doc_id,
+            "content": "",
+            "author_id": "u1",
+            "status": "scheduled",
+            "published_at": due,
+            "version": 1,
+        }
+    )
+
+
+def test_scheduled_status_requires_publish_time(client, mock_firebase, seed_user):
+    response = client.post(
+        "/api/pages", json={"title": "Later", "status": "scheduled"}, headers=HEADERS
+    )
+    assert response.status_code == 422
+    assert response.json()["error"]["code"] == "publish_time_required"
+
+    response = client.post(
+        "/api/pages",
+        json={
+            "title": "Later",
+            "status": "scheduled",
+            "published_at": "2030-01-01T08:00:00+01:00",
+        },
+        headers=HEADERS,
+    )
+    assert response.status_code == 200
+    assert response.json()["published_at"] == "2030-01-01T07:00:00"
+
+
+def test_schedule_updates_are_checked_against_stored_state(
+    client, mock_firebase, seed_user, fake_db
+):
+    page = client.post(
+        "/api/pages",
+        json={"title": "Later", "published_at": "2030-01-01T08:00:00+00:00"},
+        headers=HEADERS,
+    ).json()
+    response = client.put(
+        f"/api/pages/{page['id']}", json={"status": "scheduled"}, headers=HEADERS
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "scheduled"
+
+    response = client.put(
+        f"/api/pages/{page['id']}", json={"published_at": None}, headers=HEADERS
+    )
+    assert response.status_code == 422
+    assert response.json()["error"]["code"] == "publish_time_required"
+    assert fake_db.pages.storage[page["id"]]["published_at"] is not None
+
+    draft = client.post("/api/pages", json={"title": "Draft"}, headers=HEADERS)
+    response = client.put(
+        f"/api/pages/{draft.json()['id']}",
+        json={"status": "scheduled"},
+        headers=HEADERS,
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_step_publishes_due_documents_once(database, monkeypatch):
+    monkeypatch.setenv("SCHEDULER_LEASE_SECONDS", "300")
+    now = datetime.utcnow()
+    await _scheduled(database, "articles", "due", now - timedelta(seconds=1))
+    await _scheduled(database, "pages", "later", now + timedelta(seconds=30))
+
+    first = PublishScheduler(Lease("test", "worker-1"))
+    delay = await first.step()
+    assert first.leader
+    # Sleeps until the next publication, not a polling interval
+    assert 25 < delay <= 30
+
+    published = await database.articles.find_one({"id": "due"})
+    assert (published["status"], published["version"]) == ("published", 2)
+    assert await database.revisions.count_documents({"doc_id": "due"}) == 2
+    assert (await database.pages.find_one({"id": "later"}))["status"] == "scheduled"
+
+    # A second worker cannot take the lease while it is held
+    second = PublishScheduler(Lease("test", "worker-2"))
+    await second.step()
+    assert not second.leader
+
+    # Stale heap entries are no-ops
+    first.push(now - timedelta(seconds=1), "articles", "due")
+    assert await first.publish_due() == 0
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_taken_over(database, monkeypatch):
+    monkeypatch.setenv("SCHEDULER_LEASE_SECONDS", "0.01")
+    assert await Lease("test", "worker-1").acquire(0.01)
+    assert not await Lease("test", "worker-2").acquire(0.01)
+    await asyncio.sleep(0.02)
+    assert await Lease("test", "worker-2").acquire(0.01)
+
+
+@pytest.mark.asyncio
+async def test_writes_wake_the_scheduler(database, monkeypatch):
+    monkeypatch.setenv("SCHEDULER_LEASE_SECONDS", "30")
+    publisher = PublishScheduler(Lease("test", "worker-1"))
+    publisher.start()
+    try:
+        await asyncio.sleep(0.05)
+        assert publisher.leader and not publisher._heap
+
+        await content.insert_document(
+            "articles",
+            {
+                "id": "soon",
+                "title": "Soon",
+                "content": "",
+                "author_id": "u1",
+                "tags": ["bau"],
+                "status": "scheduled",
+                "published_at": datetime.utcnow() + timedelta(seconds=0.1),
+                "version": 1,
+            },
+        )
+        assert [entry[2] for entry in publisher._heap] == ["soon"]
+        await asyncio.sleep(0.3)
+    finally:
+        await publisher.stop()
+
+    doc = await database.articles.find_one({"id": "soon"})
+    assert doc["status"] == "published"
+    assert publisher.published == 1
+    status = await facets.facet_counts("articles", "status", database=database)
+    assert status == [{"value": "published", "count": 1}]
+    assert await database.leases.count_documents({}) == 0
+
+
+@pytest.mark.asyncio
+async def test_followers_publish_their_own_writes_on_time(database, monkeypatch):
+    monkeypatch.setenv("SCHEDULER_LEASE_SECONDS", "30")
+    monkeypatch.setenv("SCHEDULER_RELOAD_SECONDS", "60")
+    assert await Lease(scheduler.LEASE_NAME, "leader").acquire(30)
+    follower = PublishScheduler(Lease(scheduler.LEASE_NAME, "follower"))
+    follower.start()
+    try:
+        await asyncio.sleep(0.05)
+        assert not follower.leader
+
+        await content.insert_document(
+            "pages",
+            {
+                "id": "soon",
+                "title": "Soon",
+                "content": "",
+                "author_id": "u1",
+                "status": "scheduled",
+                "published_at": datetime.utcnow() + timedelta(seconds=0.1),
+                "version": 1,
+            },
+        )
+        await asyncio.sleep(0.3)
+    finally:
+        await follower.stop()
+
+    # Published without waiting for the leader's next reload
+    assert (await database.pages.find_one({"id": "soon"}))["status"] == "published"
+    assert follower.published == 1
+    lease = await database.leases.find_one({"_id": scheduler.LEASE_NAME})
+    assert lease["owner"] == "leader"
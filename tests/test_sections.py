@@ -0,0 +1,96 @@
+from backend.services.sections import section_index
+
+HEADERS = {"Authorization": "Bearer faketoken"}
+LAW = (
+    "Eingangsformel\n\n"
+    "## § 1 Geltungsbereich\n\nDieses Gesetz gilt für alle.\n\n"
+    "## § 2 Begriffe\n\nBegriffe sind Wörter.\n\n"
+    "## Anlage\n\nTabelle\n"
+)
+
+
+def test_section_index_keys_and_spans():
+    index = section_index(LAW)
+    assert [s["key"] for s in index] == ["preamble", "p1", "p2", "anlage"]
+    assert index[1]["title"] == "§ 1 Geltungsbereich"
+    assert "".join(LAW[s["offset"] : s["offset"] + s["length"]] for s in index) == LAW
+    assert section_index("Nur Text ohne Überschrift") == []
+    assert [s["key"] for s in section_index("# A\n# A\n")] == ["a", "a-2"]
+
+
+def test_partial_read_and_section_update(client, mock_firebase, seed_user, fake_db):
+    page = client.post(
+        "/api/pages", json={"title": "Gesetz", "content": LAW}, headers=HEADERS
+    ).json()
+    assert [s["key"] for s in page["sections"]] == ["preamble", "p1", "p2", "anlage"]
+
+    index = client.get(f"/api/pages/{page['id']}/sections", headers=HEADERS).json()
+    assert index == page["sections"]
+
+    partial = client.get(
+        f"/api/pages/{page['id']}", params={"sections": "p2,p1"}, headers=HEADERS
+    ).json()
+    assert partial["content"] == (
+        "## § 1 Geltungsbereich\n\nDieses Gesetz gilt für alle.\n\n"
+        "## § 2 Begriffe\n\nBegriffe sind Wörter.\n\n"
+    )
+    assert "<h2>§ 2 Begriffe</h2>" in partial["content_html"]
+    assert "Eingangsformel" not in partial["content_html"]
+
+    response = client.put(
+        f"/api/pages/{page['id']}/sections/p1",
+        json={"content": "## § 1 Anwendungsbereich\n\nGilt nur hier.", "version": 1},
+        headers=HEADERS,
+    )
+    assert response.status_code == 200
+    updated = response.json()
+    assert updated["version"] == 2
+    assert updated["content"] == "## § 1 Anwendungsbereich\n\nGilt nur hier.\n"
+
+    stored = fake_db.pages.storage[page["id"]]
+    assert stored["content"] == LAW.replace(
+        "## § 1 Geltungsbereich\n\nDieses Gesetz gilt für alle.\n\n",
+        "## § 1 Anwendungsbereich\n\nGilt nur hier.\n",
+    )
+    assert "<h2>§ 1 Anwendungsbereich</h2>" in stored["content_html"]
+    assert stored["sections"][1]["title"] == "§ 1 Anwendungsbereich"
+
+    stale = client.put(
+        f"/api/pages/{page['id']}/sections/p2",
+        json={"content": "## § 2 Neu\n", "version": 1},
+        headers=HEADERS,
+    )
+    assert stale.status_code == 409
+
+    missing = client.get(
+        f"/api/pages/{page['id']}", params={"sections": "p9"}, headers=HEADERS
+    )
+    assert missing.status_code == 404
+    assert missing.json()["error"]["code"] == "section_not_found"
+
+
+def test_section_tools(client, mock_firebase, seed_user, fake_db):
+    page = client.post(
+        "/api/pages", json={"title": "Gesetz", "content": LAW}, headers=HEADERS
+    ).json()
+
+    def dispatch(tool, args):
+        return client.post(
+            "/api/mcp/dispatch", json={"tool": tool, "args": args}, headers=HEADERS
+        ).json()
+
+    listed = dispatch("getSections", {"id": page["id"]})
+    assert [s["key"] for s in listed["data"]["sections"]] == [
+        "preamble",
+        "p1",
+        "p2",
+        "anlage",
+    ]
+    read = dispatch("getSections", {"id": page["id"], "sections": ["anlage"]})
+    assert read["data"]["content"] == "## Anlage\n\nTabelle\n"
+
+    result = dispatch(
+        "updateSection", {"id": page["id"], "key": "anlage", "content": "## Anlage\n"}
+    )
+    assert result["data"]["version"] == 2
+    assert fake_db.pages.storage[page["id"]]["content"].endswith("## Anlage\n")
@@ -0,0 +1,175 @@
+import asyncio
+import re
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.models import UserRole
+from backend.services import content, facets, revisions
+from backend.services import db as db_module
+from backend.services.sitemap import shard_of, shard_query, sitemap_cache
+
+
+@pytest.fixture
+def database(mock_mongo, monkeypatch):
+    monkeypatch.setenv("SITE_URL", "https://example.org/")
+    return mock_mongo(db_module, content, facets, revisions)
+
+
+def _doc(slug, status="published", **fields):
+    return {
+        "id": str(uuid.uuid4()),
+        "title": slug.title(),
+        "slug": slug,
+        "content": "",
+        "author_id": "u1",
+        "status": status,
+        "version": 1,
+        "updated_at": datetime(2024, 5, 1, 12, 0),
+        **fields,
+    }
+
+
+def _locs(body):
+    return re.findall(r"<loc>([^<]+)</loc>", body)
+
+
+def test_shards_partition_the_id_space():
+    ids = [str(uuid.uuid4()) for _ in range(200)] + ["0", "ffff", "zz"]
+    for shards in (1, 2, 8):
+        for doc_id in ids:
+            query = shard_query(shard_of(doc_id, shards), shards)
+            bounds = query.get("id", {})
+            assert bounds.get("$gte", "") <= doc_id
+            assert "$lt" not in bounds or doc_id < bounds["$lt"]
+
+
+def test_single_sitemap_and_conditional_get(client, database):
+    pages = [_doc("impressum"), _doc("entwurf", status="draft")]
+    asyncio.run(database.pages.insert_many(pages))
+    asyncio.run(database.articles.insert_one(_doc("neu & gut")))
+
+    response = client.get("/sitemap.xml")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/xml"
+    assert sorted(_locs(response.text)) == [
+        "https://example.org/artikel/neu%20%26%20gut",
+        "https://example.org/impressum",
+    ]
+    assert "<lastmod>2024-05-01T12:00:00Z</lastmod>" in response.text
+
+    etag = response.headers["etag"]
+    assert (
+        client.get("/sitemap.xml", headers={"If-None-Match": etag}).status_code == 304
+    )
+    modified = response.headers["last-modified"]
+    assert (
+        client.get("/sitemap.xml", headers={"If-Modified-Since": modified}).status_code
+        == 304
+    )
+    assert client.get("/sitemaps/1.xml").status_code == 404
+
+
+def test_sharded_sitemap_regenerates_only_touched_shard(
+    client, database, monkeypatch, make_user
+):
+    monkeypatch.setenv("SITEMAP_SHARD_SIZE", "3")
+    docs = [_doc(f"seite-{number}") for number in range(10)]
+    asyncio.run(database.pages.insert_many(docs))
+
+    index = client.get("/sitemap.xml").text
+    assert "<sitemapindex" in index
+    shard_urls = _locs(index)
+    assert len(shard_urls) == 4
+    locs = []
+    for url in shard_urls:
+        locs += _locs(client.get(url.removeprefix("https://example.org")).text)
+    assert sorted(locs) == sorted(f"https://example.org/seite-{n}" for n in range(10))
+
+    renders = sitemap_cache.renders
+    for url in shard_urls:
+        client.get(url.removeprefix("https://example.org"))
+    assert sitemap_cache.renders == renders
+
+    changed = docs[0]
+    asyncio.run(
+        content.update_document(
+            "pages",
+            changed["id"],
+            {"slug": "umbenannt"},
+            make_user(UserRole.ADMIN),
+            label="Page",
+        )
+    )
+    shard = shard_of(changed["id"], 4)
+    for number, url in enumerate(shard_urls):
+        body = client.get(url.removeprefix("https://example.org")).text
+        assert ("umbenannt" in body) == (number == shard)
+    assert sitemap_cache.renders == renders + 1
+
+
+def test_feed_lists_latest_published_articles(client, database):
+    now = datetime.utcnow()
+    asyncio.run(
+        database.articles.insert_many(
+            [
+                _doc("alt", updated_at=now - timedelta(days=2), excerpt="<b>Alt</b>"),
+                _doc("neu", updated_at=now, published_at=now - timedelta(hours=1)),
+                _doc("entwurf", status="draft", updated_at=now),
+            ]
+        )
+    )
+    response = client.get("/feed.xml")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/atom+xml"
+    body = response.text
+    assert re.findall(r'<link href="([^"]+)"/>', body) == [
+        "https://example.org/artikel/neu",
+        "https://example.org/artikel/alt",
+    ]
+    assert "<summary>&lt;b&gt;Alt&lt;/b&gt;</summary>" in body
+    assert body.count("<published>") == 1
+    assert "entwurf" not in body
+
+
+def test_hosts_share_one_rendering(client, database, monkeypatch):
+    monkeypatch.delenv("SITE_URL")
+    asyncio.run(database.pages.insert_one(_doc("impressum")))
+
+    renders = sitemap_cache.renders
+    first = client.get("/sitemap.xml", headers={"Host": "a.example"})
+    second = client.get("/sitemap.xml", headers={"Host": "b.example"})
+    assert _locs(first.text) == ["http://a.example/impressum"]
+    assert _locs(second.text) == ["http://b.example/impressum"]
+    assert first.headers["etag"] != second.headers["etag"]
+    assert sitemap_cache.renders == renders + 1
+
+
+def test_only_publication_changes_recount_shards(database, make_user):
+    draft = _doc("entwurf", status="draft")
+    asyncio.run(database.pages.insert_one(draft))
+    counted = asyncio.run(sitemap_cache.shards())
+    stamp = sitemap_cache._counted
+
+    asyncio.run(
+        content.update_document(
+            "pages",
+            draft["id"],
+            {"title": "Neu"},
+            make_user(UserRole.ADMIN),
+            label="Page",
+        )
+    )
+    assert sitemap_cache._counted == stamp
+    asyncio.run(
+        content.update_document(
+            "pages",
+            draft["id"],
+            {"status": "published"},
+            make_user(UserRole.ADMIN),
+            label="Page",
+        )
+    )
+    assert sitemap_cache._counted == 0.0
+    assert asyncio.run(sitemap_cache.shards()) == counted
@@ -0,0 +1,162 @@
+import asyncio
+import uuid
+
+import pytest
+
+from backend.models import UserRole
+from backend.services import content, facets, revisions, static_export
+from backend.services.static_export import StaticExporter, output_path
+
+
+@pytest.fixture
+def database(mock_mongo, monkeypatch):
+    monkeypatch.setenv("SITE_URL", "https://example.org")
+    return mock_mongo(content, facets, revisions, static_export)
+
+
+def _doc(slug, status="published", **fields):
+    return {
+        "id": str(uuid.uuid4()),
+        "title": slug.title(),
+        "slug": slug,
+        "content": "",
+        "content_html": f"<p>{slug}</p>",
+        "author_id": "u1",
+        "status": status,
+        "version": 1,
+        **fields,
+    }
+
+
+def _files(root):
+    return sorted(
+        str(path.relative_to(root))
+        for path in root.rglob("*")
+        if path.is_file() and not path.name.startswith(".")
+    )
+
+
+def test_output_path_rejects_unsafe_slugs():
+    assert output_path("pages", "impressum") == "impressum/index.html"
+    assert output_path("articles", "neu & gut") == "artikel/neu & gut/index.html"
+    for slug in ("", "..", ".", "a/b", "a\0b"):
+        assert output_path("pages", slug) is None
+
+
+@pytest.mark.asyncio
+async def test_export_rewrites_only_changed_pages(database, tmp_path):
+    page = _doc("impressum", meta_description='Wer "wir" sind')
+    article = _doc("neu")
+    await database.pages.insert_many([page, _doc("entwurf", status="draft")])
+    await database.articles.insert_one(article)
+
+    exporter = StaticExporter(tmp_path, workers=2)
+    stats = await exporter.export_all()
+    assert (stats.written, stats.unchanged) == (2, 0)
+    assert _files(tmp_path) == ["artikel/neu/index.html", "impressum/index.html"]
+    html = (tmp_path / "impressum/index.html").read_text()
+    assert "<p>impressum</p>" in html
+    assert 'content="Wer &quot;wir&quot; sind"' in html
+    assert '<link rel="canonical" href="https://example.org/impressum">' in html
+
+    written = (tmp_path / "artikel/neu/index.html").stat().st_mtime_ns
+    await database.pages.update_one(
+        {"id": page["id"]}, {"$set": {"content_html": "<p>neu</p>"}}
+    )
+    stats = await exporter.export_all()
+    assert (stats.written, stats.unchanged) == (1, 1)
+    assert "<p>neu</p>" in (tmp_path / "impressum/index.html").read_text()
+    assert (tmp_path / "artikel/neu/index.html").stat().st_mtime_ns == written
+
+    # Unpublished documents disappear with their directories
+    await database.articles.update_one(
+        {"id": article["id"]}, {"$set": {"status": "archived"}}
+    )
+    stats = await exporter.export_all()
+    assert stats.removed == 1
+    assert _files(tmp_path) == ["impressum/index.html"]
+    assert not (tmp_path / "artikel").exists()
+
+
+@pytest.mark.asyncio
+async def test_shared_paths_are_exported_once(database, tmp_path):
+    first, second = _doc("termine"), _doc("termine")
+    await database.pages.insert_one(first)
+    exporter = StaticExporter(tmp_path)
+    await exporter.export_all()
+    await database.pages.insert_one(second)
+    stats = await exporter.export_all()
+    assert (stats.unchanged, stats.skipped) == (1, 1)
+    assert "<p>termine</p>" in (tmp_path / "termine/index.html").read_text()
+
+    # Unpublishing the exported page takes it offline; the other one moves in
+    await database.pages.update_one({"id": first["id"]}, {"$set": {"status": "draft"}})
+    await exporter.export_documents([("pages", first["id"])])
+    assert _files(tmp_path) == []
+    stats = await exporter.export_all()
+    assert stats.written == 1
+    manifest = (tmp_path / ".manifest.json").read_text()
+    assert second["id"] in manifest and first["id"] not in manifest
+
+
+@pytest.mark.asyncio
+async def test_writes_are_exported_incrementally(database, tmp_path, make_user):
+    exporter = StaticExporter(tmp_path)
+    exporter.start()
+    try:
+        doc = await content.insert_document(
+            "pages",
+            {
+                "id": str(uuid.uuid4()),
+                "title": "Satzung",
+                "slug": "satzung",
+                "content": "# Satzung",
+                "author_id": "u1",
+                "status": "published",
+            },
+        )
+        await asyncio.sleep(0.1)
+        assert _files(tmp_path) == ["satzung/index.html"]
+        assert "<h1>Satzung</h1>" in (tmp_path / "satzung/index.html").read_text()
+
+        await content.update_document(
+            "pages",
+            doc["id"],
+            {"slug": "satzung-2024"},
+            make_user(UserRole.ADMIN),
+            label="Page",
+        )
+        await asyncio.sleep(0.1)
+        assert _files(tmp_path) == ["satzung-2024/index.html"]
+
+        await content.delete_document("pages", doc["id"], label="Page")
+    finally:
+        await exporter.stop()
+    assert _files(tmp_path) == []
+    assert exporter.stats.written == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_export_is_retried(database, tmp_path, monkeypatch):
+    exporter = StaticExporter(tmp_path, retry_delay=0.01)
+    export_documents = exporter.export_documents
+    attempts = []
+
+    async def flaky(keys, database=None):
+        attempts.append(sorted(keys))
+        if len(attempts) == 1:
+            raise OSError("disk full")
+        return await export_documents(keys, database)
+
+    monkeypatch.setattr(exporter, "export_documents", flaky)
+    exporter.start()
+    try:
+        doc = await content.insert_document("pages", _doc("satzung"))
+        for _ in range(100):
+            if _files(tmp_path):
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await exporter.stop()
+    assert attempts[:2] == [[("pages", doc["id"])]] * 2
+    assert _files(tmp_path) == ["satzung/index.html"]
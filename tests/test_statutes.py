@@ -0,0 +1,147 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+from typer.testing import CliRunner
+
+from backend import cli
+from backend.services import statutes
+from backend.services.statutes import CHECKPOINT_COLLECTION, _source_key, iter_norms
+
+STATUTE = """<?xml version="1.0" encoding="UTF-8"?>
+<dokumente doknr="BJNR000010001">
+  <norm doknr="BJNR000010001">
+    <metadaten>
+      <jurabk>MustG</jurabk>
+      <langue>Mustergesetz</langue>
+    </metadaten>
+    <textdaten><text format="XML"><Content><P>Eingangsformel</P></Content></text>
+    </textdaten>
+  </norm>
+  <norm doknr="BJNR000010001BJNG000100000">
+    <metadaten>
+      <jurabk>MustG</jurabk>
+      <gliederungseinheit>
+        <gliederungsbez>Abschnitt 1</gliederungsbez>
+        <gliederungstitel>Allgemeines</gliederungstitel>
+      </gliederungseinheit>
+    </metadaten>
+  </norm>
+  <norm doknr="BJNR000010001BJNE000100000">
+    <metadaten>
+      <jurabk>MustG</jurabk>
+      <enbez>§ 1</enbez>
+      <titel format="parat">Geltungsbereich</titel>
+    </metadaten>
+    <textdaten><text format="XML"><Content>
+      <P>(1) Dieses Gesetz gilt
+         für alle.</P>
+      <P>(2) Ausnahmen regelt <B>§ 2</B>.</P>
+    </Content></text></textdaten>
+  </norm>
+  <norm doknr="BJNR000010001BJNE000200000">
+    <metadaten>
+      <jurabk>MustG</jurabk>
+      <enbez>§ 2</enbez>
+      <titel format="parat">Ausnahmen</titel>
+    </metadaten>
+    <textdaten><text format="XML"><Content><P>Keine.</P></Content></text>
+    </textdaten>
+  </norm>
+</dokumente>
+"""
+
+
+def run_import(database, monkeypatch, *args):
+    monkeypatch.setattr(cli, "get_database", lambda: database)
+    result = CliRunner().invoke(cli.app, ["import", *map(str, args)])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def stored(database):
+    docs = asyncio.run(database.pages.find({}, {"_id": 0}).to_list(None))
+    return {doc["slug"]: doc for doc in docs}
+
+
+def test_iter_norms_parses_gii_xml(tmp_path):
+    path = tmp_path / "mustg.xml"
+    path.write_text(STATUTE, encoding="utf-8")
+    norms = list(iter_norms(path))
+    assert [n["enbez"] for n in norms] == ["", "", "§ 1", "§ 2"]
+    assert norms[1]["gliederung"] == "Abschnitt 1 Allgemeines"
+    assert norms[2]["text"] == (
+        "(1) Dieses Gesetz gilt für alle.\n\n(2) Ausnahmen regelt § 2."
+    )
+
+
+def test_import_command_upserts_and_resumes(tmp_path, monkeypatch):
+    path = tmp_path / "mustg.xml"
+    path.write_text(STATUTE, encoding="utf-8")
+    database = AsyncMongoMockClient()["importtest"]
+    fingerprinted = []
+
+    def fingerprint_operations(collection, docs):
+        fingerprinted.extend(doc["id"] for doc in docs)
+        return []
+
+    monkeypatch.setattr(statutes, "fingerprint_operations", fingerprint_operations)
+
+    output = run_import(database, monkeypatch, path, "--batch-size", "2")
+    assert "3 written, 0 unchanged" in output
+    assert len(fingerprinted) == 3
+    assert "docs/s" in output
+    docs = stored(database)
+    law = docs["mustg"]
+    assert law["title"] == "Mustergesetz"
+    first = docs["mustg-1"]
+    assert first["title"] == "§ 1 Geltungsbereich MustG"
+    assert first["parent_id"] == law["id"]
+    assert first["meta_description"] == "Abschnitt 1 Allgemeines"
+    assert first["content_html"].startswith("<p>(1) Dieses Gesetz")
+    assert first["version"] == 1
+    assert first["status"] == "draft"
+
+    assert "already imported" in run_import(database, monkeypatch, path)
+
+    output = run_import(database, monkeypatch, path, "--no-resume")
+    assert "0 written, 3 unchanged" in output
+    assert stored(database)["mustg-1"]["version"] == 1
+    assert len(fingerprinted) == 3
+
+    # An interrupted run continues after the last stored position
+    path.write_text(STATUTE.replace("Keine.", "Gestrichen."), encoding="utf-8")
+    checkpoints = database[CHECKPOINT_COLLECTION]
+    asyncio.run(checkpoints.delete_many({}))
+    source = _source_key(path)
+    asyncio.run(checkpoints.insert_one({**source, "position": 3, "completed": False}))
+    output = run_import(database, monkeypatch, path)
+    assert "1 written, 0 unchanged (3 norms resumed past)" in output
+    docs = stored(database)
+    assert docs["mustg-2"]["content"] == "Gestrichen."
+    assert docs["mustg-2"]["version"] == 2
+    assert docs["mustg-2"]["parent_id"] == docs["mustg"]["id"]
+    assert fingerprinted[3:] == [docs["mustg-2"]["id"]]
+
+    # Every imported version is in the history, so later edits can diff
+    revisions = asyncio.run(
+        database.revisions.find({"doc_id": docs["mustg-2"]["id"]}).to_list(None)
+    )
+    assert sorted((r["version"], r["kind"]) for r in revisions) == [
+        (1, "snapshot"),
+        (2, "snapshot"),
+    ]
+    assert asyncio.run(database.revisions.count_documents({})) == 4
+
+
+def test_import_reads_json_lines(tmp_path, monkeypatch):
+    path = tmp_path / "norms.jsonl"
+    path.write_text(
+        '{"jurabk": "JG", "langue": "JSON-Gesetz", "enbez": "Art 1", '
+        '"titel": "Zweck", "text": "Text"}\n',
+        encoding="utf-8",
+    )
+    database = AsyncMongoMockClient()["importtest"]
+    assert "2 written" in run_import(database, monkeypatch, path)
+    docs = stored(database)
+    assert docs["jg-art-1"]["parent_id"] == docs["jg"]["id"]
+    assert docs["jg"]["title"] == "JSON-Gesetz"
@@ -0,0 +1,199 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from backend.models import UserRole
+from backend.services import vectors
+from backend.services.ai import AIService, AIServiceError
+from backend.services.events import event_bus
+from backend.services.tools import GenerateTextTool, RetrieveContextTool
+from backend.services.vectors import (
+    ContextIndexer,
+    StubEmbedder,
+    VectorIndex,
+    chunk_document,
+)
+
+GEBUEHREN = {
+    "id": "p1",
+    "title": "Gebührenordnung",
+    "content": "## § 1 Gebühren\n\nFür Bescheide wird eine Gebühr erhoben.\n\n"
+    "## § 2 Fristen\n\nDer Widerspruch ist binnen eines Monats einzulegen.\n",
+    "version": 1,
+}
+PARKEN = {
+    "id": "p2",
+    "title": "Parkordnung",
+    "content": "Parken ist auf dem Rathausplatz verboten.",
+    "version": 1,
+}
+
+
+def embed(texts):
+    return asyncio.run(StubEmbedder().embed(texts))
+
+
+def test_chunks_follow_sections():
+    chunks = chunk_document("pages", GEBUEHREN)
+    assert [c["section"] for c in chunks] == ["p1", "p2"]
+    assert chunks[1]["text"].startswith("## § 2 Fristen")
+    assert [c["section"] for c in chunk_document("pages", PARKEN)] == [None]
+
+
+def test_stub_embedder_is_deterministic_and_normalised():
+    first, second = embed(["Gebühr für Bescheide", "Gebühr für Bescheide"])
+    assert np.array_equal(first, second)
+    assert np.isclose(np.linalg.norm(first), 1.0)
+
+
+def test_index_updates_persists_and_memory_maps(tmp_path):
+    index = VectorIndex(tmp_path)
+    for doc in (GEBUEHREN, PARKEN):
+        chunks = chunk_document("pages", doc)
+        index.upsert(
+            VectorIndex.key("pages", doc["id"]),
+            embed([c["text"] for c in chunks]),
+            chunks,
+        )
+    assert len(index) == 3
+    (best_score, best), *_ = index.search(embed(["Widerspruch Monat"])[0], k=2)
+    assert best["section"] == "p2"
+
+    asyncio.run(index.save())
+    reloaded = VectorIndex(tmp_path)
+    assert isinstance(reloaded._base, np.memmap)
+    assert len(reloaded) == 3
+
+    # A changed document replaces its rows; saved rows are only marked dead
+    changed = {**PARKEN, "content": "Radfahren ist im Park erlaubt.", "version": 2}
+    chunks = chunk_document("pages", changed)
+    reloaded.upsert("pages:p2", embed([c["text"] for c in chunks]), chunks)
+    reloaded.remove("pages:p1")
+    results = reloaded.search(embed(["Radfahren Park"])[0], k=5)
+    assert [(c["id"], c["version"]) for _, c in results] == [("p2", 2)]
+
+    asyncio.run(reloaded.save())
+    assert len(VectorIndex(tmp_path)) == 1
+
+
+def test_saves_swap_versions_and_keep_other_workers_files(tmp_path):
+    chunks = chunk_document("pages", GEBUEHREN)
+    matrix = embed([c["text"] for c in chunks])
+    index = VectorIndex(tmp_path)
+    index.upsert("pages:p1", matrix, chunks)
+    asyncio.run(index.save())
+    first = (tmp_path / "CURRENT").read_text()
+
+    # Another worker's version being written must survive this worker's save
+    foreign = tmp_path / "versions" / "1-999999999-abcdef12"
+    foreign.mkdir()
+    index.remove("pages:p1")
+    asyncio.run(index.save())
+    current = (tmp_path / "CURRENT").read_text()
+    assert current != first
+    assert sorted(p.name for p in (tmp_path / "versions").iterdir()) == sorted(
+        [current, foreign.name]
+    )
+    assert len(VectorIndex(tmp_path)) == 0
+
+
+def test_loads_index_saved_before_versions(tmp_path):
+    chunks = chunk_document("pages", GEBUEHREN)
+    np.save(tmp_path / "vectors.npy", embed([c["text"] for c in chunks]))
+    (tmp_path / "meta.json").write_text(
+        json.dumps({"dimensions": vectors.STUB_DIMENSIONS, "chunks": chunks})
+    )
+    assert len(VectorIndex(tmp_path)) == 2
+
+
+@pytest.mark.asyncio
+async def test_indexer_follows_content_events(tmp_path, mock_mongo):
+    database = mock_mongo(vectors)
+    indexer = ContextIndexer()
+    indexer.setup(tmp_path, StubEmbedder())
+    indexer.start()
+    try:
+        await database.pages.insert_one(dict(GEBUEHREN))
+        await event_bus.publish({"collection": "pages", "id": "p1", "version": 1})
+        for _ in range(100):
+            if len(indexer.index):
+                break
+            await asyncio.sleep(0.01)
+        assert len(indexer.index) == 2
+
+        await database.pages.delete_one({"id": "p1"})
+        await event_bus.publish({"collection": "pages", "id": "p1"})
+    finally:
+        await indexer.stop()
+    assert len(VectorIndex(tmp_path)) == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_updates_are_retried(tmp_path, mock_mongo):
+    database = mock_mongo(vectors)
+    embedder = StubEmbedder()
+    embed = embedder.embed
+    attempts = []
+
+    async def flaky(texts):
+        attempts.append(len(texts))
+        if len(attempts) == 1:
+            raise AIServiceError("embedding service unavailable")
+        return await embed(texts)
+
+    embedder.embed = flaky
+    indexer = ContextIndexer(retry_delay=0.01)
+    indexer.setup(tmp_path, embedder)
+    indexer.start()
+    try:
+        await database.pages.insert_one(dict(GEBUEHREN))
+        await event_bus.publish({"collection": "pages", "id": "p1", "version": 1})
+        for _ in range(100):
+            if len(indexer.index):
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await indexer.stop()
+    assert len(attempts) == 2
+    assert len(VectorIndex(tmp_path)) == 2
+
+
+@pytest.mark.asyncio
+async def test_retrieve_context_and_generate_with_context(monkeypatch, make_user):
+    user = make_user(UserRole.ADMIN)
+    indexer = vectors.context_indexer
+    monkeypatch.setattr(indexer, "index", None)
+    monkeypatch.setattr(indexer, "embedder", None)
+    tool = RetrieveContextTool()
+    with pytest.raises(HTTPException) as exc:
+        await tool.execute({"query": "Gebühr"}, user)
+    assert exc.value.status_code == 503
+
+    indexer.setup(None, StubEmbedder())
+    await indexer.index_documents("pages", [GEBUEHREN, PARKEN])
+    result = await tool.execute({"query": "Wo ist Parken verboten?", "k": 1}, user)
+    assert result["results"][0]["id"] == "p2"
+    assert result["results"][0]["text"] == PARKEN["content"]
+
+    prompts = []
+
+    async def fake_post(endpoint, payload):
+        prompts.append(payload["prompt"])
+        return {"text": "Siehe [1]."}
+
+    service = AIService()
+    monkeypatch.setattr(service, "post", fake_post)
+    generated = await GenerateTextTool(service).execute(
+        {
+            "prompt": "Binnen welcher Frist ist der Widerspruch einzulegen?",
+            "context": True,
+        },
+        user,
+    )
+    assert generated["text"] == "Siehe [1]."
+    assert generated["sources"][0]["section"] == "p2"
+    assert "[1] Gebührenordnung (p2)" in prompts[0]
+    assert prompts[0].endswith("Binnen welcher Frist ist der Widerspruch einzulegen?")